@@ -9,33 +9,26 @@ player IDs or have permission.
 Usage:
   python apply_players.py --player-ids "529265458"
 
-The script saves `apply_result.png` (screenshot after submission) and prints any visible message.
+The script prints any visible message. Screenshots (`apply_result.jpg`, `task_status_after_apply.jpg`)
+follow `--screenshots` (never, on_failure or always; default WOS_SCREENSHOT_POLICY, see screenshots.py).
 """
 
 import argparse
-import time
-import os
-import shutil
-import tempfile
 from pathlib import Path
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+
+from automation import RESULT_SELECTOR
+from driver_pool import LAUNCH_PROFILES, launch_with_profile, quit_driver
+from screenshots import POLICIES, POLICY, capture
+from selector_cache import get_resolver
+from status_snapshot import get_service
+from status_table import extract_task_status, records_for_players, write_status_csv
+from waits import wait_for, textarea_present, apply_acknowledged, status_table_rendered, row_for_player_visible, task_status_link
 
 
 def pick_first(driver, selectors):
-    for sel in selectors.split(","):
-        sel = sel.strip()
-        try:
-            return driver.find_element(By.CSS_SELECTOR, sel)
-        except Exception:
-            continue
-    raise RuntimeError(f"No element found for selectors: {selectors}")
+    return get_resolver().find(driver, selectors)
 
 
 def main():
@@ -45,67 +38,31 @@ def main():
     parser.add_argument("--headless", action="store_true")
     parser.add_argument("--user-data-dir", default=None, help="Path to Chrome user data dir to reuse profile (optional)")
     parser.add_argument("--profile-directory", default=None, help="Chrome profile directory name inside user-data-dir (e.g. 'Default' or 'Profile 2')")
+    parser.add_argument("--launch-profile", choices=sorted(LAUNCH_PROFILES), default=None,
+                        help="Chrome launch profile (default: lean when headless, default otherwise)")
+    parser.add_argument("--screenshots", choices=POLICIES, default=POLICY, help="When to save screenshots")
     args = parser.parse_args()
 
-    options = Options()
-    if args.headless:
-        options.add_argument("--headless=new")
-    options.add_argument("--start-maximized")
-
-    # If user-data-dir and profile-directory provided, attempt to copy that profile to a temp dir
-    # and use the copy. Copying avoids lockfile and extension-related crashes when launching
-    # from an existing profile directory.
-    temp_dir = None
-    if args.user_data_dir and args.profile_directory:
-        src_profile = os.path.join(args.user_data_dir, args.profile_directory)
-        if os.path.exists(src_profile):
-            print(f"Copying profile from {src_profile} to a temporary directory to avoid locks...")
-            temp_dir = tempfile.mkdtemp(prefix="wos_profile_")
-            try:
-                # copy the whole user-data-dir but only the specified profile folder
-                dest_profile_parent = os.path.join(temp_dir, "User Data")
-                os.makedirs(dest_profile_parent, exist_ok=True)
-                shutil.copytree(src_profile, os.path.join(dest_profile_parent, args.profile_directory))
-                # Use the temporary 'User Data' folder as the user-data-dir for Chrome
-                args.user_data_dir = dest_profile_parent
-            except Exception as e:
-                print("Warning: failed to copy profile, attempting to use original profile directly:", e)
-
-    # If user-data-dir or profile-directory provided, add to options so Selenium uses that Chrome profile.
-    if args.user_data_dir:
-        options.add_argument(f"--user-data-dir={args.user_data_dir}")
-        # add flags that often improve launching with an existing profile
-        options.add_argument("--remote-debugging-port=9222")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-gpu")
-    if args.profile_directory:
-        options.add_argument(f"--profile-directory={args.profile_directory}")
-
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    wait = WebDriverWait(driver, 15)
+    # with a user profile, Chrome runs on a private copy of it (chrome_profiles keeps a
+    # trimmed snapshot, so this is cheap and avoids lockfile and extension crashes)
+    driver, profile_copy = launch_with_profile(args.headless, args.user_data_dir, args.profile_directory,
+                                               args.launch_profile)
+    if profile_copy is not None:
+        print(f"Using a copy of profile {args.profile_directory} ({profile_copy.counts})")
 
     try:
         print("Opening page...")
         driver.get(args.url)
-        time.sleep(1.0)
 
-        # Try a few reasonable selectors for the textarea and the Apply button
-        textarea_selectors = "textarea[placeholder*='player IDs'], textarea#players, textarea"
+        # Try a few reasonable selectors for the Apply button
         apply_btn_selectors = "button:where([type='button']), button, input[type='button'], input[type='submit']"
 
-        # Prefer button with exact text 'Apply Codes' using XPath
-        try:
-            textarea = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "textarea[placeholder*='player IDs']")))
-        except Exception:
-            # fallback to any textarea
-            textarea = pick_first(driver, textarea_selectors)
+        textarea = wait_for(driver, textarea_present(), timeout=15)
 
         # fill textarea
         print("Filling player IDs into textarea...")
         textarea.clear()
         textarea.send_keys(args.player_ids)
-        time.sleep(0.3)
 
         # find apply button by XPath text match first
         apply_btn = None
@@ -129,11 +86,13 @@ def main():
         print("Clicking Apply Codes button...")
         apply_btn.click()
 
-        # wait a bit for result
-        time.sleep(2.0)
-        out_path = Path("apply_result.png")
-        driver.save_screenshot(str(out_path))
-        print(f"Saved screenshot to {out_path}")
+        # wait for the site to acknowledge the submission
+        acknowledged = wait_for(driver, apply_acknowledged(), timeout=10, required=False)
+        out_path = capture(driver, Path("apply_result"), 'success' if acknowledged else 'failure',
+                           selector=RESULT_SELECTOR if acknowledged else None,
+                           policy=args.screenshots)
+        if out_path:
+            print(f"Saved screenshot to {out_path}")
 
         # try to read a message element
         msg_text = None
@@ -150,27 +109,17 @@ def main():
         if msg_text:
             print("Result message:", msg_text)
         else:
-            print("No obvious message element found. Check apply_result.png for page state.")
+            print("No obvious message element found." + (f" Check {out_path} for page state." if out_path else ""))
 
         # After applying, navigate to Task Status to check queue for the player IDs
         try:
             print("Navigating to Task Status page...")
             # try clicking the Task Status menu link
             clicked = False
-            for xpath in ["//a[contains(., 'Task Status') or contains(., 'Task status')]", "//a[contains(translate(., 'TASK STATUS', 'task status'), 'task status')]"]:
-                try:
-                    el = driver.find_element(By.XPATH, xpath)
-                    el.click()
-                    clicked = True
-                    break
-                except Exception:
-                    continue
-
-            if not clicked:
-                # fallback: find link with href containing 'task' or 'status'
+            link = wait_for(driver, task_status_link(), timeout=10, required=False)
+            if link:
                 try:
-                    el = driver.find_element(By.XPATH, "//a[contains(@href, 'task') or contains(@href, 'status')]")
-                    el.click()
+                    link.click()
                     clicked = True
                 except Exception:
                     pass
@@ -178,74 +127,43 @@ def main():
             if not clicked:
                 print("Could not find Task Status link on the page. Skipping status check.")
             else:
-                time.sleep(1.0)
-                # wait for table or header
-                try:
-                    wait.until(lambda d: d.find_element(By.XPATH, "//table") or d.find_element(By.XPATH, "//h1[contains(., 'Queue Status')]") )
-                except Exception:
-                    pass
+                # wait for the table to render, then briefly for our own row to show up
+                wait_for(driver, status_table_rendered(), timeout=15, required=False)
+                first_pid = args.player_ids.replace(',', ' ').split()[0]
+                wait_for(driver, row_for_player_visible(first_pid), timeout=5, required=False)
 
-                # scrape table rows (if any)
-                rows = []
-                try:
-                    table = driver.find_element(By.XPATH, "//table")
-                    tbody = table.find_element(By.TAG_NAME, "tbody")
-                    tr_list = tbody.find_elements(By.TAG_NAME, "tr")
-                    for tr in tr_list:
-                        cells = tr.find_elements(By.TAG_NAME, "td")
-                        texts = [c.text.strip() for c in cells]
-                        if texts:
-                            rows.append(texts)
-                except Exception:
-                    # fallback: try other selectors
-                    try:
-                        items = driver.find_elements(By.CSS_SELECTOR, ".table-responsive tr, .queue-list li, .task-row")
-                        for it in items:
-                            texts = it.text.splitlines()
-                            if texts:
-                                rows.append([" | ".join(texts)])
-                    except Exception:
-                        pass
-
-                out_csv = Path("task_status_after_apply.csv")
-                if rows:
-                    maxcols = max(len(r) for r in rows)
-                    headers = [f"col{i+1}" for i in range(maxcols)]
-                    with out_csv.open("w", encoding='utf-8', newline='') as f:
-                        import csv as _csv
-                        writer = _csv.writer(f)
-                        writer.writerow(headers)
-                        for r in rows:
-                            writer.writerow(r + [""] * (maxcols - len(r)))
-                    print(f"Wrote {len(rows)} rows to {out_csv}")
+                # read the whole table in one round trip
+                records = extract_task_status(driver)
+                get_service().publish(records, source='apply_players')
+
+                out_csv = write_status_csv(records, Path("task_status_after_apply.csv"))
+                if out_csv:
+                    print(f"Wrote {len(records)} rows to {out_csv}")
 
                     # filter rows matching any provided player id
                     pids = [p.strip() for p in args.player_ids.replace(',', ' ').split() if p.strip()]
-                    matched = []
-                    for r in rows:
-                        line = ' '.join(r)
-                        for pid in pids:
-                            if pid in line:
-                                matched.append((pid, line))
+                    matched = records_for_players(records, pids)
                     if matched:
                         print("Found status entries for provided player IDs:")
-                        for pid, line in matched:
-                            print(pid, "->", line)
+                        for r in matched:
+                            print(','.join(r.player_ids), "->", r.date, r.status, r.result_url or '')
                     else:
                         print("No matching player IDs found in the queue table (refresh may be required).")
                 else:
                     print("No rows found on Task Status page after apply.")
 
-                out_png2 = Path("task_status_after_apply.png")
-                driver.save_screenshot(str(out_png2))
-                print(f"Saved Task Status screenshot to {out_png2}")
+                out_png2 = capture(driver, Path("task_status_after_apply"), 'success' if records else 'failure',
+                                   selector='table' if records else None, policy=args.screenshots)
+                if out_png2:
+                    print(f"Saved Task Status screenshot to {out_png2}")
         except Exception as e:
             print("Error while checking Task Status:", e)
 
     finally:
-        print("Done. Closing browser in 2 seconds...")
-        time.sleep(2)
-        driver.quit()
+        print("Done. Closing browser...")
+        quit_driver(driver)
+        if profile_copy is not None:
+            profile_copy.cleanup()
 
 
 if __name__ == '__main__':
@@ -3,162 +3,129 @@ automation.py
 
 Expose apply_player_ids(player_ids, out_dir=None, user_data_dir=None, profile_directory=None)
 which performs the same steps as the previous apply_players script but is importable.
+
+Pass pool=driver_pool.get_pool() to borrow a warm browser instead of launching one per call.
+Screenshots follow screenshots.POLICY (by default only captchas and intercepted clicks).
 """
-import os
-import shutil
-import tempfile
 import time
 from pathlib import Path
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import ElementClickInterceptedException, NoSuchElementException
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
-
-
-def _copy_profile_to_temp(user_data_dir, profile_directory):
-    src_profile = os.path.join(user_data_dir, profile_directory)
-    if not os.path.exists(src_profile):
-        raise FileNotFoundError(src_profile)
-    temp_dir = tempfile.mkdtemp(prefix='wos_profile_')
-    dest_profile_parent = os.path.join(temp_dir, 'User Data')
-    os.makedirs(dest_profile_parent, exist_ok=True)
-    shutil.copytree(src_profile, os.path.join(dest_profile_parent, profile_directory))
-    return dest_profile_parent
-
-
-def apply_player_ids(player_ids, out_dir=None, user_data_dir=None, profile_directory=None, headless=False):
-    """Apply given player_ids (list) on wosrewards.com. Returns dict with paths."""
+from selenium.common.exceptions import ElementClickInterceptedException
+
+from driver_pool import SITE_URL, launch_with_profile, page_weight, quit_driver
+from metrics import record_stage, stage
+from screenshots import capture
+from status_table import extract_task_status, write_status_csv
+from waits import wait_for, textarea_present, apply_acknowledged, status_table_rendered, task_status_link
+
+
+# what a successful apply's screenshot is clipped to
+RESULT_SELECTOR = '.alert, .message, .result, #result, [role=alert], form'
+
+
+def apply_player_ids(player_ids, out_dir=None, user_data_dir=None, profile_directory=None, headless=False, pool=None, url=SITE_URL,
+                     launch_profile=None, screenshot_policy=None):
+    """Apply given player_ids (list) on wosrewards.com. Returns dict with paths.
+
+    When `pool` is given and no Chrome profile is requested, a warm session is borrowed
+    from the pool and handed back afterwards instead of launching and quitting Chrome.
+    `launch_profile` names a driver_pool.LAUNCH_PROFILES entry for a freshly launched Chrome.
+    `screenshot_policy` overrides screenshots.POLICY; `apply_screenshot` is None when skipped.
+    """
     if isinstance(player_ids, (str,)):
         pids = [player_ids]
     else:
         pids = list(player_ids)
 
     out_dir = Path(out_dir or '.')
-    out_dir = out_dir
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    options = Options()
-    if headless:
-        options.add_argument('--headless=new')
-    options.add_argument('--start-maximized')
-
-    temp_copy = None
-    if user_data_dir and profile_directory:
-        try:
-            temp_copy = _copy_profile_to_temp(user_data_dir, profile_directory)
-            options.add_argument(f"--user-data-dir={temp_copy}")
-        except Exception:
-            options.add_argument(f"--user-data-dir={user_data_dir}")
-        options.add_argument(f"--profile-directory={profile_directory}")
-        options.add_argument('--remote-debugging-port=9222')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-gpu')
-
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    wait = WebDriverWait(driver, 15)
+    if pool is not None and not (user_data_dir and profile_directory):
+        started = time.monotonic()
+        with pool.session() as driver:
+            record_stage('driver_acquire', time.monotonic() - started)
+            return _apply_on_driver(driver, pids, out_dir, url, screenshot_policy)
 
+    # a requested Chrome profile is used through a cheap private copy (chrome_profiles.py)
+    with stage('driver_launch'):
+        driver, profile = launch_with_profile(headless, user_data_dir, profile_directory, launch_profile)
     try:
-        driver.get('https://wosrewards.com/')
-        time.sleep(1.0)
-
-        # find textarea
-        try:
-            textarea = wait.until(lambda d: d.find_element(By.CSS_SELECTOR, "textarea[placeholder*='player IDs']"))
-        except Exception:
-            textarea = driver.find_element(By.CSS_SELECTOR, 'textarea')
-
+        return _apply_on_driver(driver, pids, out_dir, url, screenshot_policy)
+    finally:
+        quit_driver(driver)
+        if profile is not None:
+            profile.cleanup()
+
+
+def _apply_on_driver(driver, pids, out_dir, url=SITE_URL, screenshot_policy=None):
+    # pooled sessions are already parked on the landing page
+    with stage('page_load'):
+        if driver.current_url.rstrip('/') != url.rstrip('/'):
+            driver.get(url)
+        textarea = wait_for(driver, textarea_present(), timeout=15)
+    weight = page_weight(driver)
+    with stage('fill'):
         textarea.clear()
         textarea.send_keys(' '.join(pids))
-        time.sleep(0.3)
 
-        # detect potential captcha / overlay (reCAPTCHA often has data-sitekey)
-        try:
-            captcha_elems = driver.find_elements(By.CSS_SELECTOR, '[data-sitekey]')
-        except Exception:
-            captcha_elems = []
-        if captcha_elems:
-            apply_screenshot = out_dir / 'apply_result_captcha.png'
-            driver.save_screenshot(str(apply_screenshot))
-            return {
-                'apply_screenshot': str(apply_screenshot),
-                'status_rows': [],
-                'status_csv': None,
-                'captcha': True,
-                'message': 'captcha_or_overlay_detected'
-            }
-
-        # click Apply Codes
-        try:
-            btn = driver.find_element(By.XPATH, "//button[normalize-space()='Apply Codes']")
-        except Exception:
-            btn = driver.find_element(By.CSS_SELECTOR, 'button')
-        try:
+    # detect potential captcha / overlay (reCAPTCHA often has data-sitekey)
+    try:
+        captcha_elems = driver.find_elements(By.CSS_SELECTOR, '[data-sitekey]')
+    except Exception:
+        captcha_elems = []
+    if captcha_elems:
+        return {
+            'apply_screenshot': capture(driver, out_dir / 'apply_result_captcha', 'failure', policy=screenshot_policy),
+            'status_rows': [],
+            'status_csv': None,
+            'captcha': True,
+            'message': 'captcha_or_overlay_detected'
+        }
+
+    # click Apply Codes
+    try:
+        btn = driver.find_element(By.XPATH, "//button[normalize-space()='Apply Codes']")
+    except Exception:
+        btn = driver.find_element(By.CSS_SELECTOR, 'button')
+    try:
+        with stage('apply_click'):
             btn.click()
-        except ElementClickInterceptedException as e:
-            # click was intercepted by overlay (likely a modal or captcha). Save screenshot and return a special result.
-            apply_screenshot = out_dir / 'apply_result_intercepted.png'
-            driver.save_screenshot(str(apply_screenshot))
-            return {
-                'apply_screenshot': str(apply_screenshot),
-                'status_rows': [],
-                'status_csv': None,
-                'captcha': True,
-                'message': str(e)
-            }
-        time.sleep(1.0)
-
-        apply_screenshot = out_dir / 'apply_result.png'
-        driver.save_screenshot(str(apply_screenshot))
+            # not every site version shows a message, so a missing acknowledgement is not fatal
+            acknowledged = wait_for(driver, apply_acknowledged(), timeout=10, required=False)
+    except ElementClickInterceptedException as e:
+        # click was intercepted by overlay (likely a modal or captcha). Save screenshot and return a special result.
+        return {
+            'apply_screenshot': capture(driver, out_dir / 'apply_result_intercepted', 'failure', policy=screenshot_policy),
+            'status_rows': [],
+            'status_csv': None,
+            'captcha': True,
+            'message': str(e)
+        }
+
+    # no acknowledgement is worth a look at the whole page; otherwise the message (or form) is enough
+    if acknowledged:
+        apply_screenshot = capture(driver, out_dir / 'apply_result', 'success', selector=RESULT_SELECTOR,
+                                   policy=screenshot_policy)
+    else:
+        apply_screenshot = capture(driver, out_dir / 'apply_result', 'failure', policy=screenshot_policy)
 
+    with stage('status_scrape'):
         # navigate to Task Status and scrape table (reuse status.py functionality)
         try:
-            link = driver.find_element(By.XPATH, "//a[contains(., 'Task Status')]")
-            link.click()
-            time.sleep(1.0)
+            wait_for(driver, task_status_link(), timeout=5).click()
+            wait_for(driver, status_table_rendered(), timeout=10, required=False)
         except Exception:
             pass
 
-        # try to scrape table rows
-        rows = []
+        # read the whole table in one round trip and write it with named columns
         try:
-            table = driver.find_element(By.XPATH, "//table")
-            tbody = table.find_element(By.TAG_NAME, 'tbody')
-            tr_list = tbody.find_elements(By.TAG_NAME, 'tr')
-            for tr in tr_list:
-                cells = tr.find_elements(By.TAG_NAME, 'td')
-                rows.append([c.text.strip() for c in cells])
+            records = extract_task_status(driver)
         except Exception:
-            pass
-
-        # write CSV
-        status_csv = out_dir / 'task_status.csv'
-        try:
-            import csv
-            if rows:
-                maxcols = max(len(r) for r in rows)
-                with status_csv.open('w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    headers = [f'col{i+1}' for i in range(maxcols)]
-                    writer.writerow(headers)
-                    for r in rows:
-                        writer.writerow(r + [''] * (maxcols - len(r)))
-        except Exception:
-            status_csv = None
-
-        return {'apply_screenshot': str(apply_screenshot), 'status_rows': rows, 'status_csv': str(status_csv) if status_csv and status_csv.exists() else None}
+            records = []
+    try:
+        status_csv = write_status_csv(records, out_dir / 'task_status.csv')
+    except Exception:
+        status_csv = None
 
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
-        # cleanup temp copy
-        if temp_copy and os.path.exists(temp_copy):
-            try:
-                shutil.rmtree(temp_copy)
-            except Exception:
-                pass
+    return {'apply_screenshot': apply_screenshot, 'status_rows': [r.to_dict() for r in records], 'status_csv': str(status_csv) if status_csv else None,
+            'page_weight': weight}
@@ -0,0 +1,275 @@
+"""
+backends.py
+
+Pluggable submission backends behind automation.apply_player_ids and redeem.run_batch.
+
+  selenium  drives Chrome (optionally borrowing from driver_pool) - the original behaviour
+  http      talks to the site's form endpoints directly over pooled keep-alive HTTP
+
+All backends share the same small interface:
+
+    backend = get_backend('http')
+    res = backend.apply_player_ids(['123', '456'], out_dir='jobs_data/job_1')
+    records = backend.fetch_task_status()
+    text = backend.redeem_code('123', 'GIFTCODE')
+    backend.close()
+
+The HTTP endpoints mirror what the landing page's JavaScript does. They are collected in
+HTTP_CONFIG so they can be adjusted if the site changes; mock_site.py implements them locally.
+"""
+import json
+import os
+import threading
+from html.parser import HTMLParser
+from pathlib import Path
+
+from metrics import stage
+from status_table import records_from_rows, write_status_csv
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:
+    requests = None
+
+HTTP_CONFIG = {
+    "base_url": os.environ.get('WOS_HTTP_BASE_URL', 'https://wosrewards.com'),
+    "apply_path": "/api/apply",
+    "status_path": "/api/tasks",
+    "redeem_path": "/api/redeem",
+    "timeout": 15,
+    "pool_size": 20,
+}
+
+
+class Backend:
+    name = 'base'
+
+    def apply_player_ids(self, player_ids, out_dir=None):
+        raise NotImplementedError
+
+    def fetch_task_status(self):
+        raise NotImplementedError
+
+    def redeem_code(self, player_id, code):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SeleniumBackend(Backend):
+    """Browser-driven backend; borrows from `pool` when given, else launches Chrome per call."""
+    name = 'selenium'
+
+    def __init__(self, pool=None, headless=True, url=None, launch_profile=None):
+        from driver_pool import SITE_URL
+        self.pool = pool
+        self.headless = headless
+        self.url = url or SITE_URL
+        self.launch_profile = launch_profile
+        self._session = None
+        self._driver = None
+
+    def apply_player_ids(self, player_ids, out_dir=None):
+        import automation
+        return automation.apply_player_ids(player_ids, out_dir=out_dir, headless=self.headless,
+                                           pool=self.pool, url=self.url, launch_profile=self.launch_profile)
+
+    def fetch_task_status(self):
+        import status
+        return status.fetch_task_status(pool=self.pool, url=self.url, headless=self.headless)
+
+    def _redeem_driver(self):
+        # one browser is kept for a whole batch of codes
+        if self._driver is None:
+            from driver_pool import build_options, launch_driver
+            from waits import wait_for, page_ready
+            if self.pool is not None:
+                self._session = self.pool.acquire()
+                self._driver = self._session.driver
+            else:
+                self._driver = launch_driver(build_options(headless=self.headless, launch_profile=self.launch_profile))
+            self._driver.get(self.url)
+            wait_for(self._driver, page_ready(), timeout=15, required=False)
+        return self._driver
+
+    def redeem_code(self, player_id, code):
+        import redeem
+        return redeem.redeem_one(self._redeem_driver(), None, player_id, code, redeem.CONFIG)
+
+    def close(self):
+        from driver_pool import quit_driver
+        if self._session is not None:
+            self.pool.release(self._session)
+        elif self._driver is not None:
+            quit_driver(self._driver)
+        self._session = None
+        self._driver = None
+
+
+class _TableParser(HTMLParser):
+    """Collects the first <table> of a page as {'headers', 'rows'} like status_table's extractor."""
+
+    def __init__(self):
+        super().__init__()
+        self.headers, self.rows = [], []
+        self._in_table = self._done = False
+        self._cell = None
+        self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == 'table':
+            self._in_table = True
+        elif self._in_table and tag == 'tr':
+            self._row = {'cells': [], 'links': []}
+        elif self._in_table and tag in ('td', 'th'):
+            self._cell = {'tag': tag, 'text': '', 'href': None}
+        elif self._cell is not None and tag == 'a':
+            self._cell['href'] = dict(attrs).get('href')
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell['text'] += data
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        if tag in ('td', 'th') and self._cell is not None:
+            text = ' '.join(self._cell['text'].split())
+            if self._cell['tag'] == 'th':
+                self.headers.append(text)
+            elif self._row is not None:
+                self._row['cells'].append(text)
+                self._row['links'].append(self._cell['href'])
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            if self._row['cells']:
+                self.rows.append(self._row)
+            self._row = None
+        elif tag == 'table':
+            self._in_table = False
+            self._done = True
+
+
+def parse_status_html(text):
+    parser = _TableParser()
+    parser.feed(text)
+    return records_from_rows(parser.headers, parser.rows)
+
+
+def parse_status_json(items):
+    rows = []
+    for it in items:
+        ids = it.get('playerIds') or it.get('player_ids') or []
+        if isinstance(ids, str):
+            ids = ids.replace(',', ' ').split()
+        result = it.get('result') or it.get('result_url')
+        rows.append({'cells': [str(it.get('date', '')), ','.join(str(i) for i in ids),
+                               str(it.get('status', '')), result or 'null'],
+                     'links': [None, None, None, result]})
+    return records_from_rows(['date', 'player_ids', 'status', 'result'], rows)
+
+
+class HttpBackend(Backend):
+    """Browserless backend: pooled keep-alive requests against the site's form endpoints."""
+    name = 'http'
+
+    def __init__(self, base_url=None, config=None):
+        if requests is None:
+            raise RuntimeError('requests package not installed')
+        self.config = dict(HTTP_CONFIG, **(config or {}))
+        self.base_url = (base_url or self.config['base_url']).rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.config['pool_size'], pool_maxsize=self.config['pool_size'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept': 'application/json, text/html;q=0.9'})
+
+    def _url(self, key):
+        return self.base_url + self.config[key]
+
+    def apply_player_ids(self, player_ids, out_dir=None):
+        pids = [player_ids] if isinstance(player_ids, str) else [str(p) for p in player_ids]
+        out_dir = Path(out_dir or '.')
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        with stage('http_apply'):
+            resp = self.session.post(self._url('apply_path'), json={'playerIds': pids}, timeout=self.config['timeout'])
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {'message': resp.text[:500]}
+        response_file = out_dir / 'apply_response.json'
+        response_file.write_text(json.dumps({'status_code': resp.status_code, 'body': body}, indent=2))
+
+        # 403/429 or an explicit captcha flag means the site wants a human; same contract as the browser flow
+        if resp.status_code in (403, 429) or body.get('captcha'):
+            return {'apply_screenshot': str(response_file), 'status_rows': [], 'status_csv': None,
+                    'captcha': True, 'message': body.get('message') or f'HTTP {resp.status_code}'}
+        resp.raise_for_status()
+
+        records = self.fetch_task_status()
+        status_csv = write_status_csv(records, out_dir / 'task_status.csv')
+        return {'apply_screenshot': None, 'apply_response': str(response_file),
+                'status_rows': [r.to_dict() for r in records],
+                'status_csv': str(status_csv) if status_csv else None,
+                'message': body.get('message')}
+
+    def fetch_task_status(self):
+        with stage('status_scrape'):
+            resp = self.session.get(self._url('status_path'), timeout=self.config['timeout'])
+            resp.raise_for_status()
+            if 'json' in resp.headers.get('Content-Type', ''):
+                return parse_status_json(resp.json())
+            return parse_status_html(resp.text)
+
+    def redeem_code(self, player_id, code):
+        resp = self.session.post(self._url('redeem_path'), json={'playerId': str(player_id), 'code': code},
+                                 timeout=self.config['timeout'])
+        try:
+            return (resp.json().get('message') or '').strip() or f'HTTP {resp.status_code}'
+        except ValueError:
+            return f'HTTP {resp.status_code}: {resp.text[:200]}'
+
+    def close(self):
+        self.session.close()
+
+
+BACKENDS = {
+    'selenium': SeleniumBackend,
+    'http': HttpBackend,
+}
+DEFAULT_BACKEND = os.environ.get('WOS_BACKEND', 'selenium')
+
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_backend(name=None, **kwargs):
+    """Process-wide shared backend instance for `name` (default WOS_BACKEND or 'selenium').
+
+    Shared instances are meant for apply/status calls; a redeem batch keeps per-batch
+    browser state, so create its own backend instead. Selenium backends are shared per
+    `launch_profile` and borrow from that profile's driver pool.
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f'unknown backend: {name}')
+    key = (name, kwargs.get('launch_profile'))
+    with _SHARED_LOCK:
+        if key not in _SHARED:
+            if name == 'selenium' and 'pool' not in kwargs:
+                import driver_pool
+                kwargs['pool'] = driver_pool.get_pool(headless=kwargs.get('headless', True),
+                                                      launch_profile=kwargs.get('launch_profile'))
+            _SHARED[key] = BACKENDS[name](**kwargs)
+        return _SHARED[key]
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+bench.py
+
+End-to-end benchmark of the real submission code against mock_site.py.
+
+Each scenario runs unchanged project code against a local mock of wosrewards.com started
+in-process with the given latency and Task Status size:
+
+  apply    automation.apply_player_ids (selenium) / HttpBackend.apply_player_ids (http)
+  status   status.scrape_task_status (selenium) / HttpBackend.fetch_task_status (http)
+  redeem   redeem.run_batch, one code per measured request
+  worker   the webapp pipeline: create_job + enqueue_job -> worker pool -> run_jobs, measured
+           from job creation until the job is submitted
+
+For every scenario it reports p50/p95/mean latency, jobs (or codes) per minute, errors and
+peak RSS of this process plus its children (Chrome, chromedriver, workers; needs psutil,
+else the rusage high-water mark). Results go to a JSON file so runs can be compared:
+
+Usage:
+  python bench.py --backend http --iterations 50
+  python bench.py --backend selenium --scenarios apply,status --latency 0.05 --seed-rows 500
+  python bench.py --out results/bench_new.json --compare results/bench_old.json
+
+Everything the worker scenario writes (database, file queue, job artifacts, metrics, status
+snapshot, selector cache) goes to a temporary directory, never to jobs_data/ or app.db.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+try:
+    import resource
+except Exception:
+    resource = None
+
+SCENARIOS = ('apply', 'status', 'redeem', 'worker')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class RssSampler:
+    """Peak resident memory of this process and its descendants while running."""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        if psutil is None:
+            return 0
+        proc = psutil.Process()
+        total = 0
+        for p in [proc] + proc.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        elif resource is not None:
+            # high-water marks since process start, in KB on Linux
+            self.peak = 1024 * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1) if self.peak else None
+
+
+class Bench:
+    """Shared state for one benchmark run (mock site, backend, temp dir, player id source)."""
+
+    def __init__(self, args, url, work_dir):
+        self.args = args
+        self.url = url
+        self.work_dir = Path(work_dir)
+        self._next_player = 700000000
+        self._pool = None
+
+    def players(self, n):
+        start = self._next_player
+        self._next_player += n
+        return [str(start + i) for i in range(n)]
+
+    def pool(self):
+        if self._pool is None:
+            import driver_pool
+            self._pool = driver_pool.DriverPool(size=1, headless=True, url=self.url + '/').start()
+        return self._pool
+
+    def selenium_pool(self):
+        return self.pool() if self.args.backend == 'selenium' else None
+
+    def backend(self):
+        import backends
+        if self.args.backend == 'http':
+            return backends.HttpBackend(base_url=self.url)
+        return backends.SeleniumBackend(pool=self.pool(), headless=True, url=self.url + '/')
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+
+def _timed(n, fn):
+    """Call fn(i) n times; returns (latencies in seconds, errors, wall time)."""
+    latencies, errors = [], 0
+    started = time.monotonic()
+    for i in range(n):
+        t0 = time.monotonic()
+        try:
+            fn(i)
+        except Exception as e:
+            errors += 1
+            print(f'  iteration {i} failed: {e}')
+            continue
+        latencies.append(time.monotonic() - t0)
+    return latencies, errors, time.monotonic() - started
+
+
+def bench_apply(b):
+    backend = b.backend()
+    out = b.work_dir / 'apply'
+    return _timed(b.args.iterations,
+                  lambda i: backend.apply_player_ids(b.players(b.args.players_per_job), out_dir=str(out / str(i))))
+
+
+def bench_status(b):
+    if b.args.backend == 'http':
+        backend = b.backend()
+        return _timed(b.args.iterations, lambda i: backend.fetch_task_status())
+    import status
+    pool = b.pool()
+    out = b.work_dir / 'status'
+    return _timed(b.args.iterations,
+                  lambda i: status.scrape_task_status(out_dir=str(out / str(i)), pool=pool, url=b.url + '/'))
+
+
+def bench_redeem(b):
+    import redeem
+    codes = [f'BENCH{i:04d}' for i in range(b.args.iterations)]
+    backend = b.backend() if b.args.backend == 'http' else None
+    started = time.monotonic()
+    rows = redeem.run_batch(b.url + '/', b.players(1)[0], codes, str(b.work_dir / 'redeem.csv'), headless=True,
+                            per_account_limit=None, pause_between=0, rate=0, pool=b.selenium_pool(), backend=backend)
+    wall = time.monotonic() - started
+    errors = sum(1 for r in rows if str(r.get('result', '')).startswith('error'))
+    return [r['latency_ms'] / 1000.0 for r in rows], errors, wall
+
+
+def bench_worker(b):
+    from webapp import models, tasks
+    models.init_db(str(b.work_dir / 'bench.db'))
+    n, size = b.args.iterations, b.args.players_per_job
+    started = time.monotonic()
+    job_ids = []
+    for _ in range(n):
+        players = b.players(size)
+        job_id = models.create_job(','.join(players))
+        tasks.enqueue_job(job_id, players, backend=b.args.backend)
+        job_ids.append(job_id)
+    pool = tasks.start_worker(b.args.workers)
+    try:
+        deadline = time.monotonic() + b.args.timeout
+        while time.monotonic() < deadline:
+            jobs = [models.get_job(j) for j in job_ids]
+            if all(j['status'] not in ('queued', 'running') for j in jobs):
+                break
+            time.sleep(0.1)
+        wall = time.monotonic() - started
+    finally:
+        pool.stop()
+    latencies, errors = [], 0
+    for j in jobs:
+        if j['status'] != 'submitted' or not j['submitted_at']:
+            errors += 1
+            continue
+        latencies.append((datetime.fromisoformat(j['submitted_at']) - datetime.fromisoformat(j['created_at'])).total_seconds())
+    return latencies, errors, wall
+
+
+RUNNERS = {'apply': bench_apply, 'status': bench_status, 'redeem': bench_redeem, 'worker': bench_worker}
+
+
+def summarize(latencies, errors, wall, peak_mb):
+    done = len(latencies)
+    return {
+        'iterations': done + errors,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        'mean_ms': round(sum(latencies) / done * 1000, 1) if latencies else None,
+        'jobs_per_min': round(done / wall * 60, 1) if wall > 0 else None,
+        'wall_s': round(wall, 2),
+        'peak_rss_mb': peak_mb,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(Path(__file__).resolve().parent),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def _isolate(work_dir, args, url):
+    """Point every piece of shared state at `work_dir` and the mock site (before imports)."""
+    os.environ.pop('REDIS_URL', None)
+    os.environ.update({
+        'WOS_DATA_DIR': str(work_dir / 'jobs_data'),
+        'WOS_METRICS_DIR': str(work_dir / 'metrics'),
+        'WOS_STATUS_SNAPSHOT': str(work_dir / 'status_snapshot.json'),
+        'WOS_SELECTOR_CACHE': str(work_dir / 'selector_cache.json'),
+        'WOS_QUOTA_DB': str(work_dir / 'quota.db'),
+        'WOS_TRACKER': '0',
+        'WOS_BACKEND': args.backend,
+        'WOS_HTTP_BASE_URL': url,
+        'WOS_SITE_URL': url + '/',
+        'WOS_BATCH_WAIT': str(args.batch_wait),
+    })
+
+
+def compare(base, new):
+    """Print per-scenario changes of `new` relative to `base` (both result dicts)."""
+    print(f"\nComparison: {base.get('revision') or base.get('started_at')} -> {new.get('revision') or new.get('started_at')}")
+    for name, cur in new.get('scenarios', {}).items():
+        old = base.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        parts = []
+        for key in ('p50_ms', 'p95_ms', 'jobs_per_min', 'peak_rss_mb'):
+            a, b = old.get(key), cur.get(key)
+            if a and b is not None:
+                parts.append(f'{key} {a} -> {b} ({(b - a) / a * 100:+.0f}%)')
+        print(f'  {name}: ' + ', '.join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the submission code against a local mock site")
+    parser.add_argument("--scenarios", default=','.join(SCENARIOS), help="Comma-separated subset of: " + ', '.join(SCENARIOS))
+    parser.add_argument("--backend", choices=["selenium", "http"], default="http")
+    parser.add_argument("--iterations", type=int, default=20, help="Measured jobs (or codes) per scenario")
+    parser.add_argument("--players-per-job", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the worker scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the mock adds to every response")
+    parser.add_argument("--seed-rows", type=int, default=100, help="Rows pre-populated in the mock Task Status table")
+    parser.add_argument("--complete-after", type=float, default=5.0, help="Seconds until a mock task is done")
+    parser.add_argument("--batch-wait", type=float, default=0.0, help="Worker coalescing wait (WOS_BATCH_WAIT)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Give up on the worker scenario after this many seconds")
+    parser.add_argument("--out", default="results/bench.json", help="JSON file to write results to")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in names if s not in RUNNERS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    from mock_site import start_mock_site
+    server, url = start_mock_site(latency=args.latency, complete_after=args.complete_after, seed_rows=args.seed_rows)
+    work_dir = Path(tempfile.mkdtemp(prefix='wos_bench_'))
+    _isolate(work_dir, args, url)
+    bench = Bench(args, url, work_dir)
+
+    result = {
+        'started_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare', 'keep')},
+        'scenarios': {},
+    }
+    try:
+        for name in names:
+            print(f"Running {name} ({args.backend}, {args.iterations} iterations)...")
+            with RssSampler() as rss:
+                latencies, errors, wall = RUNNERS[name](bench)
+            summary = summarize(latencies, errors, wall, rss.peak_mb)
+            result['scenarios'][name] = summary
+            print(f"  p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, {summary['jobs_per_min']} jobs/min, "
+                  f"{errors} errors, peak RSS {summary['peak_rss_mb']} MB")
+    finally:
+        bench.close()
+        server.shutdown()
+        if args.keep:
+            print(f"Work directory kept at {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(f"Wrote {out}")
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), result)
+
+
+if __name__ == '__main__':
+    main()
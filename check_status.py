@@ -3,23 +3,24 @@
 check_status.py
 
 Open wosrewards.com, navigate to the "Task Status" page and scrape the queue/status table.
-Saves `queue_status.csv` and `queue_status.png` in the workspace.
+Saves `queue_status.csv` in the workspace, and `queue_status.jpg` per `--screenshots`
+(never, on_failure or always; default WOS_SCREENSHOT_POLICY, see screenshots.py).
 
 Usage:
   python check_status.py
+  python check_status.py --max-age 60   # reuse the shared snapshot if it is at most 60s old
 """
 
-import csv
-import time
+import argparse
 from pathlib import Path
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+
+from driver_pool import LAUNCH_PROFILES, launch_with_profile, quit_driver
+from screenshots import POLICIES, POLICY, capture
+from status_snapshot import get_service
+from status_table import extract_task_status, write_status_csv
+from waits import wait_for, page_ready, status_table_rendered, task_status_link
 
 
 def find_click(driver, xpath_expr):
@@ -32,92 +33,65 @@ def find_click(driver, xpath_expr):
 
 
 def main():
-    options = Options()
-    options.add_argument("--start-maximized")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    wait = WebDriverWait(driver, 15)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="Use the shared Task Status snapshot (status_snapshot.py) if it is at most this many seconds old")
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--launch-profile", choices=sorted(LAUNCH_PROFILES), default=None,
+                        help="Chrome launch profile (default: lean when headless, default otherwise)")
+    parser.add_argument("--screenshots", choices=POLICIES, default=POLICY, help="When to save screenshots")
+    args = parser.parse_args()
+
+    if args.max_age is not None:
+        snap = get_service().current()
+        if snap.age <= args.max_age:
+            out_csv = write_status_csv(snap.records, Path("queue_status.csv"))
+            print(f"Wrote {len(snap.records)} rows from snapshot v{snap.version} ({snap.age:.0f}s old) to {out_csv}")
+            return
+
+    driver, _ = launch_with_profile(args.headless, launch_profile=args.launch_profile)
     try:
         driver.get("https://wosrewards.com/")
-        time.sleep(1.0)
+        wait_for(driver, page_ready(), timeout=15, required=False)
 
-        # Try to click the "Task Status" menu link by partial text match
+        # Click the "Task Status" menu link (text match first, then href containing 'task'/'status')
         clicked = False
-        for xpath in ["//a[contains(., 'Task Status') or contains(., 'Task status')]", "//nav//a[contains(translate(., 'TASK STATUS', 'task status'), 'task status')]"]:
-            try:
-                el = driver.find_element(By.XPATH, xpath)
-                el.click()
-                clicked = True
-                break
-            except Exception:
-                continue
-
-        if not clicked:
-            # fallback: find link with href containing 'task' or 'status'
+        link = wait_for(driver, task_status_link(), timeout=10, required=False)
+        if link:
             try:
-                el = driver.find_element(By.XPATH, "//a[contains(@href, 'task') or contains(@href, 'status')]")
-                el.click()
+                link.click()
                 clicked = True
             except Exception:
                 pass
 
         if not clicked:
             print("Could not find 'Task Status' link — you may need to adjust selectors.")
+            out_png = capture(driver, Path("queue_status"), 'failure', policy=args.screenshots)
+            if out_png:
+                print(f"Saved screenshot to {out_png}")
             return
 
-        # wait for page header 'Queue Status' or a table to appear
-        try:
-            wait.until(EC.presence_of_element_located((By.XPATH, "//h1[contains(., 'Queue Status') or contains(., 'Task Status')]") ))
-        except Exception:
-            # proceed anyway
-            pass
-
-        time.sleep(1.0)
-
-        # Attempt to locate a table with tbody rows
-        rows = []
-        try:
-            table = driver.find_element(By.XPATH, "//table")
-            tbody = table.find_element(By.TAG_NAME, "tbody")
-            tr_list = tbody.find_elements(By.TAG_NAME, "tr")
-            for tr in tr_list:
-                cells = tr.find_elements(By.TAG_NAME, "td")
-                texts = [c.text.strip() for c in cells]
-                if texts:
-                    rows.append(texts)
-        except Exception:
-            # fallback: look for list items or rows in divs
-            try:
-                items = driver.find_elements(By.CSS_SELECTOR, ".table-responsive tr, .queue-list li, .task-row")
-                for it in items:
-                    texts = it.text.splitlines()
-                    if texts:
-                        rows.append([" | ".join(texts)])
-            except Exception:
-                pass
+        # wait for the status table to render; proceed anyway on timeout
+        wait_for(driver, status_table_rendered(), timeout=15, required=False)
+
+        # Read the whole table (or list-style fallback) in one round trip
+        records = extract_task_status(driver)
+        get_service().publish(records, source='check_status')
 
-        out_csv = Path("queue_status.csv")
-        if rows:
-            # write CSV with dynamic column count
-            maxcols = max(len(r) for r in rows)
-            headers = [f"col{i+1}" for i in range(maxcols)]
-            with out_csv.open("w", encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(headers)
-                for r in rows:
-                    # pad
-                    writer.writerow(r + [""] * (maxcols - len(r)))
-            print(f"Wrote {len(rows)} rows to {out_csv}")
+        out_csv = write_status_csv(records, Path("queue_status.csv"))
+        if out_csv:
+            print(f"Wrote {len(records)} rows to {out_csv}")
         else:
             print("No table rows found on Task Status page.")
 
-        # screenshot the page
-        out_png = Path("queue_status.png")
-        driver.save_screenshot(str(out_png))
-        print(f"Saved screenshot to {out_png}")
+        # screenshot the table (the whole page if it came back empty)
+        out_png = capture(driver, Path("queue_status"), 'success' if records else 'failure',
+                          selector='table' if records else None, policy=args.screenshots)
+        if out_png:
+            print(f"Saved screenshot to {out_png}")
 
     finally:
-        time.sleep(1)
-        driver.quit()
+        quit_driver(driver)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,238 @@
+"""
+chrome_profiles.py
+
+Cheap per-session copies of a Chrome user profile.
+
+Chrome refuses to share a profile directory between running browsers. So far every job
+copied the whole profile (often hundreds of MB, mostly caches) to a temp dir and removed it
+afterwards. Instead:
+
+  1. snapshot() builds a trimmed "golden" copy once: caches, crash dumps and lock files are
+     left out. It is rebuilt only when the source profile changes (size/mtime of Local
+     State and of every file it copies, including Network/Cookies and Local Storage).
+  2. provision() hands out a private copy of the snapshot per browser session. Files are
+     reflinked (copy-on-write, e.g. btrfs/XFS) when the filesystem supports it. Files Chrome
+     never rewrites in place (extensions, dictionaries) are hardlinked. Everything else is
+     copied, which is now only the small set of files a logged-in profile needs.
+
+    with provision(user_data_dir, 'Default') as profile:
+        options = build_options(user_data_dir=profile.user_data_dir,
+                                profile_directory=profile.profile_directory)
+
+Snapshots live under WOS_PROFILE_SNAPSHOTS (default <tmp>/wos_profile_snapshots) and are
+shared by every session and process on the machine.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+SNAPSHOT_ROOT = os.environ.get('WOS_PROFILE_SNAPSHOTS', os.path.join(tempfile.gettempdir(), 'wos_profile_snapshots'))
+
+# regenerated by Chrome on demand; never needed to stay logged in
+SKIP_DIRS = {
+    'Cache', 'Code Cache', 'GPUCache', 'ShaderCache', 'GrShaderCache', 'GraphiteDawnCache',
+    'DawnCache', 'DawnGraphiteCache', 'DawnWebGPUCache', 'Media Cache', 'Application Cache',
+    'CacheStorage', 'ScriptCache', 'blob_storage', 'Crashpad', 'Crash Reports',
+    'optimization_guide_model_store', 'optimization_guide_prediction_model_downloads',
+    'Download Service', 'VideoDecodeStats', 'BudgetDatabase', 'Feature Engagement Tracker',
+}
+SKIP_FILES = {'SingletonLock', 'SingletonCookie', 'SingletonSocket', 'lockfile', 'LOCK', 'LOG', 'LOG.old'}
+# Chrome only ever replaces files in these trees, never rewrites them in place
+HARDLINK_DIRS = {'Extensions', 'Dictionaries'}
+
+_FICLONE = 0x40049409
+_no_reflink_devs = set()
+_lock = threading.Lock()
+
+
+def _skip(name, is_dir):
+    return name in SKIP_DIRS if is_dir else (name in SKIP_FILES or name.endswith('.tmp'))
+
+
+def _copied_files(src, rel=''):
+    """(relative path, DirEntry) of every file _copy_tree copies from `src`."""
+    with os.scandir(src) as it:
+        entries = list(it)
+    for entry in entries:
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if _skip(entry.name, is_dir) or entry.is_symlink():
+            continue
+        path = f'{rel}/{entry.name}' if rel else entry.name
+        if is_dir:
+            yield from _copied_files(entry.path, path)
+        else:
+            yield path, entry
+
+
+def _source_signature(user_data_dir, profile_directory):
+    """Size and mtime of Local State and every file the snapshot copies, so a cookie
+    written to e.g. Default/Network/Cookies also rebuilds it."""
+    h = hashlib.sha1()
+    try:
+        st = (Path(user_data_dir) / 'Local State').stat()
+        h.update(f'Local State:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    except OSError:
+        pass
+    for path, entry in sorted(_copied_files(os.path.join(user_data_dir, profile_directory)), key=lambda e: e[0]):
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        h.update(f'{path}:{st.st_size}:{st.st_mtime_ns};'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def _reflink(src, dst):
+    """Copy-on-write clone of one file (Linux FICLONE). False when unsupported here."""
+    if fcntl is None:
+        return False
+    dev = os.stat(os.path.dirname(dst) or '.').st_dev
+    if dev in _no_reflink_devs:
+        return False
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        _no_reflink_devs.add(dev)
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _copy_tree(src, dst, clone=False, counts=None, linkable=False):
+    """Copy `src` to `dst` minus caches. With clone=True use reflinks/hardlinks when possible."""
+    os.makedirs(dst, exist_ok=True)
+    with os.scandir(src) as it:
+        entries = list(it)
+    for entry in entries:
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if _skip(entry.name, is_dir) or entry.is_symlink():
+            continue
+        target = os.path.join(dst, entry.name)
+        if is_dir:
+            _copy_tree(entry.path, target, clone, counts, linkable or entry.name in HARDLINK_DIRS)
+            continue
+        method = 'copy'
+        if clone and _reflink(entry.path, target):
+            method = 'reflink'
+        elif clone and linkable:
+            try:
+                os.link(entry.path, target)
+                method = 'hardlink'
+            except OSError:
+                shutil.copy2(entry.path, target)
+        else:
+            try:
+                shutil.copy2(entry.path, target)
+            except OSError:
+                # files held open by a running Chrome (e.g. on Windows) are skipped
+                continue
+        if counts is not None:
+            counts[method] = counts.get(method, 0) + 1
+
+
+class _FileLock:
+    """Exclusive lock across threads and (where fcntl exists) processes."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        _lock.acquire()
+        self._fh = None
+        if fcntl is not None:
+            self._fh = open(self.path, 'a')
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+        _lock.release()
+
+
+def _snapshot_key(user_data_dir, profile_directory):
+    src = os.path.abspath(os.path.join(user_data_dir, profile_directory))
+    return hashlib.sha1(src.encode('utf-8')).hexdigest()[:16]
+
+
+def snapshot(user_data_dir, profile_directory, root=SNAPSHOT_ROOT):
+    """Path of the golden 'User Data' dir for this profile, (re)building it if needed."""
+    src_profile = os.path.join(user_data_dir, profile_directory)
+    if not os.path.isdir(src_profile):
+        raise FileNotFoundError(src_profile)
+    os.makedirs(root, exist_ok=True)
+    key = _snapshot_key(user_data_dir, profile_directory)
+    base = Path(root) / key
+    with _FileLock(str(base) + '.lock'):
+        return _snapshot_locked(user_data_dir, profile_directory, base)
+
+
+def _snapshot_locked(user_data_dir, profile_directory, base):
+    golden = base / 'User Data'
+    sig = _source_signature(user_data_dir, profile_directory)
+    sig_file = base / 'source.sig'
+    if golden.is_dir() and sig_file.exists() and sig_file.read_text() == sig:
+        return golden
+
+    started = time.monotonic()
+    building = Path(f'{base}.build-{os.getpid()}')
+    shutil.rmtree(building, ignore_errors=True)
+    _copy_tree(os.path.join(user_data_dir, profile_directory), str(building / 'User Data' / profile_directory))
+    local_state = os.path.join(user_data_dir, 'Local State')
+    if os.path.exists(local_state):
+        shutil.copy2(local_state, building / 'User Data' / 'Local State')
+    (building / 'source.sig').write_text(sig)
+    if base.exists():
+        old = Path(f'{base}.old-{os.getpid()}')
+        os.replace(base, old)
+        shutil.rmtree(old, ignore_errors=True)
+    os.replace(building, base)
+    print(f'Built profile snapshot for {profile_directory} in {time.monotonic() - started:.1f}s')
+    return golden
+
+
+class ProfileCopy:
+    """A private, disposable copy of a profile snapshot for one browser session."""
+
+    def __init__(self, root, profile_directory, counts):
+        self.root = root
+        self.user_data_dir = str(Path(root) / 'User Data')
+        self.profile_directory = profile_directory
+        self.counts = counts
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+def provision(user_data_dir, profile_directory, root=SNAPSHOT_ROOT):
+    """Fresh ProfileCopy of `profile_directory` in `user_data_dir` (see module docstring)."""
+    golden = snapshot(user_data_dir, profile_directory, root=root)
+    sessions = Path(root) / 'sessions'
+    sessions.mkdir(parents=True, exist_ok=True)
+    # next to the snapshot so reflinks and hardlinks stay on one filesystem
+    dest = tempfile.mkdtemp(prefix='wos_profile_', dir=str(sessions))
+    counts = {}
+    with _FileLock(str(golden.parent) + '.lock'):
+        _copy_tree(str(golden), os.path.join(dest, 'User Data'), clone=True, counts=counts)
+    return ProfileCopy(dest, profile_directory, counts)
@@ -0,0 +1,455 @@
+"""
+driver_pool.py
+
+Keep a few headless Chrome sessions warm (already on the landing page) so jobs can
+borrow a driver instead of paying browser cold start every time.
+
+Usage:
+    pool = get_pool(headless=True)
+    with pool.session() as driver:
+        ...  # driver is on https://wosrewards.com/ with an empty textarea
+
+Tuning (environment variables):
+    WOS_POOL_SIZE        number of warm sessions (default 2, 0 disables pooling)
+    WOS_POOL_MAX_JOBS    recycle a session after this many jobs (default 50)
+    WOS_POOL_MAX_RSS_MB  recycle a session when Chrome uses more memory than this (default 800)
+    WOS_SITE_URL         landing page to park sessions on (default https://wosrewards.com/)
+    WOS_USER_DATA_DIR    Chrome user data dir whose profile pooled sessions should use (optional)
+    WOS_PROFILE_DIRECTORY  profile inside it, e.g. Default; each session gets its own copy
+                         (see chrome_profiles.py)
+    WOS_LAUNCH_PROFILE   Chrome launch profile, see LAUNCH_PROFILES (default: lean when
+                         headless, default otherwise)
+    CHROMEDRIVER_PATH    chromedriver binary to use; otherwise it is resolved once with
+                         webdriver-manager and remembered in WOS_CHROMEDRIVER_CACHE
+
+Selenium and webdriver-manager are imported only when a browser is actually built, so the
+web tier can import this module (e.g. for LAUNCH_PROFILES) without loading them.
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from chrome_profiles import provision
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+SITE_URL = os.environ.get('WOS_SITE_URL', 'https://wosrewards.com/')
+
+# JS used to put a borrowed session back into a clean state without a reload
+_RESET_JS = """
+var t = document.querySelector('textarea');
+if (t) { t.value = ''; t.dispatchEvent(new Event('input', {bubbles: true})); }
+return document.readyState;
+"""
+
+
+# URL patterns (Network.setBlockedURLs wildcards) the lean profile never loads: images,
+# fonts, media and analytics/ads hosts. Captcha providers are deliberately not listed.
+LEAN_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*facebook.net*', '*connect.facebook.com*', '*hotjar.com*', '*clarity.ms*', '*segment.io*',
+    '*fonts.googleapis.com*', '*fonts.gstatic.com*',
+]
+
+# Named launch profiles. 'default' is the original behaviour (maximized window, everything
+# loaded). 'lean' is for unattended runs: small viewport, no images/fonts/analytics, eager
+# page loads and flags that keep each Chrome's memory and background traffic down.
+LAUNCH_PROFILES = {
+    'default': {
+        'args': ['--start-maximized'],
+    },
+    'lean': {
+        'args': [
+            '--window-size=1024,768',
+            '--blink-settings=imagesEnabled=false',
+            '--disable-background-networking',
+            '--disable-background-timer-throttling',
+            '--disable-component-update',
+            '--disable-default-apps',
+            '--disable-extensions',
+            '--disable-sync',
+            '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication',
+            '--disable-dev-shm-usage',
+            '--metrics-recording-only',
+            '--mute-audio',
+            '--no-first-run',
+            '--renderer-process-limit=2',
+            '--js-flags=--max-old-space-size=256',
+        ],
+        'page_load_strategy': 'eager',
+        'blocked_urls': LEAN_BLOCKED_URLS,
+    },
+}
+
+
+def resolve_launch_profile(name=None, headless=False):
+    """Profile name to use: explicit name, else WOS_LAUNCH_PROFILE, else lean for headless runs."""
+    name = name or os.environ.get('WOS_LAUNCH_PROFILE') or ('lean' if headless else 'default')
+    if name not in LAUNCH_PROFILES:
+        raise ValueError(f'unknown launch profile: {name}')
+    return name
+
+
+def build_options(headless=False, user_data_dir=None, profile_directory=None, launch_profile=None):
+    """Chrome options shared by every flow in the project.
+
+    `launch_profile` picks an entry of LAUNCH_PROFILES. URL blocking can only be switched
+    on once Chrome runs, so the patterns travel on `options.blocked_urls` to launch_driver().
+    """
+    from selenium.webdriver.chrome.options import Options
+
+    profile = LAUNCH_PROFILES[resolve_launch_profile(launch_profile, headless)]
+    options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+    for arg in profile.get('args', []):
+        options.add_argument(arg)
+    if profile.get('page_load_strategy'):
+        options.page_load_strategy = profile['page_load_strategy']
+    options.blocked_urls = list(profile.get('blocked_urls', []))
+    if user_data_dir:
+        options.add_argument(f'--user-data-dir={user_data_dir}')
+        # let Chrome pick a free port; a fixed one breaks concurrent profile sessions
+        options.add_argument('--remote-debugging-port=0')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-gpu')
+    if profile_directory:
+        options.add_argument(f'--profile-directory={profile_directory}')
+    return options
+
+
+CHROMEDRIVER_CACHE = os.environ.get('WOS_CHROMEDRIVER_CACHE',
+                                    os.path.join(os.path.expanduser('~'), '.cache', 'wos', 'chromedriver_path'))
+_chromedriver = None
+_chromedriver_lock = threading.Lock()
+
+
+def chromedriver_path():
+    """Path of the chromedriver binary, resolved once and cached on disk.
+
+    Order: CHROMEDRIVER_PATH, the path cached by an earlier run (if the file still exists),
+    then webdriver-manager (which may download; the result is written to the cache file).
+    Returns None if nothing works, leaving the lookup to Selenium Manager.
+    """
+    global _chromedriver
+    with _chromedriver_lock:
+        if _chromedriver:
+            return _chromedriver
+        path = os.environ.get('CHROMEDRIVER_PATH')
+        cache = Path(CHROMEDRIVER_CACHE)
+        if not path and cache.exists():
+            cached = cache.read_text(encoding='utf-8').strip()
+            if cached and os.path.exists(cached):
+                path = cached
+        if not path:
+            try:
+                from webdriver_manager.chrome import ChromeDriverManager
+                path = ChromeDriverManager().install()
+                cache.parent.mkdir(parents=True, exist_ok=True)
+                cache.write_text(path, encoding='utf-8')
+            except Exception as e:
+                print('Could not resolve chromedriver with webdriver-manager:', e)
+                path = None
+        _chromedriver = path
+        return path
+
+
+def chrome_service():
+    from selenium.webdriver.chrome.service import Service
+    path = chromedriver_path()
+    return Service(path) if path else Service()
+
+
+def launch_driver(options):
+    """Start a new Chrome session with the given options."""
+    from selenium import webdriver
+    driver = webdriver.Chrome(service=chrome_service(), options=options)
+    if getattr(options, 'blocked_urls', None):
+        block_urls(driver, options.blocked_urls)
+    return driver
+
+
+def launch_with_profile(headless=False, user_data_dir=None, profile_directory=None, launch_profile=None):
+    """Launch Chrome, on a private copy of the given user profile if one is requested.
+
+    Returns (driver, profile_copy); call profile_copy.cleanup() after quitting the driver
+    (profile_copy is None without a profile, or if provisioning failed and the original
+    directory is used directly).
+    """
+    profile = None
+    if user_data_dir and profile_directory:
+        try:
+            profile = provision(user_data_dir, profile_directory)
+        except Exception as e:
+            print('Could not provision a profile copy, using the profile directly:', e)
+    options = build_options(headless=headless, user_data_dir=profile.user_data_dir if profile else user_data_dir,
+                            profile_directory=profile_directory if user_data_dir else None,
+                            launch_profile=launch_profile)
+    try:
+        return launch_driver(options), profile
+    except Exception:
+        if profile is not None:
+            profile.cleanup()
+        raise
+
+
+def block_urls(driver, patterns):
+    """Make Chrome drop requests matching `patterns` (DevTools Network.setBlockedURLs)."""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+    except Exception as e:
+        print('Could not enable request blocking:', e)
+
+
+# bytes and requests behind the current page, from the Resource Timing API
+_PAGE_WEIGHT_JS = """
+var nav = performance.getEntriesByType('navigation')[0] || {};
+var res = performance.getEntriesByType('resource');
+var bytes = nav.transferSize || 0;
+for (var i = 0; i < res.length; i++) bytes += res[i].transferSize || 0;
+return {requests: res.length + 1, transfer_bytes: bytes,
+        dom_content_loaded_ms: Math.round(nav.domContentLoadedEventEnd || 0)};
+"""
+
+
+def page_weight(driver):
+    """{'requests', 'transfer_bytes', 'dom_content_loaded_ms', 'rss_mb'} for the loaded page."""
+    try:
+        weight = driver.execute_script(_PAGE_WEIGHT_JS) or {}
+    except Exception:
+        weight = {}
+    rss = driver_rss_mb(driver)
+    weight['rss_mb'] = round(rss, 1) if rss is not None else None
+    return weight
+
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def driver_rss_mb(driver):
+    """Resident memory (MB) of chromedriver and all Chrome processes it spawned, or None."""
+    if psutil is None:
+        return None
+    try:
+        proc = psutil.Process(driver.service.process.pid)
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                continue
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class PooledSession:
+    """A warm driver plus the bookkeeping needed to decide when to recycle it."""
+
+    def __init__(self, driver, profile=None):
+        self.driver = driver
+        self.profile = profile
+        self.jobs = 0
+        self.created_at = time.time()
+
+
+class DriverPool:
+    """Fixed-size pool of pre-launched Chrome sessions parked on the landing page."""
+
+    def __init__(self, size=2, headless=True, url=SITE_URL, max_jobs=50, max_rss_mb=800, acquire_timeout=120,
+                 launch_profile=None, user_data_dir=None, profile_directory=None):
+        self.size = max(1, int(size))
+        self.headless = headless
+        self.launch_profile = resolve_launch_profile(launch_profile, headless)
+        self.user_data_dir = user_data_dir
+        self.profile_directory = profile_directory
+        self.url = url
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        """Launch sessions until the pool is full. Safe to call more than once."""
+        while True:
+            with self._lock:
+                if self._closed or self._live >= self.size:
+                    return self
+                self._live += 1
+            try:
+                self._idle.put(self._new_session())
+            except Exception as e:
+                with self._lock:
+                    self._live -= 1
+                print('DriverPool: failed to launch session:', e)
+                return self
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(session)
+            with self._lock:
+                self._live -= 1
+
+    def _new_session(self):
+        driver, profile = launch_with_profile(self.headless, self.user_data_dir, self.profile_directory,
+                                              self.launch_profile)
+        session = PooledSession(driver, profile)
+        try:
+            driver.get(self.url)
+        except Exception:
+            self._quit(session)
+            raise
+        return session
+
+    def _quit(self, session):
+        quit_driver(session.driver)
+        if session.profile is not None:
+            session.profile.cleanup()
+
+    # -- borrow / return -----------------------------------------------------
+
+    def acquire(self):
+        """Borrow a healthy session, launching one if the pool is not full yet."""
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                session = None
+                with self._lock:
+                    can_grow = not self._closed and self._live < self.size
+                    if can_grow:
+                        self._live += 1
+                if can_grow:
+                    try:
+                        return self._new_session()
+                    except Exception:
+                        with self._lock:
+                            self._live -= 1
+                        raise
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError('no browser session available in pool')
+                try:
+                    session = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+
+            if self._healthy(session):
+                return session
+            self._discard(session)
+
+    def release(self, session, broken=False):
+        """Return a session. Broken or worn-out sessions are replaced in the background."""
+        session.jobs += 1
+        if broken or self._closed or self._needs_recycle(session):
+            self._discard(session)
+            if not self._closed:
+                threading.Thread(target=self.start, daemon=True).start()
+            return
+        try:
+            self._reset(session.driver)
+        except Exception:
+            self._discard(session)
+            threading.Thread(target=self.start, daemon=True).start()
+            return
+        self._idle.put(session)
+
+    @contextmanager
+    def session(self):
+        """Context manager yielding a driver; the session is returned (or recycled) on exit."""
+        session = self.acquire()
+        broken = False
+        try:
+            yield session.driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(session, broken=broken)
+
+    # -- health --------------------------------------------------------------
+
+    def _healthy(self, session):
+        try:
+            session.driver.execute_script('return document.readyState')
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycle(self, session):
+        if self.max_jobs and session.jobs >= self.max_jobs:
+            return True
+        if self.max_rss_mb:
+            rss = driver_rss_mb(session.driver)
+            if rss is not None and rss > self.max_rss_mb:
+                return True
+        return False
+
+    def _reset(self, driver):
+        if driver.current_url.rstrip('/') != self.url.rstrip('/'):
+            driver.get(self.url)
+        driver.execute_script(_RESET_JS)
+
+    def _discard(self, session):
+        self._quit(session)
+        with self._lock:
+            self._live -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'live': self._live, 'idle': self._idle.qsize(), 'launch_profile': self.launch_profile}
+
+
+_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(headless=True, launch_profile=None):
+    """Process-wide pool configured from the environment (None when pooling is disabled).
+
+    There is one pool per launch profile. Sessions are launched lazily on first use.
+    """
+    size = int(os.environ.get('WOS_POOL_SIZE', '2'))
+    if size <= 0:
+        return None
+    name = resolve_launch_profile(launch_profile, headless)
+    with _POOL_LOCK:
+        if name not in _POOLS:
+            _POOLS[name] = DriverPool(
+                size=size,
+                headless=headless,
+                max_jobs=int(os.environ.get('WOS_POOL_MAX_JOBS', '50')),
+                max_rss_mb=int(os.environ.get('WOS_POOL_MAX_RSS_MB', '800')),
+                launch_profile=name,
+                user_data_dir=os.environ.get('WOS_USER_DATA_DIR') or None,
+                profile_directory=os.environ.get('WOS_PROFILE_DIRECTORY') or None,
+            )
+        return _POOLS[name]
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+loadtest.py
+
+Load test of the web tier and the job queue, without browsers.
+
+Starts the Flask app under gunicorn and a job worker (`python -m webapp.worker`) whose
+backend is the http one pointed at an in-process mock_site.py, so jobs complete without
+Chrome. Then it fires a weighted mix of requests from several client threads:
+
+  index       GET  /            renders every player
+  add_player  POST /add_player  one INSERT
+  apply       POST /apply       create_job INSERT + enqueue (file queue)
+  jobs        GET  /jobs        first page of the jobs listing
+  job         GET  /job/<id>    one job
+  api_jobs    GET  /api/jobs    JSON listing
+
+and reports, per request type, latency percentiles and throughput, plus:
+
+  enqueue throughput   /apply requests that created and enqueued a job, per second
+  drain throughput     jobs the worker submitted during the run, per second
+  SQLite contention    write-lock waits (BEGIN IMMEDIATE) and "database is locked" errors,
+                       summed over all web and worker processes (metrics.py)
+
+Usage:
+  python loadtest.py --duration 30 --concurrency 16
+  python loadtest.py --mix apply=5,jobs=1 --gunicorn-workers 4 --workers 2 --seed-jobs 20000
+
+The database, queue, job data and metrics live in a temporary directory (WOS_DB,
+WOS_DATA_DIR, WOS_METRICS_DIR); REDIS_URL is ignored unless --redis-url is given, so
+production queues are never touched.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from bench import percentile
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_MIX = 'index=1,add_player=1,apply=3,jobs=3,job=2,api_jobs=1'
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class LoadTest:
+    def __init__(self, args, base_url):
+        self.args = args
+        self.base = base_url
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.enqueued = 0
+        self.max_job_id = args.seed_jobs
+        self._ids = iter(range(800000000, 900000000))
+
+    def _new_ids(self, n):
+        with self.lock:
+            return [str(next(self._ids)) for _ in range(n)]
+
+    def _record(self, op, seconds, ok):
+        with self.lock:
+            if ok:
+                self.samples.setdefault(op, []).append(seconds)
+            else:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+    def request(self, session, op, rng):
+        """One request of type `op`; returns True when the app answered as expected."""
+        if op == 'index':
+            r = session.get(self.base + '/')
+            return r.status_code == 200
+        if op == 'add_player':
+            r = session.post(self.base + '/add_player', data={'player_id': self._new_ids(1)[0]}, allow_redirects=False)
+            return r.status_code == 302
+        if op == 'apply':
+            r = session.post(self.base + '/apply', data={'player': self._new_ids(self.args.players_per_apply), 'backend': 'http'},
+                             allow_redirects=False)
+            if r.status_code == 302 and r.headers.get('Location', '').rstrip('/').endswith('/jobs'):
+                with self.lock:
+                    self.enqueued += 1
+                    self.max_job_id += 1
+            return r.status_code == 302
+        if op == 'jobs':
+            r = session.get(self.base + '/jobs')
+            return r.status_code == 200
+        if op == 'job':
+            r = session.get(f'{self.base}/job/{rng.randint(1, max(1, self.max_job_id))}', allow_redirects=False)
+            return r.status_code in (200, 302)
+        if op == 'api_jobs':
+            r = session.get(self.base + '/api/jobs')
+            return r.status_code == 200
+        raise ValueError(f'unknown request type: {op}')
+
+    def client(self, seed, deadline, mix):
+        rng = random.Random(seed)
+        ops, weights = list(mix), list(mix.values())
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            op = rng.choices(ops, weights)[0]
+            t0 = time.monotonic()
+            try:
+                ok = self.request(session, op, rng)
+            except requests.RequestException:
+                ok = False
+            self._record(op, time.monotonic() - t0, ok)
+
+    def run(self, mix):
+        deadline = time.monotonic() + self.args.duration
+        threads = [threading.Thread(target=self.client, args=(i, deadline, mix), daemon=True)
+                   for i in range(self.args.concurrency)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.monotonic() - started
+
+
+def _latency_summary(samples, errors, wall):
+    return {
+        'requests': len(samples) + errors,
+        'errors': errors,
+        'rps': round(len(samples) / wall, 1) if wall else None,
+        'p50_ms': round(percentile(samples, 50) * 1000, 1) if samples else None,
+        'p95_ms': round(percentile(samples, 95) * 1000, 1) if samples else None,
+        'p99_ms': round(percentile(samples, 99) * 1000, 1) if samples else None,
+        'max_ms': round(max(samples) * 1000, 1) if samples else None,
+    }
+
+
+def _bucket_quantile(buckets, counts, q):
+    """Upper bound of the histogram bucket holding quantile `q` (None for the +Inf bucket)."""
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bound, n in zip(list(buckets) + [None], counts):
+        seen += n
+        if seen >= q * total:
+            return bound
+    return None
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def lock_contention(metrics_dir):
+    import metrics
+    # this process only seeded the database; count the web and worker processes
+    reg = metrics.collect(metrics_dir, include_self=False)
+    h = reg.histograms.get(('wos_db_lock_wait_seconds', ()))
+    errors = reg.counters.get(('wos_db_lock_errors_total', ()), 0)
+    if not h:
+        return {'transactions': 0, 'lock_errors': errors}
+    counts, total_wait = h[:-1], h[-1]
+    n = sum(counts)
+    return {
+        'transactions': n,
+        'lock_errors': errors,
+        'mean_wait_ms': round(total_wait / n * 1000, 2) if n else None,
+        'p50_wait_le_ms': _ms(_bucket_quantile(metrics.BUCKETS, counts, 0.5)),
+        'p95_wait_le_ms': _ms(_bucket_quantile(metrics.BUCKETS, counts, 0.95)),
+        'waits_over_10ms': sum(c for b, c in zip(list(metrics.BUCKETS) + [None], counts) if b is None or b > 0.01),
+    }
+
+
+def _job_counts(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+    finally:
+        conn.close()
+
+
+def seed(args):
+    """Fill the temporary database (WOS_DB) with players and finished jobs."""
+    from webapp import models
+    models.init_db(os.environ['WOS_DB'])
+    now = datetime.utcnow().isoformat()
+    with models.transaction() as conn:
+        conn.executemany('INSERT OR IGNORE INTO players(player_id) VALUES (?)',
+                         [(str(600000000 + i),) for i in range(args.seed_players)])
+        conn.executemany('INSERT INTO jobs(player_ids, status, created_at, finished_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                         [(f'{600000000 + i}', 'done', now, now, now) for i in range(args.seed_jobs)])
+
+
+def _wait_ready(url, proc, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {proc.returncode}')
+        try:
+            if requests.get(url + '/api/jobs?limit=1', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def _stop(proc, timeout=15.0):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web app and job queue (no browsers)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted request mix (default {DEFAULT_MIX})")
+    parser.add_argument("--players-per-apply", type=int, default=3)
+    parser.add_argument("--gunicorn-workers", type=int, default=2)
+    parser.add_argument("--gunicorn-threads", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="Job worker processes (0 = let the queue grow)")
+    parser.add_argument("--seed-players", type=int, default=200, help="Players rendered by /")
+    parser.add_argument("--seed-jobs", type=int, default=5000, help="Finished jobs already in the database")
+    parser.add_argument("--redis-url", default=None, help="Use this (test!) Redis for the queue instead of the file queue")
+    parser.add_argument("--out", default="results/loadtest.json", help="JSON file to write results to")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - {'index', 'add_player', 'apply', 'jobs', 'job', 'api_jobs'}
+    if unknown:
+        parser.error(f"unknown request type(s): {', '.join(sorted(unknown))}")
+
+    from mock_site import start_mock_site
+    mock, mock_url = start_mock_site(complete_after=1.0)
+    work_dir = Path(tempfile.mkdtemp(prefix='wos_loadtest_'))
+    os.environ.pop('REDIS_URL', None)
+    if args.redis_url:
+        os.environ['REDIS_URL'] = args.redis_url
+    os.environ.update({
+        'WOS_DB': str(work_dir / 'app.db'),
+        'WOS_DATA_DIR': str(work_dir / 'jobs_data'),
+        'WOS_METRICS_DIR': str(work_dir / 'metrics'),
+        'WOS_METRICS_FLUSH_INTERVAL': '1',
+        'WOS_STATUS_SNAPSHOT': str(work_dir / 'status_snapshot.json'),
+        'WOS_BACKEND': 'http',
+        'WOS_HTTP_BASE_URL': mock_url,
+        'WOS_TRACKER': '0',
+    })
+    seed(args)
+
+    port = _free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PYTHONPATH=str(BASE_DIR) + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    web = worker = None
+    result = {'started_at': datetime.utcnow().isoformat(), 'config': {k: v for k, v in vars(args).items() if k not in ('out', 'keep')}}
+    try:
+        web = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(args.gunicorn_workers),
+                                '--threads', str(args.gunicorn_threads), '-b', f'127.0.0.1:{port}',
+                                '--log-level', 'warning', 'webapp.app:app'], cwd=str(BASE_DIR), env=env)
+        if args.workers:
+            worker = subprocess.Popen([sys.executable, '-m', 'webapp.worker', '--workers', str(args.workers)],
+                                      cwd=str(BASE_DIR), env=env, stdout=subprocess.DEVNULL)
+        _wait_ready(base_url, web)
+        before = _job_counts(os.environ['WOS_DB'])
+
+        print(f"Load: {args.concurrency} clients for {args.duration:.0f}s against {args.gunicorn_workers} gunicorn "
+              f"worker(s), {args.workers} job worker(s); mix {mix}")
+        test = LoadTest(args, base_url)
+        wall = test.run(mix)
+        after = _job_counts(os.environ['WOS_DB'])
+    finally:
+        _stop(web)
+        _stop(worker)
+        mock.shutdown()
+
+    ops = sorted(set(test.samples) | set(test.errors))
+    result['requests'] = {op: _latency_summary(test.samples.get(op, []), test.errors.get(op, 0), wall) for op in ops}
+    all_samples = [s for v in test.samples.values() for s in v]
+    result['total'] = _latency_summary(all_samples, sum(test.errors.values()), wall)
+    submitted = after.get('submitted', 0) - before.get('submitted', 0)
+    result['queue'] = {
+        'enqueued': test.enqueued,
+        'enqueue_per_s': round(test.enqueued / wall, 1),
+        'drained': submitted,
+        'drain_per_s': round(submitted / wall, 1),
+        'backlog': after.get('queued', 0) + after.get('running', 0),
+        'job_statuses': after,
+    }
+    result['sqlite'] = lock_contention(work_dir / 'metrics')
+
+    print(f"\n{'request':<11}{'count':>8}{'errors':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for op, s in list(result['requests'].items()) + [('total', result['total'])]:
+        print(f"{op:<11}{s['requests']:>8}{s['errors']:>8}{s['rps'] or 0:>8}{s['p50_ms'] or '-':>9}"
+              f"{s['p95_ms'] or '-':>9}{s['p99_ms'] or '-':>9}{s['max_ms'] or '-':>9}")
+    q = result['queue']
+    print(f"\nEnqueued {q['enqueued']} jobs ({q['enqueue_per_s']}/s); worker submitted {q['drained']} "
+          f"({q['drain_per_s']}/s); backlog {q['backlog']}")
+    print(f"SQLite: {json.dumps(result['sqlite'])}")
+
+    if args.keep:
+        print(f"Work directory kept at {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(f"Wrote {out}")
+
+
+if __name__ == '__main__':
+    main()
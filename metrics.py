@@ -0,0 +1,285 @@
+"""
+metrics.py
+
+Stage timings and counters, exposed in the Prometheus text format by the web app's /metrics.
+
+Code under measurement wraps each step in a stage:
+
+    with stage('page_load'):
+        driver.get(url)
+
+A stage feeds the `wos_stage_seconds{stage=...}` histogram. It is also added to the
+timings a caller is collecting for the current thread, which is how a worker gets the
+per-stage breakdown it stores on the job row:
+
+    with collect_timings() as timings:
+        run_the_job()
+    # timings == {'driver_acquire': 0.01, 'page_load': 1.93, ...}
+
+Jobs run in worker processes while /metrics is served by the web app, so every process
+keeps its own registry and flush() writes it to WOS_METRICS_DIR (default jobs_data/metrics)
+as <host>-<pid>.json. /metrics sums all files, the same way Prometheus client libraries
+handle multi-process servers. Counters therefore survive worker restarts. flush() also
+folds the files of exited processes on this host into <host>-dead.json and deletes them,
+so the directory does not grow with every restart.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+METRICS_DIR = Path(os.environ.get('WOS_METRICS_DIR')
+                   or Path(os.environ.get('WOS_DATA_DIR') or Path(__file__).resolve().parent / 'jobs_data') / 'metrics')
+
+# seconds; covers an uncontended SQLite lock up to a slow browser job
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HELP = {
+    'wos_stage_seconds': ('histogram', 'Time spent per stage of the automation flows and the worker'),
+    'wos_jobs_total': ('counter', 'Jobs by outcome'),
+    'wos_db_lock_wait_seconds': ('histogram', 'Wait for the SQLite write lock (BEGIN IMMEDIATE)'),
+    'wos_db_lock_errors_total': ('counter', 'Write transactions that failed with "database is locked"'),
+}
+
+# web processes serve requests, not jobs; they flush at most this often (see maybe_flush)
+FLUSH_INTERVAL = float(os.environ.get('WOS_METRICS_FLUSH_INTERVAL', '5'))
+# how often flush() looks for files of exited processes
+FOLD_INTERVAL = 60.0
+
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self.histograms = {}
+
+    def inc(self, name, labels=None, value=1):
+        k = _key(name, labels)
+        with self._lock:
+            self.counters[k] = self.counters.get(k, 0) + value
+
+    def observe(self, name, value, labels=None):
+        k = _key(name, labels)
+        with self._lock:
+            h = self.histograms.setdefault(k, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    h[i] += 1
+                    break
+            else:
+                h[len(BUCKETS)] += 1
+            h[-1] += value
+
+    def to_dict(self):
+        with self._lock:
+            return {'counters': [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                    'histograms': [[n, dict(l), list(h)] for (n, l), h in self.histograms.items()]}
+
+    def merge(self, data):
+        with self._lock:
+            for n, labels, v in data.get('counters', []):
+                k = _key(n, labels)
+                self.counters[k] = self.counters.get(k, 0) + v
+            for n, labels, h in data.get('histograms', []):
+                if len(h) != len(BUCKETS) + 2:
+                    continue  # written with other buckets
+                cur = self.histograms.setdefault(_key(n, labels), [0] * len(h))
+                for i, v in enumerate(h):
+                    cur[i] += v
+
+
+REGISTRY = Registry()
+
+
+def _after_fork():
+    # a forked child (e.g. a pool worker) would otherwise write the parent's counters to its
+    # own file as well, counting them twice; a fresh lock in case a thread held it at fork
+    REGISTRY.__init__()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def record_stage(name, seconds):
+    REGISTRY.observe('wos_stage_seconds', seconds, {'stage': name})
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds, 3)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as stage `name` (recorded even if it raises)."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record_stage(name, time.monotonic() - started)
+
+
+@contextmanager
+def collect_timings():
+    """Collect {stage: seconds} for stages run by this thread inside the block."""
+    outer = getattr(_local, 'timings', None)
+    timings = _local.timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = outer
+
+
+def count_job(status, n=1):
+    REGISTRY.inc('wos_jobs_total', {'status': status}, n)
+
+
+def _write(path, data):
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # e.g. PermissionError: it exists but belongs to someone else
+        return True
+    return True
+
+
+def fold_dead(directory=None):
+    """Merge the files of exited processes on this host into <host>-dead.json and delete
+    them. Returns how many were folded. Needs fcntl, so it is a no-op on Windows."""
+    directory = Path(directory or METRICS_DIR)
+    if fcntl is None or not directory.exists():
+        return 0
+    host = socket.gethostname()
+    with open(directory / '.fold.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead = []
+        for path in directory.glob(f'{host}-*.json'):
+            pid = path.stem[len(host) + 1:]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                dead.append(path)
+        if not dead:
+            return 0
+        total = Registry()
+        target = directory / f'{host}-dead.json'
+        for path in [target] + dead:
+            try:
+                total.merge(json.loads(path.read_text()))
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                print('Dropping unreadable metrics file', path.name)
+        _write(target, total.to_dict())
+        for path in dead:
+            path.unlink()
+        return len(dead)
+
+
+_last_fold = 0.0
+
+
+def flush(directory=None):
+    """Write this process's registry where /metrics can find it."""
+    global _last_fold
+    directory = Path(directory or METRICS_DIR)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        _write(directory / f'{socket.gethostname()}-{os.getpid()}.json', REGISTRY.to_dict())
+        if time.monotonic() - _last_fold >= FOLD_INTERVAL:
+            _last_fold = time.monotonic()
+            fold_dead(directory)
+    except OSError as e:
+        print('Could not write metrics:', e)
+
+
+_last_flush = 0.0
+
+
+def maybe_flush(interval=None):
+    """flush() unless this process did so within `interval` seconds (default FLUSH_INTERVAL)."""
+    global _last_flush
+    now = time.monotonic()
+    if now - _last_flush >= (FLUSH_INTERVAL if interval is None else interval):
+        _last_flush = now
+        flush()
+
+
+def collect(directory=None, include_self=True):
+    """Registry summed over every process that flushed to `directory`, plus this one."""
+    directory = Path(directory or METRICS_DIR)
+    total = Registry()
+    own = f'{socket.gethostname()}-{os.getpid()}.json'
+    for path in directory.glob('*.json') if directory.exists() else []:
+        if path.name == own:
+            continue
+        try:
+            total.merge(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    if include_self:
+        total.merge(REGISTRY.to_dict())
+    return total
+
+
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in items) + '}'
+
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render(registry, gauges=None):
+    """Prometheus text exposition of `registry` plus `gauges` ({name: (help, value)})."""
+    lines = []
+    typed = set()
+
+    def header(name, kind, text):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(registry.counters.items()):
+        header(name, *HELP.get(name, ('counter', name)))
+        lines.append(f'{name}{_labels(labels)} {_num(value)}')
+    for (name, labels), h in sorted(registry.histograms.items()):
+        header(name, *HELP.get(name, ('histogram', name)))
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h):
+            cumulative += n
+            lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+        cumulative += h[len(BUCKETS)]
+        lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {_num(float(h[-1]))}')
+        lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    for name, (text, value) in sorted((gauges or {}).items()):
+        if value is None:
+            continue
+        header(name, 'gauge', text)
+        lines.append(f'{name} {_num(value)}')
+    return '\n'.join(lines) + '\n'
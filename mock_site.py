@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+mock_site.py
+
+Local stand-in for wosrewards.com, for testing the Selenium and HTTP backends without
+touching the live site. It serves:
+
+  GET  /              landing page: player IDs textarea + "Apply Codes" button,
+                      a redeem form (playerId / code) and a "Task Status" link
+  GET  /status        Task Status page (HTML table: date, player IDs, status, result)
+  POST /api/apply     {"playerIds": [...]} or form field player_ids -> queues a task
+  GET  /api/tasks     Task Status rows as JSON
+  POST /api/redeem    {"playerId": ..., "code": ...} -> {"message": ...}
+  GET  /result/<id>   result page linked from finished tasks
+
+Queued tasks move from "pending" to "done" after --complete-after seconds.
+
+Usage:
+  python mock_site.py --port 8765
+  set WOS_SITE_URL=http://127.0.0.1:8765/   (Selenium backend)
+  set WOS_HTTP_BASE_URL=http://127.0.0.1:8765  (HTTP backend)
+"""
+import argparse
+import html
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LANDING_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>WOS Rewards (mock)</title></head>
+<body>
+<nav><a href="/">Home</a> | <a href="/status">Task Status</a></nav>
+<h1>Apply gift codes</h1>
+<textarea placeholder="Enter player IDs separated by spaces" rows="4" cols="60"></textarea>
+<button type="button" id="apply-codes">Apply Codes</button>
+<div class="message"></div>
+<h2>Redeem a single code</h2>
+<form id="redeem-form">
+  <input name="playerId" placeholder="Player ID">
+  <input name="code" placeholder="Gift code">
+  <button type="submit">Redeem</button>
+</form>
+<div class="result"></div>
+<script>
+document.getElementById('apply-codes').addEventListener('click', function () {
+  var t = document.querySelector('textarea');
+  var ids = t.value.split(/[\\s,]+/).filter(Boolean);
+  fetch('/api/apply', {method: 'POST', headers: {'Content-Type': 'application/json'},
+                       body: JSON.stringify({playerIds: ids})})
+    .then(function (r) { return r.json(); })
+    .then(function (d) { document.querySelector('.message').innerText = d.message; t.value = ''; });
+});
+document.getElementById('redeem-form').addEventListener('submit', function (e) {
+  e.preventDefault();
+  var f = e.target;
+  fetch('/api/redeem', {method: 'POST', headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify({playerId: f.playerId.value, code: f.code.value})})
+    .then(function (r) { return r.json(); })
+    .then(function (d) { document.querySelector('.result').innerText = d.message; });
+});
+</script>
+</body></html>
+"""
+
+
+class MockState:
+    """In-memory task queue shared by all request handlers."""
+
+    def __init__(self, latency=0.0, complete_after=5.0, seed_rows=0):
+        self.latency = latency
+        self.complete_after = complete_after
+        self.lock = threading.Lock()
+        self.tasks = []
+        self.redeemed = set()
+        self.requests = 0
+        for i in range(seed_rows):
+            self.tasks.append({'id': i + 1, 'date': datetime.utcnow().strftime('%m/%d/%Y'),
+                               'player_ids': [str(490000000 + 2 * i), str(490000001 + 2 * i)],
+                               'created': 0.0})
+
+    def add_task(self, player_ids):
+        with self.lock:
+            task = {'id': len(self.tasks) + 1, 'date': datetime.utcnow().strftime('%m/%d/%Y'),
+                    'player_ids': list(player_ids), 'created': time.time()}
+            self.tasks.append(task)
+            return task
+
+    def rows(self, base_url=''):
+        now = time.time()
+        with self.lock:
+            tasks = list(self.tasks)
+        out = []
+        # newest first, like the real Task Status page
+        for t in reversed(tasks):
+            done = now - t['created'] >= self.complete_after
+            out.append({'date': t['date'], 'playerIds': t['player_ids'],
+                        'status': 'done' if done else 'pending',
+                        'result': f"{base_url}/result/{t['id']}" if done else None})
+        return out
+
+    def redeem(self, player_id, code):
+        with self.lock:
+            key = (str(player_id), code)
+            if key in self.redeemed:
+                return 'Already redeemed'
+            self.redeemed.add(key)
+            return 'Redeemed successfully'
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None  # set by make_server
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _base_url(self):
+        host = self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]
+        return f'http://{host}'
+
+    def _send(self, code, body, content_type='text/html; charset=utf-8'):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, code, obj):
+        self._send(code, json.dumps(obj), 'application/json')
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if 'application/json' in (self.headers.get('Content-Type') or ''):
+            return json.loads(raw or b'{}')
+        return {k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()}
+
+    def _delay(self):
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+    def do_GET(self):
+        self._delay()
+        path = urlparse(self.path).path
+        if path == '/':
+            return self._send(200, LANDING_HTML)
+        if path == '/status':
+            return self._send(200, self._status_html())
+        if path == '/api/tasks':
+            return self._json(200, self.state.rows(self._base_url()))
+        if path.startswith('/result/'):
+            return self._send(200, f'<pre>result for task {html.escape(path.rsplit("/", 1)[-1])}</pre>')
+        return self._send(404, 'not found', 'text/plain')
+
+    def do_POST(self):
+        self._delay()
+        path = urlparse(self.path).path
+        try:
+            body = self._read_body()
+        except json.JSONDecodeError as e:
+            return self._json(400, {'ok': False, 'message': f'Invalid JSON: {e}'})
+        if not isinstance(body, dict):
+            return self._json(400, {'ok': False, 'message': 'Expected a JSON object'})
+        if path == '/api/apply':
+            ids = body.get('playerIds') or body.get('player_ids') or ''
+            if isinstance(ids, str):
+                ids = ids.replace(',', ' ').split()
+            ids = [str(i).strip() for i in ids if str(i).strip()]
+            if not ids:
+                return self._json(400, {'ok': False, 'message': 'No player IDs given'})
+            task = self.state.add_task(ids)
+            return self._json(200, {'ok': True, 'taskId': task['id'],
+                                    'message': f'Queued {len(ids)} player(s)'})
+        if path == '/api/redeem':
+            pid, code = body.get('playerId'), body.get('code')
+            if not pid or not code:
+                return self._json(400, {'ok': False, 'message': 'playerId and code are required'})
+            return self._json(200, {'ok': True, 'message': self.state.redeem(pid, code)})
+        return self._json(404, {'ok': False, 'message': 'not found'})
+
+    def _status_html(self):
+        rows = []
+        for r in self.state.rows(self._base_url()):
+            # player IDs are whatever was posted to /apply
+            result = html.escape(r['result']) if r['result'] else None
+            link = f'<a href="{result}">{result}</a>' if result else 'null'
+            rows.append(f'<tr><td>{html.escape(r["date"])}</td><td>{html.escape(",".join(r["playerIds"]))}</td>'
+                        f'<td>{html.escape(r["status"])}</td><td>{link}</td></tr>')
+        return ('<!doctype html><html><body><nav><a href="/">Home</a> | <a href="/status">Task Status</a></nav>'
+                '<h1>Queue Status</h1><table><thead><tr><th>Date</th><th>Player IDs</th><th>Status</th>'
+                '<th>Result</th></tr></thead><tbody>' + ''.join(rows) + '</tbody></table></body></html>')
+
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, complete_after=5.0, seed_rows=0):
+    state = MockState(latency=latency, complete_after=complete_after, seed_rows=seed_rows)
+    handler = type('BoundMockHandler', (MockHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_mock_site(**kwargs):
+    """Start the mock site in a background thread. Returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for wosrewards.com")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--complete-after", type=float, default=5.0, help="Seconds until a queued task is done")
+    parser.add_argument("--seed-rows", type=int, default=0, help="Pre-populate the Task Status table")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.complete_after, args.seed_rows)
+    print(f"Mock wosrewards listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
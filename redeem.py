@@ -6,6 +6,8 @@ Batch redeem script for wosrewards.com using Selenium.
 
 Usage examples (PowerShell):
   python redeem.py --player-id 123456 --codes-file codes.txt
+  python redeem.py --player-id 123456 --player-id 654321 --codes-file codes.txt --rate 2
+  python redeem.py --players-file players.txt --codes-file codes.txt --shards 4 --rate 4 --headless
 
 This script automates filling the player id and a gift code, clicking the apply button,
 and logging the result. It assumes the site does NOT require a captcha.
@@ -17,19 +19,19 @@ can't find the inputs or button.
 
 import argparse
 import csv
+import json
+import os
 import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from webdriver_manager.chrome import ChromeDriverManager
+from backends import SeleniumBackend, HttpBackend
+from driver_pool import LAUNCH_PROFILES, build_options, launch_driver
+from selector_cache import get_resolver
+from scheduler import DAILY_LIMIT, QUOTA_DB, QuotaStore, RedeemScheduler
+from waits import wait_for, any_element_present, form_message, message_text, message_visible
 
 
 # --- Config: update selectors here if the script can't find elements ---
@@ -50,26 +52,14 @@ CONFIG = {
 
 
 def pick_first(driver, selector_list):
-    """Try multiple comma-separated selectors and return the first found element."""
-    for sel in selector_list.split(","):
-        sel = sel.strip()
-        try:
-            el = driver.find_element(By.CSS_SELECTOR, sel)
-            return el
-        except Exception:
-            continue
-    raise RuntimeError(f"No element found for selectors: {selector_list}")
+    """Return the first element matching the comma-separated selectors (one WebDriver call;
+    the selector that matched is remembered per page, see selector_cache.py)."""
+    return get_resolver().find(driver, selector_list)
 
 
-def init_driver(headless=False):
-    options = Options()
-    if headless:
-        options.add_argument("--headless=new")
-        options.add_argument("--disable-gpu")
-    options.add_argument("--start-maximized")
+def init_driver(headless=False, launch_profile=None):
     # optional: set user agent or profile if needed
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
+    return launch_driver(build_options(headless=headless, launch_profile=launch_profile))
 
 
 def redeem_one(driver, wait, player_id, code, selectors):
@@ -79,16 +69,14 @@ def redeem_one(driver, wait, player_id, code, selectors):
             el = pick_first(driver, selectors["open_apply_selector"])
             try:
                 el.click()
-                # allow modal to open
-                time.sleep(0.7)
             except Exception:
                 pass
         except Exception:
             # it's okay if there's no opener
             pass
 
-    # Fill player id
-    player_elem = pick_first(driver, selectors["player_selector"])
+    # Fill player id (waiting for the modal, if any, to render the input)
+    player_elem = wait_for(driver, any_element_present(selectors["player_selector"], name="player input present"), timeout=10)
     player_elem.clear()
     player_elem.send_keys(str(player_id))
 
@@ -97,6 +85,23 @@ def redeem_one(driver, wait, player_id, code, selectors):
     code_elem.clear()
     code_elem.send_keys(code)
 
+    # The driver is reused across codes, so the message still shows the previous code's
+    # result. Clear the form's own message element (or remember the page's message) first
+    # and wait for a new one after submitting.
+    message_elem, previous = None, None
+    if selectors.get("message_selector"):
+        try:
+            message_elem = form_message(driver, player_elem, selectors["message_selector"])
+            if message_elem is not None:
+                driver.execute_script("arguments[0].innerText = '';", message_elem)
+        except Exception:
+            message_elem = None
+        if message_elem is None:
+            try:
+                previous = message_visible(selectors["message_selector"])(driver)
+            except Exception:
+                previous = None
+
     # Submit
     submit_elem = pick_first(driver, selectors["submit_selector"])
     try:
@@ -107,92 +112,252 @@ def redeem_one(driver, wait, player_id, code, selectors):
 
         code_elem.send_keys(Keys.RETURN)
 
-    # wait briefly for response
-    time.sleep(1.5)
-
-    # capture message if available
+    # capture message as soon as the site shows one
     result_text = ""
-    try:
-        msg_el = driver.find_element(By.CSS_SELECTOR, selectors["message_selector"]) if selectors.get("message_selector") else None
-        if msg_el:
-            result_text = msg_el.text.strip()
-    except Exception:
-        # If no message element, try to read any alert text
-        result_text = "(no message found)"
+    if selectors.get("message_selector"):
+        if message_elem is not None:
+            condition = message_text(message_elem)
+        else:
+            condition = message_visible(selectors["message_selector"], previous=previous)
+        result_text = wait_for(driver, condition, timeout=10, required=False)
+        if not result_text:
+            result_text = "(no message found)"
 
     return result_text
 
 
-def run_batch(url, player_id, codes, out_csv, headless=False, per_account_limit=None, pause_between=1.0):
-    driver = init_driver(headless=headless)
-    wait = WebDriverWait(driver, 15)
-
+RESULT_FIELDS = ["timestamp", "player_id", "code", "result", "latency_ms"]
+
+
+class ResultLog:
+    """Streams result rows to `out_csv` as they happen, plus a checkpoint for --resume.
+
+    Every row is appended and flushed immediately, so a crash loses at most the request in
+    flight. Pairs that got an answer from the site (anything but an "error: ..." result) are
+    also appended to the checkpoint file (`<out_csv>.checkpoint`, one JSON object per line).
+    With resume=True both files are kept, and `done` holds the (player_id, code) pairs to skip.
+    """
+
+    def __init__(self, out_csv, resume=False, checkpoint=None):
+        self.path = Path(out_csv)
+        self.checkpoint_path = Path(checkpoint) if checkpoint else self.path.with_name(self.path.name + ".checkpoint")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.done = self._load_checkpoint() if resume else set()
+        mode = "a" if resume else "w"
+        new_file = not resume or not self.path.exists() or self.path.stat().st_size == 0
+        self._csv = self.path.open(mode, newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._csv, fieldnames=RESULT_FIELDS)
+        if new_file:
+            self._writer.writeheader()
+            self._csv.flush()
+        self._checkpoint = self.checkpoint_path.open(mode, encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def _load_checkpoint(self):
+        done = set()
+        if not self.checkpoint_path.exists():
+            return done
+        for line in self.checkpoint_path.read_text(encoding='utf-8').splitlines():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # last line may be cut short by a crash
+                continue
+            done.add((str(item["player_id"]), item["code"]))
+        return done
+
+    def pending(self, matrix):
+        """`matrix` without the pairs already completed in an earlier run."""
+        return {pid: [c for c in codes if (str(pid), c) not in self.done] for pid, codes in matrix.items()}
+
+    def write(self, row):
+        with self._lock:
+            if self._csv.closed:
+                return
+            self._writer.writerow(row)
+            self._csv.flush()
+            if not str(row["result"]).startswith("error"):
+                self._checkpoint.write(json.dumps({"player_id": row["player_id"], "code": row["code"]}) + "\n")
+                self._checkpoint.flush()
+                os.fsync(self._checkpoint.fileno())
+                self.done.add((str(row["player_id"]), row["code"]))
+
+    def close(self):
+        self._csv.close()
+        self._checkpoint.close()
+
+
+class ShardProgress:
+    """Per-shard counters for a sharded run, printed periodically and at the end."""
+
+    def __init__(self, shards, total):
+        self.total = total
+        self.done = [0] * shards
+        self.errors = [0] * shards
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, shard, ok):
+        with self._lock:
+            self.done[shard] += 1
+            if not ok:
+                self.errors[shard] += 1
+            return sum(self.done)
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        done = sum(self.done)
+        head = "Finished" if final else "Progress"
+        print(f"{head}: {done}/{self.total} codes in {elapsed:.1f}s ({done / elapsed * 60:.1f} codes/min)")
+        if len(self.done) > 1 or final:
+            for i, (n, err) in enumerate(zip(self.done, self.errors)):
+                print(f"  shard {i}: {n} done, {err} errors ({n / elapsed * 60:.1f} codes/min)")
+
+
+def _run_shard(shard, sched, make_backend, owns_backend, results, log, progress, lock, label):
     try:
-        driver.get(url)
-        # tiny wait for page JS to run
-        time.sleep(1.0)
-
-        results = []
-        for i, code in enumerate(codes, start=1):
-            if per_account_limit and i > per_account_limit:
-                print(f"Reached per-account limit: {per_account_limit}. Stopping.")
-                break
-
-            print(f"[{i}/{len(codes)}] Redeeming code: {code}")
+        backend = make_backend()
+    except Exception as e:
+        print(f"{label}Could not start backend: {e}")
+        return
+    try:
+        for player_id, code in sched:
+            started, t0 = datetime.utcnow().isoformat(), time.monotonic()
             try:
-                result_text = redeem_one(driver, wait, player_id, code, CONFIG)
-                print(" -> Result:", result_text)
-                results.append({"code": code, "result": result_text})
+                result_text, ok = backend.redeem_code(player_id, code), True
             except Exception as e:
-                print(" -> Error interacting with page:", e)
-                results.append({"code": code, "result": f"error: {e}"})
+                result_text, ok = f"error: {e}", False
+            row = {"timestamp": started, "player_id": player_id, "code": code, "result": result_text,
+                   "latency_ms": round((time.monotonic() - t0) * 1000)}
+            log.write(row)
+            with lock:
+                results.append(row)
+            n = progress.record(shard, ok)
+            # one write per line so output of concurrent shards does not interleave
+            print(f"{label}[{n}/{sched.total}] {player_id} {code} -> {result_text}\n", end="", flush=True)
+    finally:
+        if owns_backend:
+            backend.close()
+
+
+def run_matrix(matrix, out_csv, url=CONFIG["url"], headless=False, per_account_limit=DAILY_LIMIT, pause_between=1.0,
+               rate=1.0, quota=None, pool=None, backend=None, shards=1, make_backend=None, report_every=10.0,
+               resume=False, launch_profile=None):
+    """Redeem codes for several players: `matrix` maps player id -> list of codes.
+
+    Requests are interleaved across players by scheduler.RedeemScheduler: at most `rate`
+    requests per second overall, at least `pause_between` seconds between two requests for
+    the same player, and never more than `per_account_limit` per player per day. The daily
+    quota is kept in `quota` (a scheduler.QuotaStore, by default the one at QUOTA_DB) so it
+    also holds across runs. Pass per_account_limit=None to disable it.
+
+    `shards` workers pull from the same scheduler concurrently, each with its own backend
+    from `make_backend()` (default: a SeleniumBackend, i.e. one browser per shard). A given
+    `backend` is used as the single shard. Results of all shards go to one CSV.
+
+    Rows are written to `out_csv` as they complete (see ResultLog). With resume=True the
+    existing file is appended to and pairs recorded in its checkpoint are not sent again.
+    """
+    owns_backend = backend is None
+    if not owns_backend:
+        shards, make_backend = 1, lambda: backend
+    elif make_backend is None:
+        make_backend = lambda: SeleniumBackend(pool=pool, headless=headless, url=url, launch_profile=launch_profile)
+    if quota is None and per_account_limit:
+        quota = QuotaStore(QUOTA_DB, limit=per_account_limit)
+    log = ResultLog(out_csv, resume=resume)
+    if resume:
+        before = sum(len(c) for c in matrix.values())
+        matrix = log.pending(matrix)
+        print(f"Resuming: {before - sum(len(c) for c in matrix.values())} code(s) already done")
+    sched = RedeemScheduler(matrix, quota=quota, rate=rate, account_gap=pause_between)
+    progress = ShardProgress(shards, sched.total)
+
+    results, lock = [], threading.Lock()
+    workers = [threading.Thread(target=_run_shard, name=f"shard-{i}", daemon=True,
+                                args=(i, sched, make_backend, owns_backend, results, log, progress, lock,
+                                      f"[shard {i}] " if shards > 1 else ""))
+               for i in range(shards)]
+    try:
+        for t in workers:
+            t.start()
+        next_report = time.monotonic() + report_every
+        for t in workers:
+            while t.is_alive():
+                t.join(max(next_report - time.monotonic(), 0))
+                if time.monotonic() >= next_report:
+                    if shards > 1:
+                        progress.report()
+                    next_report += report_every
+    finally:
+        log.close()
+    progress.report(final=True)
 
-            # small pause to mimic human behavior and avoid aggressive rate-limits
-            time.sleep(pause_between)
+    if sched.skipped:
+        print(f"Skipped {len(sched.skipped)} code(s): daily per-account limit reached")
+    print(f"Wrote results to {out_csv}")
+    return results
 
-        # write results
-        out_csv.parent.mkdir(parents=True, exist_ok=True)
-        with out_csv.open("w", newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=["timestamp", "code", "result"])
-            writer.writeheader()
-            ts = datetime.utcnow().isoformat()
-            for row in results:
-                writer.writerow({"timestamp": ts, **row})
 
-        print(f"Wrote results to {out_csv}")
+def run_batch(url, player_id, codes, out_csv, headless=False, per_account_limit=None, pause_between=1.0, pool=None, backend=None, **kw):
+    """Redeem `codes` for one player (see run_matrix).
 
-    finally:
-        print("Closing browser in 2 seconds for inspection...")
-        time.sleep(2)
-        driver.quit()
+    By default a SeleniumBackend drives Chrome (borrowing from `pool` when given). Pass any
+    backends.Backend (e.g. HttpBackend) as `backend` to submit without a browser.
+    """
+    return run_matrix({player_id: codes}, out_csv, url=url, headless=headless, per_account_limit=per_account_limit,
+                      pause_between=pause_between, pool=pool, backend=backend, **kw)
 
 
 def load_codes(file_path):
+    """Non-empty lines of a text file (used for codes and player id files)."""
     p = Path(file_path)
     if not p.exists():
-        raise FileNotFoundError(f"Codes file not found: {file_path}")
+        raise FileNotFoundError(f"File not found: {file_path}")
     codes = [line.strip() for line in p.read_text(encoding='utf-8').splitlines() if line.strip()]
     return codes
 
 
 def main():
     parser = argparse.ArgumentParser(description="Batch redeemer for wosrewards.com (Selenium)")
-    parser.add_argument("--player-id", required=True, help="Player ID to redeem for")
+    parser.add_argument("--player-id", action="append", default=[], help="Player ID to redeem for (repeat for several accounts)")
+    parser.add_argument("--players-file", help="Text file with one player ID per line (combined with --player-id)")
     parser.add_argument("--codes-file", required=True, help="Text file with one gift code per line (max 50 expected by site)")
     parser.add_argument("--url", default=CONFIG["url"], help="Redemption page URL")
     parser.add_argument("--out", default="results/results.csv", help="CSV file to write results")
     parser.add_argument("--headless", action="store_true", help="Run headless (not recommended when debugging selectors)")
-    parser.add_argument("--per-account-limit", type=int, default=50, help="Max codes to attempt per account/day (site limit)")
-    parser.add_argument("--pause", type=float, default=1.0, help="Seconds pause between attempts")
+    parser.add_argument("--per-account-limit", type=int, default=DAILY_LIMIT, help="Max codes to attempt per account/day (site limit, 0 = no limit)")
+    parser.add_argument("--pause", type=float, default=1.0, help="Minimum seconds between two attempts for the same account")
+    parser.add_argument("--rate", type=float, default=1.0, help="Max requests per second over all accounts (0 = unlimited)")
+    parser.add_argument("--quota-db", default=QUOTA_DB, help="SQLite file that tracks each account's daily quota across runs")
+    parser.add_argument("--backend", choices=["selenium", "http"], default="selenium", help="Submit through Chrome or directly over HTTP")
+    parser.add_argument("--base-url", default=None, help="Base URL for the http backend (e.g. http://127.0.0.1:8765 for mock_site.py)")
+    parser.add_argument("--launch-profile", choices=sorted(LAUNCH_PROFILES), default=None,
+                        help="Chrome launch profile (default: lean when headless, default otherwise)")
+    parser.add_argument("--shards", type=int, default=1, help="Concurrent browser sessions / HTTP clients sharing the work")
+    parser.add_argument("--resume", action="store_true", help="Append to --out and skip codes its checkpoint marks as done")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports in sharded runs")
     args = parser.parse_args()
 
     codes = load_codes(args.codes_file)
     if not codes:
         print("No codes found in file.")
         sys.exit(1)
+    player_ids = list(args.player_id)
+    if args.players_file:
+        player_ids += load_codes(args.players_file)
+    player_ids = list(dict.fromkeys(player_ids))
+    if not player_ids:
+        parser.error("give at least one --player-id or a --players-file")
 
     out_csv = Path(args.out)
-    run_batch(args.url, args.player_id, codes, out_csv, headless=args.headless, per_account_limit=args.per_account_limit, pause_between=args.pause)
+    make_backend = (lambda: HttpBackend(base_url=args.base_url)) if args.backend == "http" else None
+    quota = QuotaStore(args.quota_db, limit=args.per_account_limit) if args.per_account_limit else None
+    matrix = {pid: codes for pid in player_ids}
+    run_matrix(matrix, out_csv, url=args.url, headless=args.headless, per_account_limit=args.per_account_limit,
+               pause_between=args.pause, rate=args.rate, quota=quota, shards=max(args.shards, 1),
+               make_backend=make_backend, report_every=args.report_every, resume=args.resume,
+               launch_profile=args.launch_profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+"""
+scheduler.py
+
+Quota-aware scheduling of gift-code redemptions across many accounts.
+
+The site accepts at most DAILY_LIMIT (50) redemptions per account per day and rate-limits
+clients that send requests too quickly. Three pieces work together:
+
+  QuotaStore      one token bucket per account in a small SQLite file. A bucket holds
+                  `limit` tokens and refills completely at the site's daily reset
+                  (WOS_RESET_HOUR_UTC). Tokens are taken before a request is sent, so
+                  interrupted runs and later runs on the same day share the quota.
+  RateLimiter     global ceiling on requests per second, shared by every account
+  RedeemScheduler hands out (account, code) pairs from an accounts x codes matrix. It
+                  always picks the account that has been ready longest, so while one
+                  account waits out its minimum gap another account uses the slot.
+
+    quota = QuotaStore('results/quota.db', limit=50)
+    sched = RedeemScheduler({'123': codes, '456': codes}, quota=quota, rate=2.0, account_gap=1.0)
+    for player_id, code in sched:
+        backend.redeem_code(player_id, code)
+
+RedeemScheduler.next() is thread-safe, so several workers can pull from one scheduler.
+"""
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+DAILY_LIMIT = 50
+RESET_HOUR_UTC = int(os.environ.get('WOS_RESET_HOUR_UTC', '0'))
+QUOTA_DB = os.environ.get('WOS_QUOTA_DB') or str(Path(__file__).resolve().parent / 'results' / 'quota.db')
+
+
+def next_reset(now=None):
+    """Next daily reset of the site (UTC) strictly after `now`."""
+    now = now or datetime.utcnow()
+    reset = now.replace(hour=RESET_HOUR_UTC, minute=0, second=0, microsecond=0)
+    if reset <= now:
+        reset += timedelta(days=1)
+    return reset
+
+
+class QuotaStore:
+    """Durable per-account daily token buckets (safe across threads and processes)."""
+
+    def __init__(self, path=QUOTA_DB, limit=DAILY_LIMIT):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.limit = limit
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS quota (
+                account TEXT PRIMARY KEY,
+                tokens INTEGER,
+                refill_at TEXT
+            )
+            ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _bucket(self, conn, account, now):
+        """Current tokens for `account`, refilling the bucket if its reset has passed."""
+        row = conn.execute('SELECT tokens, refill_at FROM quota WHERE account=?', (account,)).fetchone()
+        if row is None or row[1] <= now.isoformat():
+            return self.limit
+        return min(row[0], self.limit)
+
+    def remaining(self, account, now=None):
+        now = now or datetime.utcnow()
+        return self._bucket(self._conn(), str(account), now)
+
+    def take(self, account, now=None):
+        """Consume one token for `account`. Returns False when its daily quota is used up."""
+        now = now or datetime.utcnow()
+        account = str(account)
+        with self._transaction() as conn:
+            tokens = self._bucket(conn, account, now)
+            if tokens <= 0:
+                return False
+            conn.execute('INSERT OR REPLACE INTO quota(account, tokens, refill_at) VALUES (?, ?, ?)',
+                         (account, tokens - 1, next_reset(now).isoformat()))
+        return True
+
+
+class RateLimiter:
+    """Global requests-per-second ceiling. `rate` of None or 0 means unlimited."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, not_before=0.0):
+        """Reserve the next free slot at or after `not_before` (monotonic time); returns it."""
+        with self._lock:
+            slot = max(time.monotonic(), self._next, not_before)
+            self._next = slot + self.interval
+            return slot
+
+
+class RedeemScheduler:
+    """Interleaves an accounts x codes matrix under per-account quota and a global rate.
+
+    `matrix` maps account -> list of codes (tried in order). `account_gap` is the minimum
+    time between two requests for the same account. Codes that could not be scheduled
+    because the account's quota ran out are collected in `skipped` as (account, code).
+    """
+
+    def __init__(self, matrix, quota=None, rate=None, account_gap=0.0, limiter=None):
+        self.quota = quota
+        self.limiter = limiter or RateLimiter(rate)
+        self.account_gap = account_gap
+        self.skipped = []
+        self.total = sum(len(codes) for codes in matrix.values())
+        self._pending = {str(a): list(codes) for a, codes in matrix.items() if codes}
+        self._ready = [(0.0, i, a) for i, a in enumerate(self._pending)]
+        heapq.heapify(self._ready)
+        self._seq = len(self._ready)
+        self._lock = threading.Lock()
+
+    def _pop(self):
+        while self._ready:
+            ready_at, _, account = heapq.heappop(self._ready)
+            codes = self._pending[account]
+            if self.quota is not None and not self.quota.take(account):
+                print(f"Account {account}: daily quota used up, skipping {len(codes)} code(s)")
+                self.skipped.extend((account, c) for c in codes)
+                codes.clear()
+                continue
+            code = codes.pop(0)
+            slot = self.limiter.reserve(ready_at)
+            if codes:
+                self._seq += 1
+                heapq.heappush(self._ready, (slot + self.account_gap, self._seq, account))
+            return account, code, slot
+        return None
+
+    def next(self):
+        """Block until the next (account, code) may be sent; None when all work is handed out."""
+        with self._lock:
+            item = self._pop()
+        if item is None:
+            return None
+        account, code, slot = item
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return account, code
+
+    def __iter__(self):
+        while True:
+            item = self.next()
+            if item is None:
+                return
+            yield item
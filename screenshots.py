@@ -0,0 +1,145 @@
+"""
+screenshots.py
+
+When and how the Selenium flows take screenshots.
+
+A policy decides whether a capture is taken at all:
+
+  never       no screenshots
+  on_failure  only for captchas, intercepted clicks and pages that did not answer (default)
+  always      also after successful submissions and status scrapes
+
+Captures go through DevTools `Page.captureScreenshot`, so Chrome encodes a JPEG or WebP
+at WOS_SCREENSHOT_QUALITY instead of a full-page PNG, and a CSS selector can clip the
+capture to the element that matters (the result message, the status table). Drivers
+without DevTools fall back to WebDriver's PNG screenshot.
+
+Only the capture itself runs on the caller's thread; decoding and writing the file is
+left to a background writer, so a job does not wait on the disk:
+
+    path = capture(driver, out_dir / 'apply_result', 'success', selector='.alert, .result')
+    # path is 'out_dir/apply_result.jpg', or None when the policy skipped it
+
+Call flush() before relying on the file being there (it is also run at exit).
+"""
+import atexit
+import base64
+import os
+import queue
+import threading
+from pathlib import Path
+
+from metrics import stage
+
+POLICIES = ('never', 'on_failure', 'always')
+FORMATS = {'jpeg': '.jpg', 'webp': '.webp', 'png': '.png'}
+
+POLICY = os.environ.get('WOS_SCREENSHOT_POLICY', 'on_failure')
+FORMAT = os.environ.get('WOS_SCREENSHOT_FORMAT', 'jpeg')
+QUALITY = int(os.environ.get('WOS_SCREENSHOT_QUALITY', '60'))
+
+# page-coordinate box around the first element matching any of the selectors
+_RECT_JS = """
+var el = document.querySelector(arguments[0]);
+if (!el) return null;
+var r = el.getBoundingClientRect();
+if (!r.width || !r.height) return null;
+return {x: r.left + window.scrollX, y: r.top + window.scrollY, width: r.width, height: r.height};
+"""
+
+
+def should_capture(kind, policy=None):
+    """True when `policy` (default WOS_SCREENSHOT_POLICY) wants a `kind` ('success'/'failure') capture."""
+    policy = policy or POLICY
+    if policy not in POLICIES:
+        raise ValueError(f'unknown screenshot policy: {policy}')
+    return policy == 'always' or (policy == 'on_failure' and kind == 'failure')
+
+
+class _Writer:
+    """One daemon thread that writes captured images to disk in order."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, path, data, encoded=True):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='screenshot-writer', daemon=True)
+                self._thread.start()
+        self._queue.put((path, data, encoded))
+
+    def _run(self):
+        while True:
+            path, data, encoded = self._queue.get()
+            try:
+                tmp = path.with_name('.' + path.name + '.tmp')
+                tmp.write_bytes(base64.b64decode(data) if encoded else data)
+                os.replace(tmp, path)
+            except Exception as e:
+                print(f'Could not write screenshot {path}:', e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+
+_writer = _Writer()
+atexit.register(_writer.flush)
+
+
+def flush():
+    """Wait until every queued screenshot is on disk."""
+    _writer.flush()
+
+
+def _clip(driver, selector):
+    if not selector:
+        return None
+    try:
+        rect = driver.execute_script(_RECT_JS, selector)
+    except Exception:
+        return None
+    if not rect:
+        return None
+    return dict(rect, scale=1)
+
+
+def capture(driver, path, kind='failure', selector=None, policy=None, fmt=None, quality=None):
+    """Screenshot the page (or the element matching `selector`) if the policy allows it.
+
+    `path` is given without a suffix; the format's suffix is added. Returns the path the
+    image will be written to, or None when nothing was captured.
+    """
+    if not should_capture(kind, policy):
+        return None
+    fmt = fmt or FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown screenshot format: {fmt}')
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with stage('screenshot'):
+        try:
+            params = {'format': fmt}
+            if fmt != 'png':
+                params['quality'] = quality or QUALITY
+            clip = _clip(driver, selector)
+            if clip:
+                # the element may sit below the fold
+                params.update(clip=clip, captureBeyondViewport=True)
+            data = driver.execute_cdp_cmd('Page.captureScreenshot', params)['data']
+            path = path.with_suffix(FORMATS[fmt])
+            _writer.submit(path, data)
+        except Exception:
+            # no DevTools (remote or non-Chrome driver): plain PNG of the viewport
+            try:
+                data = driver.get_screenshot_as_png()
+            except Exception as e:
+                print('Could not take screenshot:', e)
+                return None
+            path = path.with_suffix('.png')
+            _writer.submit(path, data, encoded=False)
+    return str(path)
@@ -0,0 +1,118 @@
+"""
+selector_cache.py
+
+Resolves "first of several CSS selectors" lookups in one WebDriver call and remembers which
+candidate matched.
+
+The CONFIG selectors in redeem.py (and the fallbacks in apply_players.py) are lists of
+guesses such as "input[name='code'], input#code". Trying them one find_element() at a time
+costs a round trip per miss, on every code and every page load. SelectorResolver sends the
+whole list to the page in a single script. The script works out a key for the page
+(location.pathname plus a hash of the script/stylesheet URLs, which change when the site is
+redeployed) and tries the selector that worked last time for that key first. The full list
+is only probed when there is no entry yet or the remembered selector stopped matching.
+
+What worked is kept in a small JSON file (WOS_SELECTOR_CACHE, default
+results/selector_cache.json in the project root) so later runs start warm:
+
+    {"input[name='code'], input#code": {"/@1a2b3c4d": "input#code"}}
+
+    el = get_resolver().find(driver, CONFIG["code_selector"])
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+CACHE_PATH = os.environ.get('WOS_SELECTOR_CACHE') or str(Path(__file__).resolve().parent / 'results' / 'selector_cache.json')
+
+_PROBE_JS = """
+var sels = arguments[0], known = arguments[1] || {};
+var assets = document.querySelectorAll('script[src], link[rel=stylesheet][href]');
+var sig = '', h = 0, i;
+for (i = 0; i < assets.length; i++) sig += (assets[i].src || assets[i].href) + '|';
+for (i = 0; i < sig.length; i++) h = ((h << 5) - h + sig.charCodeAt(i)) | 0;
+var key = location.pathname + '@' + (h >>> 0).toString(16);
+function q(sel) { try { return document.querySelector(sel); } catch (e) { return null; } }
+var hint = known[key];
+if (hint) {
+    var el = q(hint);
+    if (el) return [el, hint, key, true];
+}
+for (i = 0; i < sels.length; i++) {
+    var found = q(sels[i]);
+    if (found) return [found, sels[i], key, false];
+}
+return [null, null, key, false];
+"""
+
+
+def split_selectors(selectors):
+    if isinstance(selectors, str):
+        selectors = selectors.split(',')
+    return [s.strip() for s in selectors if s and s.strip()]
+
+
+class SelectorResolver:
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.probes = 0
+        self._lock = threading.Lock()
+        self._cache = self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(self._cache, indent=1, sort_keys=True), encoding='utf-8')
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print('Could not save selector cache:', e)
+
+    def probe(self, driver, selectors):
+        """First element matching `selectors` (comma-separated string or list), or None."""
+        sels = split_selectors(selectors)
+        group = ', '.join(sels)
+        with self._lock:
+            known = dict(self._cache.get(group, {}))
+        el, sel, key, hit = driver.execute_script(_PROBE_JS, sels, known)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.probes += 1
+                if sel is not None and known.get(key) != sel:
+                    self._cache.setdefault(group, {})[key] = sel
+                    self._save()
+        return el
+
+    def find(self, driver, selectors):
+        el = self.probe(driver, selectors)
+        if el is None:
+            raise RuntimeError(f"No element found for selectors: {selectors}")
+        return el
+
+    def stats(self):
+        return {'hits': self.hits, 'probes': self.probes, 'entries': sum(len(v) for v in self._cache.values())}
+
+
+_RESOLVER = None
+
+
+def get_resolver():
+    """Process-wide resolver backed by CACHE_PATH."""
+    global _RESOLVER
+    if _RESOLVER is None:
+        _RESOLVER = SelectorResolver()
+    return _RESOLVER
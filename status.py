@@ -3,64 +3,84 @@ status.py
 
 Small helper to scrape Task Status (importable version of check_status.py).
 """
-import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import csv
 from pathlib import Path
 
+from driver_pool import SITE_URL, build_options, launch_driver, launch_with_profile, quit_driver
+from metrics import stage
+from screenshots import capture
+from status_snapshot import get_service
+from status_table import extract_task_status, write_status_csv
+from waits import wait_for, page_ready, status_table_rendered, task_status_link
 
-def scrape_task_status(out_dir='.', user_data_dir=None, profile_directory=None):
-    options = Options()
-    options.add_argument('--start-maximized')
-    if user_data_dir:
-        options.add_argument(f'--user-data-dir={user_data_dir}')
-    if profile_directory:
-        options.add_argument(f'--profile-directory={profile_directory}')
 
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+def scrape_task_status(out_dir='.', user_data_dir=None, profile_directory=None, pool=None, url=SITE_URL, max_age=None,
+                       screenshot_policy=None):
+    """Scrape the Task Status table. With `pool` (and no profile), a warm session is borrowed.
+
+    With `max_age`, a shared snapshot (status_snapshot.py) at most that many seconds old is
+    used instead of opening a browser; the result then has no screenshot. Fresh scrapes are
+    published to the snapshot. A screenshot of the table is taken per `screenshot_policy`
+    (screenshots.py): always, or on failure when the table came back empty.
+    """
+    if max_age is not None:
+        snap = get_service().current()
+        if snap.age <= max_age:
+            return _write_records(snap.records, out_dir, screenshot=None)
+    if pool is not None and not (user_data_dir or profile_directory):
+        with pool.session() as driver:
+            return _scrape_on_driver(driver, out_dir, url, screenshot_policy)
+
+    driver, profile = launch_with_profile(user_data_dir=user_data_dir, profile_directory=profile_directory)
     try:
-        driver.get('https://wosrewards.com/')
-        time.sleep(1)
+        return _scrape_on_driver(driver, out_dir, url, screenshot_policy)
+    finally:
+        quit_driver(driver)
+        if profile is not None:
+            profile.cleanup()
+
+
+def fetch_task_status(pool=None, url=SITE_URL, headless=True):
+    """Return the current Task Status records without writing any files."""
+    if pool is not None:
+        with pool.session() as driver:
+            return _read_records(driver, url)
+    driver = launch_driver(build_options(headless=headless))
+    try:
+        return _read_records(driver, url)
+    finally:
+        quit_driver(driver)
+
+
+def _read_records(driver, url):
+    with stage('page_load'):
+        if driver.current_url.rstrip('/') != url.rstrip('/'):
+            driver.get(url)
+            wait_for(driver, page_ready(), timeout=15, required=False)
+    with stage('status_scrape'):
         # click Task Status
         try:
-            el = driver.find_element(By.XPATH, "//a[contains(., 'Task Status')]")
-            el.click()
-            time.sleep(1)
+            wait_for(driver, task_status_link(), timeout=5).click()
+            wait_for(driver, status_table_rendered(), timeout=10, required=False)
         except Exception:
             pass
+        return extract_task_status(driver)
 
-        rows = []
-        try:
-            table = driver.find_element(By.XPATH, "//table")
-            tbody = table.find_element(By.TAG_NAME, 'tbody')
-            tr_list = tbody.find_elements(By.TAG_NAME, 'tr')
-            for tr in tr_list:
-                cells = tr.find_elements(By.TAG_NAME, 'td')
-                rows.append([c.text.strip() for c in cells])
-        except Exception:
-            pass
 
-        out_dir = Path(out_dir)
-        out_dir.mkdir(parents=True, exist_ok=True)
-        csv_path = out_dir / 'queue_status.csv'
-        if rows:
-            maxcols = max(len(r) for r in rows)
-            with csv_path.open('w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                headers = [f'col{i+1}' for i in range(maxcols)]
-                writer.writerow(headers)
-                for r in rows:
-                    writer.writerow(r + [''] * (maxcols - len(r)))
-        screenshot = out_dir / 'queue_status.png'
-        driver.save_screenshot(str(screenshot))
+def _scrape_on_driver(driver, out_dir, url=SITE_URL, screenshot_policy=None):
+    records = _read_records(driver, url)
+    get_service().publish(records, source='scrape_task_status')
 
-        return {'rows': rows, 'csv': str(csv_path) if rows else None, 'screenshot': str(screenshot)}
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+    if records:
+        screenshot = capture(driver, Path(out_dir) / 'queue_status', 'success', selector='table',
+                             policy=screenshot_policy)
+    else:
+        screenshot = capture(driver, Path(out_dir) / 'queue_status', 'failure', policy=screenshot_policy)
+    return _write_records(records, out_dir, screenshot=screenshot)
+
+
+def _write_records(records, out_dir, screenshot):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = write_status_csv(records, out_dir / 'queue_status.csv')
+    return {'rows': [r.to_dict() for r in records], 'records': records,
+            'csv': str(csv_path) if csv_path else None, 'screenshot': screenshot}
@@ -0,0 +1,253 @@
+"""
+status_snapshot.py
+
+One shared, versioned copy of the global Task Status table.
+
+Task Status lists every recent submission on the site, so all consumers (the web app,
+workers, the completion tracker, check_status.py, apply_players.py) read the same table.
+StatusService keeps the latest scrape as a StatusSnapshot (version, fetch time, records,
+player_id index) and hands it to any number of readers:
+
+    snap = get_service().get(max_age=30)      # scrape only if the snapshot is older than 30s
+    row = snap.latest('529265458')            # newest row mentioning this player
+    get_service().publish(records)            # share a scrape you already made
+
+Concurrent readers that need a fresher table share a single refresh: one thread scrapes,
+the others wait for its result. The snapshot is written to WOS_STATUS_SNAPSHOT (default
+results/status_snapshot.json in the project root, whatever the working directory) under a
+file lock, so several processes on one machine share refreshes too. A process that finds a
+fresh enough file uses it instead of scraping.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from status_table import TaskStatusRecord
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+# the web app and workers must find the same file, so not relative to the working directory
+SNAPSHOT_PATH = os.environ.get('WOS_STATUS_SNAPSHOT') or str(Path(__file__).resolve().parent / 'results' / 'status_snapshot.json')
+MAX_AGE = float(os.environ.get('WOS_STATUS_MAX_AGE', '10'))
+
+
+class StatusSnapshot:
+    """An immutable Task Status scrape with a per-player index (rows stay in page order, newest first)."""
+
+    def __init__(self, records, version=0, fetched_at=0.0, source=''):
+        self.records = list(records)
+        self.version = version
+        self.fetched_at = fetched_at
+        self.source = source
+        self.index = {}
+        for r in self.records:
+            for pid in r.player_ids:
+                self.index.setdefault(pid, []).append(r)
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at if self.fetched_at else float('inf')
+
+    def for_player(self, player_id):
+        return self.index.get(str(player_id), [])
+
+    def latest(self, player_id):
+        rows = self.for_player(player_id)
+        return rows[0] if rows else None
+
+    def for_players(self, player_ids):
+        """Rows mentioning any of `player_ids`, in page order."""
+        wanted = {str(p) for p in player_ids}
+        return [r for r in self.records if wanted.intersection(r.player_ids)]
+
+    def to_dict(self, player_ids=None):
+        records = self.for_players(player_ids) if player_ids else self.records
+        return {'version': self.version, 'fetched_at': self.fetched_at,
+                'fetched_at_iso': datetime.utcfromtimestamp(self.fetched_at).isoformat() if self.fetched_at else None,
+                'source': self.source, 'rows': [dict(r.to_dict(), cells=r.cells) for r in records]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([TaskStatusRecord(**row) for row in data.get('rows', [])], data.get('version', 0),
+                   data.get('fetched_at', 0.0), data.get('source', ''))
+
+
+EMPTY = StatusSnapshot([])
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._fh = None
+        if fcntl is not None and self.path:
+            self._fh = open(self.path, 'a')
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+
+
+def _default_fetch():
+    import backends
+    return backends.get_backend(backends.DEFAULT_BACKEND).fetch_task_status()
+
+
+class StatusService:
+    """Serves StatusSnapshots and refreshes them single-flight (see module docstring).
+
+    `fetch` returns a list of TaskStatusRecord; by default the shared WOS_BACKEND backend.
+    """
+
+    def __init__(self, fetch=None, path=SNAPSHOT_PATH, max_age=MAX_AGE):
+        self.fetch = fetch or _default_fetch
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self.refreshes = 0
+        self.shared = 0
+        self._snapshot = EMPTY
+        self._lock = threading.Lock()
+        self._inflight = None
+
+    # -- persistence ---------------------------------------------------------
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return None
+        try:
+            return StatusSnapshot.from_dict(json.loads(self.path.read_text(encoding='utf-8')))
+        except (OSError, ValueError, TypeError) as e:
+            print('Could not read status snapshot:', e)
+            return None
+
+    def _save(self, snap):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(snap.to_dict()), encoding='utf-8')
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print('Could not save status snapshot:', e)
+
+    def _file_lock(self):
+        if self.path is None:
+            return _FileLock(None)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return _FileLock(str(self.path) + '.lock')
+
+    def _adopt(self, snap):
+        """Keep `snap` if it is newer than what this process has."""
+        with self._lock:
+            if snap is not None and snap.fetched_at > self._snapshot.fetched_at:
+                self._snapshot = snap
+            return self._snapshot
+
+    # -- readers -------------------------------------------------------------
+
+    def current(self):
+        """Latest snapshot known here or on disk; never scrapes."""
+        return self._adopt(self._load())
+
+    def get(self, max_age=None):
+        """A snapshot at most `max_age` seconds old (default WOS_STATUS_MAX_AGE), refreshing if needed."""
+        max_age = self.max_age if max_age is None else max_age
+        snap = self._snapshot
+        if snap.age <= max_age:
+            return snap
+        snap = self.current()
+        if snap.age <= max_age:
+            return snap
+        return self.refresh(max_age)
+
+    def refresh(self, max_age=0.0):
+        """Scrape now, unless another thread or process is already doing it; then share its result."""
+        with self._lock:
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = {'done': threading.Event(), 'snap': None, 'error': None}
+        if not leader:
+            self.shared += 1
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['snap']
+        try:
+            with self._file_lock():
+                # another process may have refreshed while we waited for the lock
+                snap = self._load()
+                if snap is None or snap.age > max_age:
+                    records = self.fetch()
+                    self.refreshes += 1
+                    snap = self._store(records, 'refresh')
+            flight['snap'] = self._adopt(snap)
+            return flight['snap']
+        except BaseException as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight = None
+            flight['done'].set()
+
+    def publish(self, records, source='publish'):
+        """Share records someone already scraped (e.g. right after Apply Codes) as a new version.
+
+        An empty scrape is not published: it usually means the table did not render.
+        """
+        if not records:
+            return self._snapshot
+        try:
+            with self._file_lock():
+                return self._adopt(self._store(records, source))
+        except Exception as e:
+            print('Could not publish status snapshot:', e)
+            return self._snapshot
+
+    def _store(self, records, source):
+        """New version from `records`; caller holds the file lock."""
+        on_disk = self._load()
+        version = max(self._snapshot.version, on_disk.version if on_disk else 0) + 1
+        snap = StatusSnapshot(records, version, time.time(), source)
+        self._save(snap)
+        return snap
+
+    def stats(self):
+        snap = self._snapshot
+        return {'version': snap.version, 'age': round(snap.age, 1) if snap.fetched_at else None,
+                'rows': len(snap.records), 'refreshes': self.refreshes, 'shared': self.shared}
+
+    def run(self, interval, stop=None):
+        """Refresh every `interval` seconds until `stop` (a threading.Event) is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.get(max_age=interval)
+            except Exception as e:
+                print('Status refresh failed:', e)
+            stop.wait(interval)
+
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_service():
+    """Process-wide StatusService backed by SNAPSHOT_PATH."""
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = StatusService()
+        return _SERVICE
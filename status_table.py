@@ -0,0 +1,140 @@
+"""
+status_table.py
+
+Pull the whole Task Status table out of the page in a single execute_script call and
+turn it into typed records instead of walking tbody -> tr -> td element by element.
+
+    records = extract_task_status(driver)
+    write_status_csv(records, Path('queue_status.csv'))
+"""
+import csv
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+CSV_FIELDS = ['date', 'player_ids', 'status', 'result_url']
+
+# Returns {headers: [...], rows: [{cells: [...], links: [...]}, ...]} for the first table,
+# falling back to list-style layouts (one cell per item) when the page has no table.
+_EXTRACT_JS = """
+var out = {headers: [], rows: []};
+var table = document.querySelector('table');
+if (table) {
+    table.querySelectorAll('thead th').forEach(function (th) { out.headers.push(th.innerText.trim()); });
+    var trs = table.tBodies.length ? table.tBodies[0].rows : table.querySelectorAll('tr');
+    for (var i = 0; i < trs.length; i++) {
+        var cells = [], links = [];
+        var tds = trs[i].querySelectorAll('td');
+        for (var j = 0; j < tds.length; j++) {
+            cells.push(tds[j].innerText.trim());
+            var a = tds[j].querySelector('a[href]');
+            links.push(a ? a.href : null);
+        }
+        if (cells.length) out.rows.push({cells: cells, links: links});
+    }
+    return out;
+}
+document.querySelectorAll('.table-responsive tr, .queue-list li, .task-row').forEach(function (el) {
+    var text = el.innerText.split('\\n').join(' | ').trim();
+    if (text) out.rows.push({cells: [text], links: [null]});
+});
+return out;
+"""
+
+
+@dataclass
+class TaskStatusRecord:
+    date: str = ''
+    player_ids: List[str] = field(default_factory=list)
+    status: str = ''
+    result_url: Optional[str] = None
+    cells: List[str] = field(default_factory=list)
+
+    def has_player(self, player_id) -> bool:
+        return str(player_id) in self.player_ids
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d.pop('cells')
+        return d
+
+    def to_csv_row(self) -> dict:
+        return {'date': self.date, 'player_ids': ','.join(self.player_ids),
+                'status': self.status, 'result_url': self.result_url or ''}
+
+
+def _column_index(headers):
+    """Map record fields to column positions, by header name when possible."""
+    index = {'date': 0, 'player_ids': 1, 'status': 2, 'result_url': 3}
+    names = [h.lower() for h in headers]
+    for pos, name in enumerate(names):
+        if 'date' in name or 'time' in name:
+            index['date'] = pos
+        elif 'player' in name or name == 'ids':
+            index['player_ids'] = pos
+        elif 'status' in name or 'state' in name:
+            index['status'] = pos
+        elif 'result' in name or 'link' in name or 'url' in name:
+            index['result_url'] = pos
+    return index
+
+
+def _split_ids(text):
+    return [p for p in text.replace(',', ' ').split() if p]
+
+
+def records_from_rows(headers, rows):
+    """Build records from raw rows: each row is {'cells': [...], 'links': [...]} or a list of cell texts."""
+    index = _column_index(headers or [])
+    records = []
+    for row in rows:
+        if isinstance(row, dict):
+            cells, links = row.get('cells') or [], row.get('links') or []
+        else:
+            cells, links = list(row), []
+
+        def cell(name):
+            pos = index[name]
+            return cells[pos] if pos < len(cells) else ''
+
+        if len(cells) < 2:
+            # list-style fallback row: keep the raw text only
+            records.append(TaskStatusRecord(cells=cells))
+            continue
+        url = next((link for link in links if link), None)
+        if not url:
+            text = cell('result_url')
+            url = text if text.startswith('http') else None
+        records.append(TaskStatusRecord(
+            date=cell('date'),
+            player_ids=_split_ids(cell('player_ids')),
+            status=cell('status').lower(),
+            result_url=url,
+            cells=cells,
+        ))
+    return records
+
+
+def extract_task_status(driver):
+    """Read the Task Status table currently rendered in `driver` (one WebDriver round trip)."""
+    data = driver.execute_script(_EXTRACT_JS) or {}
+    return records_from_rows(data.get('headers'), data.get('rows') or [])
+
+
+def records_for_players(records, player_ids):
+    wanted = {str(p) for p in player_ids}
+    return [r for r in records if wanted.intersection(r.player_ids)]
+
+
+def write_status_csv(records, path):
+    """Write records to `path` with named columns. Returns the path, or None if there is nothing to write."""
+    if not records:
+        return None
+    with path.open('w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for r in records:
+            if r.player_ids or r.status:
+                writer.writerow(r.to_csv_row())
+            else:
+                writer.writerow({'date': '', 'player_ids': ' '.join(r.cells), 'status': '', 'result_url': ''})
+    return path
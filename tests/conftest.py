@@ -0,0 +1,76 @@
+"""
+Shared fixtures. Every piece of state the modules read from the environment at import
+time (data dir, metrics, status snapshot, queues) is pointed at a temporary directory
+before any project module is imported, so tests never touch app.db, jobs_data/ or Redis.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix='wos-tests-'))
+os.environ.pop('REDIS_URL', None)
+os.environ.update({
+    'WOS_DATA_DIR': str(WORK_DIR / 'jobs_data'),
+    'WOS_METRICS_DIR': str(WORK_DIR / 'metrics'),
+    'WOS_STATUS_SNAPSHOT': str(WORK_DIR / 'status_snapshot.json'),
+    'WOS_SELECTOR_CACHE': str(WORK_DIR / 'selector_cache.json'),
+    'WOS_QUOTA_DB': str(WORK_DIR / 'quota.db'),
+    'WOS_TRACKER': '0',
+    'WOS_BATCH_WAIT': '0.2',
+})
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _work_dir():
+    yield WORK_DIR
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh SQLite database for webapp.models."""
+    from webapp import models
+    models.close_conn()
+    models.init_db(str(tmp_path / 'app.db'))
+    yield models
+    models.close_conn()
+
+
+@pytest.fixture
+def site():
+    """mock_site.py on a free port; yields (server, base_url)."""
+    from mock_site import start_mock_site
+    server, url = start_mock_site(complete_after=0)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http_backend(site, monkeypatch):
+    """Make backends.get_backend('http') talk to the mock site, with a fresh status snapshot."""
+    import backends
+    import status_snapshot
+    monkeypatch.setitem(backends.HTTP_CONFIG, 'base_url', site[1])
+    monkeypatch.setattr(backends, '_SHARED', {})
+    service = status_snapshot.StatusService(fetch=lambda: backends.get_backend('http').fetch_task_status(), path=None)
+    monkeypatch.setattr(status_snapshot, '_SERVICE', service)
+    yield site[1]
+    for backend in backends._SHARED.values():
+        backend.close()
+
+
+@pytest.fixture
+def dead_pid():
+    """The pid of a process that has already exited."""
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
@@ -0,0 +1,84 @@
+import gzip
+from datetime import datetime, timedelta
+
+from webapp import artifacts
+
+
+def _final_job(db, data_dir, status='done'):
+    job_id = db.create_job('1')
+    db.update_job_status(job_id, status, finished_at=datetime.utcnow().isoformat())
+    root = artifacts.job_dir(job_id, data_dir)
+    (root / 'shots').mkdir(parents=True)
+    (root / 'task_status.csv').write_text('date,player,status\n' * 200)
+    (root / 'shots' / 'apply.png').write_bytes(b'\x89PNG' + bytes(100))
+    return job_id
+
+
+def test_sweep_compresses_and_records_final_jobs(db, tmp_path):
+    job_id = _final_job(db, tmp_path)
+    running = db.create_job('2')
+    artifacts.job_dir(running, tmp_path).mkdir()
+
+    assert artifacts.sweep(data_dir=tmp_path) == (1, [])
+
+    root = artifacts.job_dir(job_id, tmp_path)
+    assert not (root / 'task_status.csv').exists()
+    with gzip.open(root / 'task_status.csv.gz', 'rt') as f:
+        assert f.read() == 'date,player,status\n' * 200
+    rows = {r['path']: r for r in db.job_artifacts(job_id)}
+    csv = rows[f'job_{job_id}/task_status.csv']
+    assert csv['encoding'] == 'gzip' and csv['size'] == 19 * 200 and csv['stored_size'] < csv['size']
+    assert rows[f'job_{job_id}/shots/apply.png']['encoding'] is None
+    assert db.get_artifact(f'job_{job_id}/task_status.csv')['etag'] == csv['etag']
+    # archived once; the running job is left alone
+    assert artifacts.sweep(data_dir=tmp_path) == (0, [])
+    assert db.job_artifacts(running) == []
+
+
+def test_each_job_is_claimed_once(db, tmp_path):
+    jobs = [_final_job(db, tmp_path) for _ in range(3)]
+    first = db.claim_jobs_to_archive(2)
+    second = db.claim_jobs_to_archive(2)
+    assert first == jobs[:2] and second == jobs[2:]
+    assert db.claim_jobs_to_archive(2) == []
+
+
+def test_prune_removes_old_jobs_then_the_oldest_over_the_size_limit(db, tmp_path):
+    jobs = [_final_job(db, tmp_path) for _ in range(3)]
+    artifacts.sweep(data_dir=tmp_path)
+    sizes = {j['job_id']: j['stored_size'] for j in db.artifact_jobs()}
+
+    # nothing is old or over the limit
+    assert artifacts.prune(max_age_days=1, max_bytes=sum(sizes.values()), data_dir=tmp_path) == []
+    # everything is old
+    later = datetime.utcnow() + timedelta(days=2)
+    assert artifacts.prune(max_age_days=1, max_bytes=10 ** 9, data_dir=tmp_path, now=later) == jobs
+    assert db.artifact_jobs() == []
+    assert not any(artifacts.job_dir(j, tmp_path).exists() for j in jobs)
+
+
+def test_prune_keeps_the_newest_jobs_under_the_size_limit(db, tmp_path):
+    jobs = [_final_job(db, tmp_path) for _ in range(3)]
+    artifacts.sweep(data_dir=tmp_path)
+    sizes = {j['job_id']: j['stored_size'] for j in db.artifact_jobs()}
+
+    assert artifacts.prune(max_age_days=30, max_bytes=sizes[jobs[2]], data_dir=tmp_path) == jobs[:2]
+    assert [j['job_id'] for j in db.artifact_jobs()] == [jobs[2]]
+    assert artifacts.job_dir(jobs[2], tmp_path).is_dir()
+    assert db.get_artifact(f'job_{jobs[0]}/task_status.csv') is None
+
+
+def test_prune_removes_jobs_whose_archiving_failed(db, tmp_path, monkeypatch):
+    job_id = _final_job(db, tmp_path)
+
+    def fail(job_id, data_dir=None):
+        raise OSError('disk full')
+    monkeypatch.setattr(artifacts, 'archive_job', fail)
+    assert artifacts.sweep(data_dir=tmp_path) == (1, [])
+    assert db.job_artifacts(job_id) == [] and db.claim_jobs_to_archive() == []
+
+    assert artifacts.prune(max_age_days=30, max_bytes=0, data_dir=tmp_path) == []
+    later = datetime.utcnow() + timedelta(days=31)
+    assert artifacts.prune(max_age_days=30, data_dir=tmp_path, now=later) == [job_id]
+    assert not artifacts.job_dir(job_id, tmp_path).exists()
+    assert artifacts.prune(max_age_days=30, data_dir=tmp_path, now=later) == []
@@ -0,0 +1,36 @@
+import os
+
+import chrome_profiles
+
+
+def _profile(tmp_path):
+    src = tmp_path / 'User Data'
+    (src / 'Default' / 'Network').mkdir(parents=True)
+    (src / 'Default' / 'Cache').mkdir()
+    (src / 'Local State').write_text('{}')
+    (src / 'Default' / 'Preferences').write_text('{}')
+    (src / 'Default' / 'Network' / 'Cookies').write_text('old session')
+    (src / 'Default' / 'Cache' / 'data_0').write_text('cached')
+    return src
+
+
+def test_snapshot_rebuilds_when_nested_cookies_change(tmp_path):
+    src = _profile(tmp_path)
+    root = tmp_path / 'snapshots'
+    golden = chrome_profiles.snapshot(str(src), 'Default', root=str(root))
+    assert (golden / 'Default' / 'Network' / 'Cookies').read_text() == 'old session'
+    assert not (golden / 'Default' / 'Cache').exists()
+
+    cookies = src / 'Default' / 'Network' / 'Cookies'
+    cookies.write_text('new session')
+    os.utime(cookies, ns=(0, cookies.stat().st_mtime_ns + 10 ** 9))
+    golden = chrome_profiles.snapshot(str(src), 'Default', root=str(root))
+    assert (golden / 'Default' / 'Network' / 'Cookies').read_text() == 'new session'
+
+
+def test_cache_changes_keep_the_snapshot(tmp_path):
+    src = _profile(tmp_path)
+    before = chrome_profiles._source_signature(str(src), 'Default')
+    (src / 'Default' / 'Cache' / 'data_1').write_text('more cache')
+    (src / 'Default' / 'LOCK').write_text('')
+    assert chrome_profiles._source_signature(str(src), 'Default') == before
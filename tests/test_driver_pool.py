@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import driver_pool
+from driver_pool import DriverPool, PooledSession
+
+
+class FakeProcess:
+    """psutil.Process stand-in: chromedriver with one Chrome child."""
+    rss = {}
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def memory_info(self):
+        return SimpleNamespace(rss=self.rss[self.pid])
+
+    def children(self, recursive=False):
+        return [FakeProcess(self.pid + 1)]
+
+
+class FakeDriver:
+    current_url = 'http://site/'
+
+    def __init__(self, pid):
+        self.service = SimpleNamespace(process=SimpleNamespace(pid=pid))
+        self.quit_called = False
+
+    def execute_script(self, script, *args):
+        return None
+
+    def get(self, url):
+        self.current_url = url
+
+    def quit(self):
+        self.quit_called = True
+
+
+def _pool(monkeypatch, rss_mb):
+    monkeypatch.setattr(driver_pool, 'psutil', SimpleNamespace(Process=FakeProcess))
+    monkeypatch.setattr(FakeProcess, 'rss', {100: 100 * 1024 * 1024, 101: (rss_mb - 100) * 1024 * 1024})
+    pool = DriverPool(size=1, url='http://site/', max_jobs=0, max_rss_mb=800)
+    pool.start = lambda: pool  # never launch a real Chrome to replace a session
+    pool._live = 1
+    return pool, PooledSession(FakeDriver(100))
+
+
+def test_rss_counts_chromedriver_and_its_children(monkeypatch):
+    _, session = _pool(monkeypatch, rss_mb=300)
+    assert driver_pool.driver_rss_mb(session.driver) == 300
+
+
+def test_session_over_the_rss_limit_is_recycled(monkeypatch):
+    pool, session = _pool(monkeypatch, rss_mb=900)
+    pool.release(session)
+    assert session.driver.quit_called
+    assert pool._idle.empty() and pool._live == 0
+
+
+def test_session_under_the_rss_limit_goes_back_to_the_pool(monkeypatch):
+    pool, session = _pool(monkeypatch, rss_mb=500)
+    pool.release(session)
+    assert not session.driver.quit_called
+    assert pool._idle.get_nowait() is session and pool._live == 1
+
+
+def test_without_psutil_rss_is_unknown(monkeypatch):
+    pool, session = _pool(monkeypatch, rss_mb=900)
+    monkeypatch.setattr(driver_pool, 'psutil', None)
+    assert driver_pool.driver_rss_mb(session.driver) is None
+    assert not pool._needs_recycle(session)
@@ -0,0 +1,75 @@
+import json
+import socket
+from webapp.file_queue import FileQueue
+
+
+def test_put_get_ack(tmp_path):
+    q = FileQueue(tmp_path / 'q')
+    q.put({'job_id': 1})
+    q.put({'job_id': 2})
+    first, second = q.get(timeout=1), q.get(timeout=1)
+    assert [first.payload['job_id'], second.payload['job_id']] == [1, 2]
+    assert q.stats() == {'depth': 0, 'in_flight': 2, 'dead': 0}
+    assert q.ack(first) and q.ack(second)
+    assert q.get_nowait() is None
+    assert q.stats()['in_flight'] == 0
+
+
+def test_get_nowait_sees_messages_put_after_it_started_watching(tmp_path):
+    consumer = FileQueue(tmp_path / 'q')
+    assert consumer.get_nowait() is None  # index built, watcher (if any) armed
+    FileQueue(tmp_path / 'q').put({'job_id': 7})
+    msg = consumer.get_nowait()
+    assert msg is not None and msg.payload['job_id'] == 7
+
+
+def test_nack_retries_then_dead_letters(tmp_path):
+    q = FileQueue(tmp_path / 'q', max_retries=1)
+    q.put({'job_id': 3})
+    assert q.nack(q.get(timeout=1)) is False
+    msg = q.get(timeout=1)
+    assert msg.attempts == 1
+    assert q.nack(msg) is True
+    assert q.stats() == {'depth': 0, 'in_flight': 0, 'dead': 1}
+
+
+def test_reap_requeues_claims_of_dead_consumers(tmp_path, dead_pid):
+    q = FileQueue(tmp_path / 'q', max_retries=3)
+    stale = q.claimed_root / f'{socket.gethostname()}-{dead_pid}'
+    stale.mkdir()
+    (stale / 'job_00000000000000000001_5.json').write_text(json.dumps({'job_id': 5}))
+
+    handled = q.reap()
+
+    assert [(m.payload['job_id'], dead) for m, dead in handled] == [(5, False)]
+    assert not stale.exists()
+    msg = q.get(timeout=1)
+    assert msg.payload['job_id'] == 5 and msg.attempts == 1
+
+
+def test_reap_dead_letters_after_max_retries_and_skips_live_consumers(tmp_path, dead_pid):
+    q = FileQueue(tmp_path / 'q', max_retries=1)
+    stale = q.claimed_root / f'{socket.gethostname()}-{dead_pid}'
+    stale.mkdir()
+    (stale / 'job_00000000000000000001_6.json').write_text(json.dumps({'job_id': 6, '_attempts': 1}))
+    q.put({'job_id': 8})
+    mine = q.get(timeout=1)  # claimed by this (live) process
+
+    handled = q.reap()
+
+    assert [(m.payload['job_id'], dead) for m, dead in handled] == [(6, True)]
+    assert mine.path.exists()
+    assert q.stats() == {'depth': 0, 'in_flight': 1, 'dead': 1}
+
+
+def test_bury_dead_letters_claims_without_retry(tmp_path):
+    q = FileQueue(tmp_path / 'q')
+    q.put({'job_id': 11})
+    q.put({'job_id': 12})
+    q.get(timeout=1)
+    q.get(timeout=1)
+
+    assert q.bury([11]) == 1
+
+    assert q.stats() == {'depth': 0, 'in_flight': 1, 'dead': 1}
+    assert q.reap() == []
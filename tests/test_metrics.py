@@ -0,0 +1,55 @@
+import json
+import os
+import socket
+
+import pytest
+
+import metrics
+
+
+def _counter_file(directory, name, jobs):
+    (directory / name).write_text(json.dumps(
+        {'counters': [['wos_jobs_total', {'status': 'done'}, jobs]], 'histograms': []}))
+
+
+def _done(registry):
+    return registry.counters.get(metrics._key('wos_jobs_total', {'status': 'done'}), 0)
+
+
+def test_fold_dead_keeps_counters_and_removes_files(tmp_path, dead_pid):
+    host = socket.gethostname()
+    _counter_file(tmp_path, f'{host}-{dead_pid}.json', 3)
+    _counter_file(tmp_path, f'{host}-{os.getpid()}.json', 1)  # collect() uses REGISTRY for this one
+    # other hosts' processes cannot be checked from here
+    _counter_file(tmp_path, f'otherhost-{dead_pid}.json', 5)
+    before = _done(metrics.collect(tmp_path, include_self=False))
+
+    assert metrics.fold_dead(tmp_path) == 1
+    assert not (tmp_path / f'{host}-{dead_pid}.json').exists()
+    assert (tmp_path / f'otherhost-{dead_pid}.json').exists()
+    assert _done(metrics.collect(tmp_path, include_self=False)) == before == 8
+
+    # a later restart folds into the same file
+    _counter_file(tmp_path, f'{host}-{dead_pid}.json', 2)
+    assert metrics.fold_dead(tmp_path) == 1
+    assert _done(metrics.collect(tmp_path, include_self=False)) == 10
+    assert sorted(p.name for p in tmp_path.glob('*.json')) == sorted(
+        [f'{host}-dead.json', f'{host}-{os.getpid()}.json', f'otherhost-{dead_pid}.json'])
+
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_does_not_report_the_parents_counters(tmp_path):
+    metrics.count_job('done')
+    metrics.flush(tmp_path)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            metrics.flush(tmp_path)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    child = json.loads((tmp_path / f'{socket.gethostname()}-{pid}.json').read_text())
+    assert child['counters'] == []
+    assert _done(metrics.collect(tmp_path)) == _done(metrics.REGISTRY)
@@ -0,0 +1,41 @@
+import json
+import urllib.error
+import urllib.request
+
+import backends
+
+
+def test_status_page_escapes_posted_player_ids(site, http_backend):
+    server, url = site
+    server.RequestHandlerClass.state.add_task(['<script>alert(1)</script>'])
+
+    body = urllib.request.urlopen(f'{url}/status').read().decode()
+
+    assert '<script>' not in body
+    assert '&lt;script&gt;alert(1)&lt;/script&gt;' in body
+    [row] = backends.get_backend('http').fetch_task_status()
+    assert row.player_ids == ['<script>alert(1)</script>']
+
+
+def _post(url, data, content_type='application/json'):
+    req = urllib.request.Request(f'{url}/api/apply', data=data, headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_apply_splits_player_ids_given_as_a_string(site):
+    server, url = site
+    assert _post(url, json.dumps({'playerIds': '1 2,3'}).encode())[0] == 200
+    assert _post(url, json.dumps({'playerIds': ['4', 5]}).encode())[0] == 200
+    assert _post(url, b'player_ids=6,7', 'application/x-www-form-urlencoded')[0] == 200
+    assert [t['player_ids'] for t in server.RequestHandlerClass.state.tasks] == [['1', '2', '3'], ['4', '5'], ['6', '7']]
+
+
+def test_apply_rejects_invalid_json(site):
+    _, url = site
+    status, body = _post(url, b'{"playerIds": ')
+    assert status == 400 and body['ok'] is False
+    assert _post(url, b'[1, 2]')[0] == 400
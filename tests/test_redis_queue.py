@@ -0,0 +1,75 @@
+import fakeredis
+import pytest
+
+from webapp.redis_queue import RedisQueue
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def test_put_get_ack(client):
+    q = RedisQueue(client)
+    q.put({'job_id': 1})
+    q.put({'job_id': 2})
+    first, second = q.get(timeout=1), q.get_nowait()
+    assert [first.payload['job_id'], second.payload['job_id']] == [1, 2]
+    assert q.stats() == {'depth': 0, 'in_flight': 2, 'dead': 0}
+    assert q.ack(first) and q.ack(second)
+    assert q.get_nowait() is None
+    assert q.stats() == {'depth': 0, 'in_flight': 0, 'dead': 0}
+    assert client.zcard(q.leases) == 0
+
+
+def test_nack_retries_then_dead_letters(client):
+    q = RedisQueue(client, max_retries=1)
+    q.put({'job_id': 3})
+    assert q.nack(q.get_nowait()) is False
+    msg = q.get_nowait()
+    assert msg.attempts == 1 and msg.payload == {'job_id': 3}
+    assert q.nack(msg) is True
+    assert q.get_nowait() is None
+    assert q.stats() == {'depth': 0, 'in_flight': 0, 'dead': 1}
+
+
+def test_reap_requeues_expired_leases(client):
+    q = RedisQueue(client, lease_seconds=-1, max_retries=3)
+    q.put({'job_id': 4})
+    msg = q.get_nowait()
+    [(reaped, dead)] = q.reap()
+    assert reaped.id == msg.id and dead is False
+    # the consumer's late ack loses against the reap
+    assert q.ack(msg) is False
+    again = q.get_nowait()
+    assert again.id == msg.id and again.attempts == 1
+
+
+def test_reap_leases_orphaned_processing_entries(client):
+    q = RedisQueue(client, lease_seconds=60)
+    q.put({'job_id': 5})
+    # consumer died between the move and the lease
+    client.lmove(q.name, q.processing, 'RIGHT', 'LEFT')
+    assert q.reap() == []
+    assert client.zcard(q.leases) == 1
+
+
+def test_ack_after_nack_is_a_no_op(client):
+    q = RedisQueue(client)
+    q.put({'job_id': 6})
+    msg = q.get_nowait()
+    assert q.nack(msg) is False
+    assert q.ack(msg) is False
+    assert q.stats() == {'depth': 1, 'in_flight': 0, 'dead': 0}
+
+
+def test_bury_dead_letters_without_retry(client):
+    q = RedisQueue(client, max_retries=3)
+    q.put({'job_id': 7})
+    q.put({'job_id': 8})
+    doomed, other = q.get_nowait(), q.get_nowait()
+    assert q.bury([7]) == 1
+    assert q.ack(doomed) is False
+    assert q.reap() == []
+    assert q.stats() == {'depth': 0, 'in_flight': 1, 'dead': 1}
+    assert q.ack(other)
@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+import scheduler
+from scheduler import QuotaStore, RateLimiter, RedeemScheduler
+
+
+def test_quota_bucket_empties_and_refills_at_reset(tmp_path):
+    quota = QuotaStore(tmp_path / 'quota.db', limit=2)
+    now = datetime(2024, 5, 1, 10, 0)
+    assert quota.take('1', now) and quota.take('1', now)
+    assert quota.take('1', now) is False
+    assert quota.remaining('1', now) == 0
+    # other accounts have their own bucket
+    assert quota.remaining('2', now) == 2
+    reset = scheduler.next_reset(now)
+    assert quota.remaining('1', reset - timedelta(seconds=1)) == 0
+    assert quota.remaining('1', reset) == 2
+    assert quota.take('1', reset)
+    assert quota.remaining('1', reset) == 1
+
+
+def test_quota_is_shared_by_stores_on_the_same_file(tmp_path):
+    now = datetime(2024, 5, 1, 10, 0)
+    assert QuotaStore(tmp_path / 'quota.db', limit=1).take('1', now)
+    assert QuotaStore(tmp_path / 'quota.db', limit=1).take('1', now) is False
+
+
+def test_next_reset_is_strictly_after_now(monkeypatch):
+    monkeypatch.setattr(scheduler, 'RESET_HOUR_UTC', 0)
+    assert scheduler.next_reset(datetime(2024, 5, 1, 0, 0)) == datetime(2024, 5, 2)
+    assert scheduler.next_reset(datetime(2024, 5, 1, 23, 59)) == datetime(2024, 5, 2)
+
+
+def test_rate_limiter_spaces_slots():
+    limiter = RateLimiter(rate=10)
+    start = time.monotonic()
+    slots = [limiter.reserve() for _ in range(3)]
+    assert slots[0] >= start
+    assert [round(b - a, 3) for a, b in zip(slots, slots[1:])] == [0.1, 0.1]
+    assert RateLimiter().reserve(start + 5) == start + 5
+
+
+def test_scheduler_skips_accounts_without_quota(tmp_path):
+    quota = QuotaStore(tmp_path / 'quota.db', limit=1)
+    sched = RedeemScheduler({'1': ['A', 'B'], '2': ['A']}, quota=quota)
+    assert sorted(sched) == [('1', 'A'), ('2', 'A')]
+    assert sched.skipped == [('1', 'B')]
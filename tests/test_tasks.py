@@ -0,0 +1,79 @@
+import socket
+import time
+
+from webapp import tasks
+from webapp.file_queue import FileQueue
+
+
+def _payload(job_id, players):
+    return {'job_id': job_id, 'player_list': players, 'backend': 'http'}
+
+
+def test_run_jobs_keeps_result_csv(db, http_backend):
+    players = ['910000001', '910000002']
+    job_id = db.create_job(','.join(players))
+
+    tasks.run_jobs([_payload(job_id, players)])
+
+    job = db.get_job(job_id)
+    assert job['status'] in ('submitted', 'done')
+    assert job['result_csv'] == f'job_{job_id}/task_status.csv'
+    assert (tasks.OUT_DIR / job['result_csv']).is_file()
+
+
+def test_run_jobs_batch_gives_every_job_its_csv(db, http_backend):
+    first = db.create_job('910000011')
+    second = db.create_job('910000012')
+
+    tasks.run_jobs([_payload(first, ['910000011']), _payload(second, ['910000012'])])
+
+    for job_id in (first, second):
+        job = db.get_job(job_id)
+        assert job['result_csv'] == f'job_{job_id}/task_status.csv'
+        assert '910000' in (tasks.OUT_DIR / job['result_csv']).read_text()
+
+
+def test_status_update_writes_result_without_finished_at(db):
+    job_id = db.create_job('1')
+    db.update_job_status(job_id, 'submitted', result_csv='job_1/task_status.csv')
+    job = db.get_job(job_id)
+    assert job['status'] == 'submitted'
+    assert job['result_csv'] == 'job_1/task_status.csv'
+    assert job['finished_at'] is None
+
+
+def test_reap_leaves_jobs_that_already_ended(db, tmp_path, dead_pid):
+
+    job_id = db.create_job('910000021')
+    db.update_job_status(job_id, 'error', finished_at='2026-01-01T00:00:00Z', result_csv='timeout after 300s')
+    q = FileQueue(tmp_path / 'q')
+    stale = q.claimed_root / f'{socket.gethostname()}-{dead_pid}'
+    stale.mkdir()
+    (stale / f'job_00000000000000000001_{job_id}.json').write_text(
+        '{"job_id": %d, "player_list": ["910000021"]}' % job_id)
+
+    tasks._reap(q)
+
+    assert db.get_job(job_id)['status'] == 'error'
+
+
+def test_run_jobs_never_resubmits_jobs_that_already_ended(db, site, http_backend):
+    job_id = db.create_job('910000031')
+    db.update_job_status(job_id, 'error', finished_at='2026-01-01T00:00:00Z', result_csv='timeout after 300s')
+    state = site[0].RequestHandlerClass.state
+    before = state.requests
+
+    tasks.run_jobs([_payload(job_id, ['910000031'])])
+
+    assert state.requests == before
+    assert db.get_job(job_id)['status'] == 'error'
+
+
+def test_storing_timings_changes_the_jobs_version(db):
+    job_id = db.create_job('1')
+    db.update_job_status(job_id, 'done')
+    before = db.jobs_version()
+    time.sleep(0.001)
+    db.set_job_timings({job_id: {'apply': 1.5}})
+    assert db.jobs_version() != before
+    assert db.get_job(job_id)['timings'] == {'apply': 1.5}
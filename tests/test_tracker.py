@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from status_table import TaskStatusRecord
+from webapp import tasks, tracker
+from webapp.tracker import CompletionTracker
+
+TODAY = datetime.utcnow().strftime('%m/%d/%Y')
+
+
+def _row(player_id, status, date=TODAY, url=None):
+    return TaskStatusRecord(date=date, player_ids=[player_id], status=status, result_url=url)
+
+
+def _pending(player_id, baseline=0, submitted_at=None):
+    return {'job_id': 1, 'player_id': player_id, 'baseline': baseline,
+            'submitted_at': submitted_at or datetime.utcnow().isoformat()}
+
+
+def test_resolve_takes_newest_final_row():
+    records = [_row('7', 'done', url='http://site/result/2'), _row('7', 'failed')]
+    assert tracker.resolve([_pending('7')], records) == [
+        {'job_id': 1, 'player_id': '7', 'status': 'done', 'result_url': 'http://site/result/2'}]
+
+
+def test_resolve_ignores_rows_listed_before_the_submission():
+    # an earlier run's row from the same day is the only one listed
+    earlier = [_row('7', 'done')]
+    assert tracker.resolve([_pending('7', baseline=1)], earlier) == []
+    # ours shows up, still pending
+    assert tracker.resolve([_pending('7', baseline=1)], [_row('7', 'pending')] + earlier) == []
+    # and finishes
+    assert tracker.resolve([_pending('7', baseline=1)], [_row('7', 'failed')] + earlier)[0]['status'] == 'failed'
+
+
+def test_resolve_ignores_rows_from_previous_days():
+    old = (datetime.utcnow() - timedelta(days=3)).strftime('%m/%d/%Y')
+    assert tracker.resolve([_pending('7')], [_row('7', 'done', date=old)]) == []
+
+
+def test_baseline_counts_recent_rows_per_player():
+    old = (datetime.utcnow() - timedelta(days=3)).strftime('%m/%d/%Y')
+    records = [_row('7', 'done'), _row('8', 'pending'), _row('7', 'done', date=old)]
+    assert tracker.baseline(records, ['7', '8', '9'], datetime.utcnow()) == {'7': 1, '8': 1, '9': 0}
+
+
+def test_tracker_waits_for_the_new_row(db):
+    job_id = db.create_job('7')
+    db.update_job_status(job_id, 'submitted')
+    db.track_job_players({job_id: ['7']}, baselines={'7': 1})
+    records = [_row('7', 'done')]
+    t = CompletionTracker(fetch=lambda: records)
+
+    assert t.poll_once() == 0
+    assert db.get_job(job_id)['status'] == 'submitted'
+
+    records.insert(0, _row('7', 'done', url='http://site/result/2'))
+    assert t.poll_once() == 1
+    assert db.get_job(job_id)['status'] == 'done'
+    assert db.get_job_players(job_id)[0]['result_url'] == 'http://site/result/2'
+
+
+def test_run_jobs_records_rows_listed_before_apply(db, site, http_backend):
+    server, _ = site
+    state = server.RequestHandlerClass.state
+    # an earlier submission of the same player already finished today
+    state.add_task(['920000001'])['created'] = 0.0
+    state.complete_after = 3600
+    job_id = db.create_job('920000001')
+
+    tasks.run_jobs([{'job_id': job_id, 'player_list': ['920000001'], 'backend': 'http', 'force': True}])
+
+    assert db.pending_job_players()[0]['baseline'] == 1
+    assert db.get_job(job_id)['status'] == 'submitted'
+
+
+def test_update_job_players_reports_each_job_once(db):
+    job_id = db.create_job('7')
+    db.update_job_status(job_id, 'submitted')
+    db.track_job_players({job_id: ['7']})
+    # the supervisor timed it out in the meantime
+    db.update_job_status(job_id, 'error', finished_at=datetime.utcnow().isoformat())
+
+    assert db.update_job_players([{'job_id': job_id, 'player_id': '7', 'status': 'done'}]) == []
+    assert db.get_job(job_id)['status'] == 'error'
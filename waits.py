@@ -0,0 +1,179 @@
+"""
+waits.py
+
+Named readiness conditions and an adaptive poller shared by every Selenium flow.
+
+Instead of sleeping a fixed amount after each step, flows call e.g.
+
+    textarea = wait_for(driver, textarea_present())
+    wait_for(driver, apply_acknowledged(), timeout=10, required=False)
+
+and continue as soon as the DOM is ready. Polling starts fast (50ms) and backs off
+towards `max_poll` so slow pages don't get hammered with WebDriver calls.
+"""
+import time
+
+from selenium.webdriver.common.by import By
+
+
+class WaitTimeout(TimeoutError):
+    """Raised when a required condition is not met within its timeout."""
+
+
+class Condition:
+    """A named check. `check(driver)` returns a truthy value once the condition holds."""
+
+    def __init__(self, name, check):
+        self.name = name
+        self.check = check
+
+    def __call__(self, driver):
+        return self.check(driver)
+
+    def __repr__(self):
+        return f'Condition({self.name!r})'
+
+
+def wait_for(driver, condition, timeout=15, required=True, initial_poll=0.05, max_poll=0.5, backoff=1.5):
+    """Poll `condition` until it returns a truthy value and return that value.
+
+    WebDriver errors raised by the check count as "not ready yet". On timeout a
+    WaitTimeout is raised, or None is returned when `required` is False.
+    """
+    deadline = time.monotonic() + timeout
+    poll = initial_poll
+    last_error = None
+    while True:
+        try:
+            value = condition(driver)
+            if value:
+                return value
+        except Exception as e:
+            last_error = e
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(poll, remaining))
+        poll = min(poll * backoff, max_poll)
+    if required:
+        msg = f'timed out after {timeout}s waiting for {getattr(condition, "name", condition)}'
+        if last_error is not None:
+            msg += f' (last error: {last_error})'
+        raise WaitTimeout(msg)
+    return None
+
+
+# --- conditions -------------------------------------------------------------
+
+def page_ready():
+    return Condition('page ready', lambda d: d.execute_script(
+        "return document.readyState !== 'loading'"))
+
+
+def element_present(by, selector, name=None):
+    def check(d):
+        found = d.find_elements(by, selector)
+        return found[0] if found else None
+    return Condition(name or f'element present: {selector}', check)
+
+
+def any_element_present(css_selectors, name=None):
+    """First element matching any of the comma-separated CSS selectors, in one call.
+
+    Goes through selector_cache, so the selector that matched last time is tried first.
+    """
+    from selector_cache import get_resolver
+    return Condition(name or f'any of: {css_selectors}', lambda d: get_resolver().probe(d, css_selectors))
+
+
+def textarea_present():
+    """The player IDs textarea on the landing page."""
+    return Condition('textarea present', lambda d: d.execute_script(
+        "return document.querySelector(\"textarea[placeholder*='player IDs']\")"
+        " || document.querySelector('textarea');"))
+
+
+def apply_acknowledged():
+    """The site reacted to "Apply Codes": a message is shown or the textarea was cleared."""
+    js = """
+    var msg = document.querySelector('.alert, .message, .result, #result, [role=alert]');
+    if (msg && msg.innerText.trim()) return msg.innerText.trim();
+    var t = document.querySelector('textarea');
+    if (!t) return 'navigated';
+    if (!t.value.trim()) return 'cleared';
+    return null;
+    """
+    return Condition('apply acknowledged', lambda d: d.execute_script(js))
+
+
+def message_visible(css_selector, previous=None):
+    """Non-empty text in the result/message element (redeem form), other than `previous`."""
+    js = """
+    var el = document.querySelector(arguments[0]);
+    var t = el ? el.innerText.trim() : '';
+    return (t && t !== arguments[1]) ? t : null;
+    """
+    return Condition(f'message visible: {css_selector}', lambda d: d.execute_script(js, css_selector, previous))
+
+
+# the message element belonging to a form: the first match inside it, else the first after it
+_FORM_MESSAGE_JS = """
+var form = arguments[0].closest('form') || arguments[0].parentElement;
+var els = document.querySelectorAll(arguments[1]);
+var after = null;
+for (var i = 0; i < els.length; i++) {
+    if (form.contains(els[i])) return els[i];
+    if (!after && (form.compareDocumentPosition(els[i]) & Node.DOCUMENT_POSITION_FOLLOWING)) after = els[i];
+}
+return after;
+"""
+
+
+def form_message(driver, field, css_selector):
+    """The element matching `css_selector` that shows results for the form around `field`."""
+    return driver.execute_script(_FORM_MESSAGE_JS, field, css_selector)
+
+
+def message_text(element):
+    """Non-empty text in `element` (found with form_message and cleared before submitting)."""
+    js = "var t = arguments[0].innerText.trim(); return t || null;"
+    return Condition('message text', lambda d: d.execute_script(js, element))
+
+
+def status_table_rendered():
+    """The Task Status table exists and has at least one body row."""
+    js = """
+    var t = document.querySelector('table');
+    if (!t) return 0;
+    return t.querySelectorAll('tbody tr').length;
+    """
+    return Condition('status table rendered', lambda d: d.execute_script(js))
+
+
+def row_for_player_visible(player_id):
+    """A Task Status row mentioning `player_id` is rendered."""
+    js = """
+    var rows = document.querySelectorAll('table tbody tr');
+    for (var i = 0; i < rows.length; i++) {
+        if (rows[i].innerText.indexOf(arguments[0]) !== -1) return true;
+    }
+    return false;
+    """
+    return Condition(f'row for player {player_id} visible', lambda d: d.execute_script(js, str(player_id)))
+
+
+def task_status_link():
+    """The "Task Status" navigation link (any casing, or an href mentioning task/status)."""
+    xpaths = [
+        "//a[contains(., 'Task Status') or contains(., 'Task status')]",
+        "//a[contains(translate(., 'TASK STATUS', 'task status'), 'task status')]",
+        "//a[contains(@href, 'task') or contains(@href, 'status')]",
+    ]
+
+    def check(d):
+        for xp in xpaths:
+            found = d.find_elements(By.XPATH, xp)
+            if found:
+                return found[0]
+        return None
+    return Condition('task status link present', check)
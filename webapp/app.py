@@ -1,30 +1,73 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, flash
+from flask import Flask, render_template, request, redirect, url_for, send_file, send_from_directory, flash, jsonify, abort
+import atexit
+from datetime import datetime
+import gzip
+import hashlib
+import mimetypes
 import os
 from pathlib import Path
 import sys
 # Ensure project root is on sys.path so `import webapp.*` works when running this file directly
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from webapp.models import init_db, get_conn, add_player, list_players, create_job, list_jobs, get_job, update_job_status
-from webapp.tasks import start_worker, enqueue_job
+from webapp.models import init_db, add_player, list_players, create_job, list_jobs_page, jobs_version, get_job, get_job_players, get_artifact, job_artifacts
+from webapp.tasks import start_worker, enqueue_job, worker_stats
+from webapp.player_cache import get_cache
+from backends import BACKENDS, DEFAULT_BACKEND
+from driver_pool import LAUNCH_PROFILES
+from status_snapshot import get_service
+import metrics
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / 'jobs_data'
+DATA_DIR = Path(os.environ.get('WOS_DATA_DIR') or BASE_DIR / 'jobs_data')
 DATA_DIR.mkdir(exist_ok=True)
+DB_PATH = os.environ.get('WOS_DB') or str(BASE_DIR / 'app.db')
+
+# archived artifacts never change (webapp/artifacts.py), so browsers may keep them for a year
+ARTIFACT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+JOBS_PAGE_SIZE = 50
+JOBS_PAGE_MAX = 500
+
+# once per process, however many apps create_app() builds
+atexit.register(metrics.flush)
+
+
+def _jobs_query_args(args):
+    """Parse the listing filters shared by /jobs and /api/jobs."""
+    try:
+        limit = min(max(int(args.get('limit', JOBS_PAGE_SIZE)), 1), JOBS_PAGE_MAX)
+    except ValueError:
+        limit = JOBS_PAGE_SIZE
+    try:
+        cursor = int(args['cursor']) if args.get('cursor') else None
+    except ValueError:
+        cursor = None
+    filters = {
+        'status': args.get('status') or None,
+        'created_from': args.get('from') or None,
+        'created_to': args.get('to') or None,
+    }
+    return limit, cursor, filters
 
 def create_app():
     app = Flask(__name__)
     app.secret_key = os.environ.get('FLASK_SECRET', 'dev-secret')
 
-    # init DB
-    init_db(str(BASE_DIR / 'app.db'))
+    # init DB; workers run in their own process (python -m webapp.worker)
+    init_db(DB_PATH)
 
-    # start background worker
-    start_worker()
+    # share this process's counters (e.g. SQLite lock waits) with /metrics in other processes
+    @app.after_request
+    def _flush_metrics(resp):
+        metrics.maybe_flush()
+        return resp
 
     @app.route('/')
     def index():
         players = list_players()
-        return render_template('index.html', players=players)
+        applied = get_cache().lookup(players)
+        return render_template('index.html', players=players, applied=applied, backends=sorted(BACKENDS), default_backend=DEFAULT_BACKEND,
+                               launch_profiles=sorted(LAUNCH_PROFILES))
 
     @app.route('/add_player', methods=['POST'])
     def add_player_route():
@@ -41,15 +84,88 @@ def create_app():
         if not selected:
             flash('No players selected')
             return redirect(url_for('index'))
-        job_id = create_job(','.join(selected))
-        enqueue_job(job_id, selected)
-        flash(f'Job {job_id} created')
+        backend = request.form.get('backend') or None
+        if backend and backend not in BACKENDS:
+            flash(f'Unknown backend {backend}')
+            return redirect(url_for('index'))
+        launch_profile = request.form.get('launch_profile') or None
+        if launch_profile and launch_profile not in LAUNCH_PROFILES:
+            flash(f'Unknown Chrome profile {launch_profile}')
+            return redirect(url_for('index'))
+        # skip players already applied today unless the user forces a resubmit
+        force = bool(request.form.get('force'))
+        to_apply, skipped = (selected, []) if force else get_cache().split(selected)
+        if not to_apply:
+            flash(f'Nothing to do: already applied today: {", ".join(skipped)}')
+            return redirect(url_for('index'))
+        job_id = create_job(','.join(to_apply), skipped=','.join(skipped) or None)
+        enqueue_job(job_id, to_apply, backend=backend, force=force, launch_profile=launch_profile)
+        if skipped:
+            flash(f'Job {job_id} created; skipped (already applied today): {", ".join(skipped)}')
+        else:
+            flash(f'Job {job_id} created')
         return redirect(url_for('jobs'))
 
     @app.route('/jobs')
     def jobs():
-        jobs = list_jobs()
-        return render_template('jobs.html', jobs=jobs)
+        limit, cursor, filters = _jobs_query_args(request.args)
+        jobs, next_cursor = list_jobs_page(limit=limit, cursor=cursor, **filters)
+        return render_template('jobs.html', jobs=jobs, next_cursor=next_cursor, cursor=cursor, limit=limit,
+                               filters=filters, workers=worker_stats())
+
+    @app.route('/api/jobs')
+    def api_jobs():
+        """Same cursor semantics as /jobs, as JSON. Clients sending If-None-Match get a 304
+        without the page query running while no job has changed."""
+        limit, cursor, filters = _jobs_query_args(request.args)
+        key = f'{jobs_version()}|{limit}|{cursor}|{sorted(filters.items())}'
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        if etag in request.if_none_match:
+            resp = app.response_class(status=304)
+        else:
+            jobs, next_cursor = list_jobs_page(limit=limit, cursor=cursor, **filters)
+            resp = jsonify({'jobs': jobs, 'next_cursor': next_cursor, 'limit': limit})
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
+
+    @app.route('/api/status')
+    def api_status():
+        """Latest shared Task Status snapshot, optionally only rows for `player` (repeatable or
+        comma-separated). The web app never scrapes; workers keep the snapshot fresh."""
+        players = [p for v in request.args.getlist('player') for p in v.replace(',', ' ').split()]
+        snap = get_service().current()
+        etag = hashlib.sha1(f'{snap.version}|{snap.fetched_at}|{sorted(players)}'.encode('utf-8')).hexdigest()
+        if etag in request.if_none_match:
+            resp = app.response_class(status=304)
+        else:
+            data = snap.to_dict(players or None)
+            data['age'] = round(snap.age, 1) if snap.fetched_at else None
+            if players:
+                data['latest'] = {p: (snap.latest(p).to_dict() if snap.latest(p) else None) for p in players}
+            resp = jsonify(data)
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
+
+    @app.route('/metrics')
+    def metrics_route():
+        """Prometheus text: stage histograms and job counters from every worker process,
+        plus live queue/worker gauges."""
+        stats = worker_stats()
+        queue = stats.get('queue') or {}
+        snap = get_service().current()
+        gauges = {
+            'wos_queue_depth': ('Jobs waiting in the queue', queue.get('depth')),
+            'wos_queue_in_flight': ('Jobs claimed by a worker', queue.get('in_flight')),
+            'wos_queue_dead': ('Dead-lettered jobs', queue.get('dead')),
+            'wos_workers': ('Live worker processes', stats.get('workers')),
+            'wos_jobs_in_flight': ('Jobs currently running in a worker', stats.get('in_flight')),
+            'wos_status_snapshot_age_seconds': ('Age of the shared Task Status snapshot',
+                                                round(snap.age, 1) if snap.fetched_at else None),
+        }
+        return app.response_class(metrics.render(metrics.collect(), gauges),
+                                  content_type='text/plain; version=0.0.4; charset=utf-8')
 
     @app.route('/job/<int:job_id>')
     def job_detail(job_id):
@@ -57,18 +173,53 @@ def create_app():
         if not job:
             flash('Job not found')
             return redirect(url_for('jobs'))
-        return render_template('job_detail.html', job=job)
+        latency = None
+        if job.get('submitted_at') and job.get('finished_at') and job['status'] != 'submitted':
+            try:
+                delta = datetime.fromisoformat(job['finished_at']) - datetime.fromisoformat(job['submitted_at'])
+                latency = int(delta.total_seconds())
+            except ValueError:
+                pass
+        return render_template('job_detail.html', job=job, players=get_job_players(job_id), latency=latency,
+                               artifacts=job_artifacts(job_id))
 
     @app.route('/jobs_data/<path:filename>')
     def jobs_data(filename):
-        return send_from_directory(str(DATA_DIR), filename)
+        """Job files. Archived ones come from the manifest with a strong ETag and a long
+        cache lifetime, gzipped on disk and sent as-is to clients that accept gzip."""
+        art = get_artifact(filename)
+        if art is None:
+            # the job is still running and may rewrite the file: revalidate every time
+            return send_from_directory(str(DATA_DIR), filename, max_age=0)
+        stored = DATA_DIR / (filename + '.gz' if art['encoding'] == 'gzip' else filename)
+        send_gzip = art['encoding'] == 'gzip' and 'gzip' in request.accept_encodings
+        etag = art['etag'] + ('-gzip' if send_gzip else '')
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if request.if_none_match.contains(etag):
+            resp = app.response_class(status=304)
+        elif not stored.is_file():
+            abort(404)  # pruned since the lookup
+        elif art['encoding'] == 'gzip' and not send_gzip:
+            with gzip.open(stored, 'rb') as f:
+                resp = app.response_class(f.read(), mimetype=mimetype)
+        else:
+            resp = send_file(stored, mimetype=mimetype, download_name=Path(filename).name, etag=False, conditional=False)
+            if send_gzip:
+                resp.headers['Content-Encoding'] = 'gzip'
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = ARTIFACT_CACHE_CONTROL
+        if art['encoding'] == 'gzip':
+            resp.vary.add('Accept-Encoding')
+        return resp
 
     return app
 
 
 if __name__ == '__main__':
+    # development: run a worker pool inside the dev server so one command is enough
     _app = create_app()
-    _app.run(debug=True)
+    start_worker()
+    _app.run(debug=True, use_reloader=False)
 
 # Expose the Flask application as a module-level variable for WSGI servers (gunicorn, render, etc.)
 # Gunicorn will import `webapp.app:app` to get this application object.
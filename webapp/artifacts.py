@@ -0,0 +1,152 @@
+"""
+Artifact store for the per-job files under the data dir (jobs_data/job_<id>/: Task Status
+CSVs, apply responses, screenshots).
+
+A final job's directory no longer changes, so the worker's sweeper archives it once:
+
+  - CSV and JSON files are gzipped in place (task_status.csv -> task_status.csv.gz)
+  - every file goes into the `artifacts` table with its size, size on disk, encoding and
+    a SHA-1 of its content. The job page lists files from there without touching the disk,
+    and the web app serves them with that strong ETag and a long cache lifetime,
+    precompressed to clients that accept gzip.
+
+Retention then removes whole job directories: those older than WOS_ARTIFACT_MAX_AGE_DAYS
+(default 30), then the oldest until the total is under WOS_ARTIFACT_MAX_MB (default 1024).
+Jobs that are still running are never touched. A job whose archiving failed has no
+manifest; its directory is removed by age alone.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from webapp import models
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(os.environ.get('WOS_DATA_DIR') or BASE_DIR / 'jobs_data')
+
+MAX_AGE_DAYS = float(os.environ.get('WOS_ARTIFACT_MAX_AGE_DAYS', '30'))
+MAX_BYTES = int(float(os.environ.get('WOS_ARTIFACT_MAX_MB', '1024')) * 1024 * 1024)
+
+# text formats worth compressing; images are already compressed
+COMPRESS_SUFFIXES = ('.csv', '.json')
+CHUNK = 64 * 1024
+
+
+def job_dir(job_id, data_dir=None):
+    return Path(data_dir or DATA_DIR) / f'job_{job_id}'
+
+
+def _sha1(path, opener=open):
+    h = hashlib.sha1()
+    with opener(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _gzip(path):
+    """Compress `path` to `path.gz` and remove it; keeps the original if gzip does not help.
+    Returns the file now holding the content."""
+    gz = path.with_name(path.name + '.gz')
+    tmp = gz.with_name('.' + gz.name + '.tmp')
+    # mtime=0 so the same content always gives the same bytes
+    with open(path, 'rb') as src, open(tmp, 'wb') as raw, gzip.GzipFile(filename='', fileobj=raw, mode='wb', mtime=0) as dst:
+        shutil.copyfileobj(src, dst, CHUNK)
+    if tmp.stat().st_size >= path.stat().st_size:
+        tmp.unlink()
+        return path
+    os.replace(tmp, gz)
+    path.unlink()
+    return gz
+
+
+def archive_job(job_id, data_dir=None):
+    """Compress a final job's files and record them in the manifest. Returns the rows."""
+    data_dir = Path(data_dir or DATA_DIR)
+    root = job_dir(job_id, data_dir)
+    rows = []
+    for path in sorted(root.rglob('*')) if root.is_dir() else []:
+        if not path.is_file() or path.name.startswith('.'):
+            continue
+        if path.suffix in COMPRESS_SUFFIXES:
+            path = _gzip(path)
+        encoding = 'gzip' if path.suffix == '.gz' else None
+        logical = path.with_suffix('') if encoding else path
+        st = path.stat()
+        if encoding:
+            with gzip.open(path, 'rb') as f:
+                size = sum(len(chunk) for chunk in iter(lambda: f.read(CHUNK), b''))
+        else:
+            size = st.st_size
+        rows.append({'path': logical.relative_to(data_dir).as_posix(), 'size': size, 'stored_size': st.st_size,
+                     'encoding': encoding, 'etag': _sha1(path, gzip.open if encoding else open),
+                     'created_at': datetime.utcfromtimestamp(st.st_mtime).isoformat()})
+    models.add_artifacts(job_id, rows)
+    return rows
+
+
+def prune(max_age_days=None, max_bytes=None, data_dir=None, now=None):
+    """Delete archived jobs' directories past the age or total size limit. Returns their job ids."""
+    max_age_days = MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=max_age_days)).isoformat()
+    jobs = models.artifact_jobs()
+    total = sum(j['stored_size'] for j in jobs)
+    doomed = []
+    for j in jobs:
+        if (j['created_at'] or '') >= cutoff and total <= max_bytes:
+            break
+        doomed.append(j['job_id'])
+        total -= j['stored_size']
+    # jobs whose archiving failed have no manifest; they only expire by age
+    doomed += [j for j in models.unlisted_archived_jobs(cutoff) if job_dir(j, data_dir).exists()]
+    # forget them first: a missing row makes the web app answer 404 instead of a broken file
+    models.delete_artifacts(doomed)
+    for job_id in doomed:
+        shutil.rmtree(job_dir(job_id, data_dir), ignore_errors=True)
+    return doomed
+
+
+def sweep(data_dir=None, batch=100):
+    """Archive every final job not archived yet, then apply retention.
+
+    Jobs are claimed before their files are touched, so sweepers in several worker
+    processes never compress the same directory.
+    """
+    archived = 0
+    while True:
+        job_ids = models.claim_jobs_to_archive(batch)
+        for job_id in job_ids:
+            try:
+                archive_job(job_id, data_dir)
+            except OSError as e:
+                # stays claimed, so it is not retried every sweep; prune() still removes it by age
+                print(f'Could not archive job {job_id}:', e)
+        archived += len(job_ids)
+        if len(job_ids) < batch:
+            break
+    pruned = prune(data_dir=data_dir)
+    if archived or pruned:
+        print(f'Artifacts: archived {archived} job(s), pruned {len(pruned)}')
+    return archived, pruned
+
+
+def run(interval, stop=None):
+    """Sweep every `interval` seconds until `stop` (a threading.Event) is set."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            sweep()
+        except Exception as e:
+            print('Artifact sweep failed:', e)
+        stop.wait(interval)
+
+
+def start_sweeper(interval, stop=None):
+    thread = threading.Thread(target=run, args=(interval, stop), name='artifact-sweeper', daemon=True)
+    thread.start()
+    return thread
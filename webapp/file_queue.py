@@ -0,0 +1,316 @@
+"""Local job queue on the filesystem, safe for several consumer processes on one machine.
+
+Layout under the queue directory (default jobs_data/incoming):
+  job_<ns>_<job_id>.json     ready messages; <ns> is the enqueue time so names sort FIFO
+  claimed/<host>-<pid>/      messages a consumer is working on
+  dead/                      messages that failed more than `max_retries` times, or were buried
+
+Producers write a hidden temp file and rename it into place. Consumers claim a message by
+renaming it into their own claimed/ directory. rename is atomic, so exactly one consumer
+wins. Each consumer keeps a small in-memory index (a heap of names) instead of listing the
+directory on every poll. On Linux it sleeps on inotify and wakes as soon as a file is
+renamed in. Elsewhere it polls the directory mtime with backoff. Claims left behind by
+dead processes are moved back by reap(), which the worker also runs at startup.
+
+The interface mirrors webapp.redis_queue.RedisQueue (put/get/get_nowait/ack/nack/bury/reap/stats).
+"""
+import ctypes
+import ctypes.util
+import heapq
+import json
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _is_message(name):
+    return name.startswith('job_') and name.endswith('.json')
+
+
+def _pid_alive(pid):
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class _Inotify:
+    """Minimal inotify watcher via ctypes (Linux only). Yields names renamed/written into a dir."""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(str(path)), _IN_MOVED_TO | _IN_CLOSE_WRITE)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds. Returns (names, overflowed)."""
+        ready, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        names, overflow, offset = [], False, 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                names.append(name)
+        return names, overflow
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class FileMessage:
+    def __init__(self, path, payload, attempts=0):
+        self.path = path
+        self.payload = payload
+        self.attempts = attempts
+
+
+class FileQueue:
+    def __init__(self, qdir, max_retries=3, max_poll=0.25):
+        self.qdir = Path(qdir)
+        self.claimed_root = self.qdir / 'claimed'
+        self.dead_dir = self.qdir / 'dead'
+        for d in (self.qdir, self.claimed_root, self.dead_dir):
+            d.mkdir(parents=True, exist_ok=True)
+        self.max_retries = max_retries
+        self.max_poll = max_poll
+        self.host = socket.gethostname()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._index = []
+        self._indexed = set()
+        self._watcher = None
+        self._dir_mtime = None
+
+    # -- per-process state ---------------------------------------------------
+
+    def _ensure_process(self):
+        """(Re)initialise index and watcher after construction or a fork."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._watcher = None
+        try:
+            self._watcher = _Inotify(self.qdir)
+        except Exception:
+            self._watcher = None
+        self._rescan()
+
+    @property
+    def claim_dir(self):
+        d = self.claimed_root / f'{self.host}-{os.getpid()}'
+        d.mkdir(exist_ok=True)
+        return d
+
+    def _add(self, name):
+        if _is_message(name) and name not in self._indexed:
+            self._indexed.add(name)
+            heapq.heappush(self._index, name)
+
+    def _rescan(self):
+        self._index, self._indexed = [], set()
+        try:
+            self._dir_mtime = os.stat(self.qdir).st_mtime_ns
+            with os.scandir(self.qdir) as it:
+                for entry in it:
+                    self._add(entry.name)
+        except FileNotFoundError:
+            self.qdir.mkdir(parents=True, exist_ok=True)
+
+    # -- producer ------------------------------------------------------------
+
+    def put(self, payload, attempts=0):
+        name = f"job_{time.time_ns():020d}_{payload.get('job_id', 'x')}.json"
+        tmp = self.qdir / f'.{name}.{os.getpid()}.tmp'
+        body = dict(payload)
+        if attempts:
+            body['_attempts'] = attempts
+        tmp.write_text(json.dumps(body))
+        os.replace(tmp, self.qdir / name)
+
+    # -- consumer ------------------------------------------------------------
+
+    def _claim_next(self):
+        while self._index:
+            name = heapq.heappop(self._index)
+            self._indexed.discard(name)
+            target = self.claim_dir / name
+            try:
+                os.rename(self.qdir / name, target)
+            except OSError:
+                # claimed by another consumer (or already gone)
+                continue
+            try:
+                body = json.loads(target.read_text())
+            except Exception:
+                os.replace(target, self.dead_dir / name)
+                continue
+            attempts = body.pop('_attempts', 0)
+            return FileMessage(target, body, attempts)
+        return None
+
+    def get_nowait(self):
+        with self._lock:
+            self._ensure_process()
+            if self._watcher is not None:
+                # events are otherwise only read by a blocking get(); callers polling
+                # get_nowait() (batch collection) must see messages renamed in meanwhile
+                self._apply_events(*self._watcher.wait(0))
+            elif not self._index:
+                self._refresh_if_changed()
+            return self._claim_next()
+
+    def get(self, timeout=1):
+        """Wait up to `timeout` seconds for a message; returns a FileMessage or None."""
+        deadline = time.monotonic() + timeout
+        poll = 0.01
+        while True:
+            msg = self.get_nowait()
+            if msg is not None:
+                return msg
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self._watcher is not None:
+                names, overflow = self._watcher.wait(remaining)
+                with self._lock:
+                    self._apply_events(names, overflow)
+            else:
+                time.sleep(min(poll, remaining))
+                poll = min(poll * 2, self.max_poll)
+
+    def _apply_events(self, names, overflow):
+        if overflow:
+            self._rescan()
+        for name in names:
+            self._add(name)
+
+    def _refresh_if_changed(self):
+        try:
+            mtime = os.stat(self.qdir).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._dir_mtime:
+            self._rescan()
+
+    def ack(self, msg):
+        try:
+            msg.path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def nack(self, msg):
+        """Requeue for retry, or dead-letter after max_retries. Returns True if dead-lettered."""
+        attempts = msg.attempts + 1
+        if attempts > self.max_retries:
+            try:
+                os.replace(msg.path, self.dead_dir / msg.path.name)
+            except FileNotFoundError:
+                pass
+            return True
+        self.put(msg.payload, attempts=attempts)
+        try:
+            msg.path.unlink()
+        except FileNotFoundError:
+            pass
+        return False
+
+    def bury(self, job_ids):
+        """Dead-letter claimed messages of `job_ids` on this host without a retry, e.g. after
+        the supervisor killed their worker and failed the jobs. Returns how many were moved."""
+        wanted = {str(j) for j in job_ids}
+        moved = 0
+        for d in self.claimed_root.iterdir():
+            if not d.is_dir() or not d.name.startswith(f'{self.host}-'):
+                continue
+            for path in d.glob('job_*.json'):
+                # job_<ns>_<job_id>.json
+                if path.stem.rsplit('_', 1)[-1] not in wanted:
+                    continue
+                try:
+                    os.replace(path, self.dead_dir / path.name)
+                    moved += 1
+                except FileNotFoundError:
+                    pass
+        return moved
+
+    # -- maintenance ---------------------------------------------------------
+
+    def reap(self):
+        """Move claims of dead consumers on this host back to the queue.
+
+        Returns (FileMessage, dead) pairs like RedisQueue.reap().
+        """
+        handled = []
+        prefix = f'{self.host}-'
+        for d in self.claimed_root.iterdir():
+            if not d.is_dir() or not d.name.startswith(prefix):
+                continue
+            try:
+                pid = int(d.name[len(prefix):])
+            except ValueError:
+                continue
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            for path in sorted(d.glob('job_*.json')):
+                try:
+                    body = json.loads(path.read_text())
+                except Exception:
+                    body = {}
+                msg = FileMessage(path, body, body.pop('_attempts', 0))
+                handled.append((msg, self.nack(msg)))
+            try:
+                d.rmdir()
+            except OSError:
+                pass
+        return handled
+
+    def stats(self):
+        def count(d):
+            try:
+                return sum(1 for e in os.scandir(d) if _is_message(e.name))
+            except FileNotFoundError:
+                return 0
+        in_flight = sum(count(d) for d in self.claimed_root.iterdir() if d.is_dir())
+        return {'depth': count(self.qdir), 'in_flight': in_flight, 'dead': count(self.dead_dir)}
@@ -1,98 +1,414 @@
+import json
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Optional
 
+import metrics
+
 DB_PATH = None
 
+# one connection per (process, thread); sqlite3 connections must not cross threads or forks
+_local = threading.local()
+
+# applied to every new connection. WAL lets the web tier read while a worker writes;
+# busy_timeout makes writers queue up instead of failing with "database is locked".
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=%d' % int(os.environ.get('WOS_DB_BUSY_TIMEOUT_MS', '10000')),
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA mmap_size=67108864',
+    'PRAGMA foreign_keys=ON',
+)
+
 def init_db(db_path: str):
     global DB_PATH
     DB_PATH = db_path
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS players (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        player_id TEXT UNIQUE
-    )
-    ''')
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS jobs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        player_ids TEXT,
-        status TEXT,
-        created_at TEXT,
-        finished_at TEXT,
-        result_csv TEXT
-    )
-    ''')
-    conn.commit()
-    conn.close()
-
-def get_conn():
+    with transaction() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id TEXT UNIQUE
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_ids TEXT,
+            status TEXT,
+            created_at TEXT,
+            finished_at TEXT,
+            result_csv TEXT
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_state (
+            player_id TEXT PRIMARY KEY,
+            last_applied_at TEXT,
+            last_status TEXT,
+            result_url TEXT,
+            expires_at TEXT
+        )
+        ''')
+        # one row per submitted player, followed by the completion tracker until the site
+        # reports a final state for it
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_players (
+            job_id INTEGER,
+            player_id TEXT,
+            status TEXT,
+            result_url TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (job_id, player_id)
+        )
+        ''')
+        # manifest of a finished job's files under the data dir (webapp/artifacts.py)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS artifacts (
+            path TEXT PRIMARY KEY,
+            job_id INTEGER,
+            size INTEGER,
+            stored_size INTEGER,
+            encoding TEXT,
+            etag TEXT,
+            created_at TEXT
+        )
+        ''')
+        _ensure_column(conn, 'jobs', 'skipped', 'TEXT')
+        _ensure_column(conn, 'jobs', 'updated_at', 'TEXT')
+        _ensure_column(conn, 'jobs', 'submitted_at', 'TEXT')
+        # JSON {stage: seconds} recorded by the worker (see metrics.py)
+        _ensure_column(conn, 'jobs', 'timings', 'TEXT')
+        # set once the job's artifacts are compressed and listed in `artifacts`
+        _ensure_column(conn, 'jobs', 'archived_at', 'TEXT')
+        # rows Task Status listed for the player just before the submission (webapp/tracker.py)
+        _ensure_column(conn, 'job_players', 'baseline', 'INTEGER')
+        # indexes for the queries we run: jobs by status (worker/monitoring, newest first),
+        # jobs by creation date (listing filters) and unexpired player state lookups
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_id ON jobs(status, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_player_state_expires ON player_state(expires_at)')
+        # MAX(updated_at) is the cheap change marker behind the jobs API ETag
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs(updated_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_job_players_status ON job_players(status)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_artifacts_job ON artifacts(job_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_artifacts_created_at ON artifacts(created_at)')
+    get_conn().execute('PRAGMA optimize')
+
+def _ensure_column(conn, table: str, column: str, decl: str):
+    """Add a column to an existing table (simple in-place migration for old app.db files)."""
+    cols = [r[1] for r in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+    if column not in cols:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+def _connect() -> sqlite3.Connection:
+    # autocommit mode: transactions are opened explicitly by transaction()
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False,
+                           cached_statements=256)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_conn() -> sqlite3.Connection:
+    """Connection owned by the calling thread (reused across calls; do not close it)."""
     if not DB_PATH:
         raise RuntimeError('DB not initialized')
-    return sqlite3.connect(DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid() or _local.path != DB_PATH:
+        conn = _connect()
+        _local.conn, _local.pid, _local.path = conn, os.getpid(), DB_PATH
+    return conn
 
-def add_player(player_id: str):
+def close_conn():
+    """Close the calling thread's connection (e.g. at thread exit)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+@contextmanager
+def transaction():
+    """Write transaction. BEGIN IMMEDIATE takes the write lock up front so concurrent
+    writers wait on busy_timeout instead of deadlocking on a lock upgrade."""
     conn = get_conn()
+    started = time.monotonic()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+    except sqlite3.OperationalError as e:
+        if 'locked' in str(e):
+            metrics.REGISTRY.inc('wos_db_lock_errors_total')
+        raise
+    metrics.REGISTRY.observe('wos_db_lock_wait_seconds', time.monotonic() - started)
     try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+def add_player(player_id: str):
+    with transaction() as conn:
         conn.execute('INSERT OR IGNORE INTO players(player_id) VALUES (?)', (player_id,))
-        conn.commit()
-    finally:
-        conn.close()
 
 def list_players() -> List[str]:
-    conn = get_conn()
-    try:
-        cur = conn.execute('SELECT player_id FROM players ORDER BY id')
-        return [row[0] for row in cur.fetchall()]
-    finally:
-        conn.close()
+    cur = get_conn().execute('SELECT player_id FROM players ORDER BY id')
+    return [row[0] for row in cur.fetchall()]
 
-def create_job(player_ids: str) -> int:
-    conn = get_conn()
-    try:
-        now = datetime.utcnow().isoformat()
-        cur = conn.execute('INSERT INTO jobs(player_ids, status, created_at) VALUES (?, ?, ?)', (player_ids, 'queued', now))
-        conn.commit()
+def create_job(player_ids: str, skipped: str = None) -> int:
+    now = datetime.utcnow().isoformat()
+    with transaction() as conn:
+        cur = conn.execute('INSERT INTO jobs(player_ids, status, created_at, skipped, updated_at) VALUES (?, ?, ?, ?, ?)', (player_ids, 'queued', now, skipped, now))
         return cur.lastrowid
-    finally:
-        conn.close()
 
-def list_jobs():
-    conn = get_conn()
-    try:
-        cur = conn.execute('SELECT id, player_ids, status, created_at, finished_at, result_csv FROM jobs ORDER BY id DESC')
-        rows = cur.fetchall()
-        jobs = []
-        for r in rows:
-            jobs.append({
-                'id': r[0], 'player_ids': r[1], 'status': r[2], 'created_at': r[3], 'finished_at': r[4], 'result_csv': r[5]
-            })
-        return jobs
-    finally:
-        conn.close()
+_JOB_COLUMNS = 'id, player_ids, status, created_at, finished_at, result_csv, skipped, updated_at, submitted_at, timings'
+
+def _job_row(r) -> dict:
+    return {'id': r[0], 'player_ids': r[1], 'status': r[2], 'created_at': r[3], 'finished_at': r[4], 'result_csv': r[5],
+            'skipped': r[6], 'updated_at': r[7], 'submitted_at': r[8], 'timings': json.loads(r[9]) if r[9] else None}
+
+def list_jobs(limit: int = None, before_id: int = None, status: str = None,
+              created_from: str = None, created_to: str = None) -> List[dict]:
+    """Jobs newest first. Keyset pagination: pass the last id of a page as `before_id`
+    to get the next one; this stays an index range scan however deep you page.
+
+    `created_from`/`created_to` are ISO timestamps (inclusive / exclusive).
+    """
+    where, params = [], []
+    if before_id:
+        where.append('id < ?')
+        params.append(before_id)
+    if status:
+        where.append('status = ?')
+        params.append(status)
+    if created_from:
+        where.append('created_at >= ?')
+        params.append(created_from)
+    if created_to:
+        where.append('created_at < ?')
+        params.append(created_to)
+    sql = f'SELECT {_JOB_COLUMNS} FROM jobs'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY id DESC'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    cur = get_conn().execute(sql, params)
+    return [_job_row(r) for r in cur.fetchall()]
+
+def list_jobs_page(limit: int = 50, cursor: int = None, **filters):
+    """One page of jobs plus the cursor for the next page (None on the last page)."""
+    rows = list_jobs(limit=limit + 1, before_id=cursor, **filters)
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def jobs_version() -> str:
+    """Changes whenever a job is created or updated; two index lookups, no table scan."""
+    # separate subqueries so each MAX() uses sqlite's index min/max shortcut
+    r = get_conn().execute('SELECT (SELECT MAX(id) FROM jobs), (SELECT MAX(updated_at) FROM jobs)').fetchone()
+    return f'{r[0] or 0}:{r[1] or ""}'
 
 def get_job(job_id: int) -> Optional[dict]:
-    conn = get_conn()
-    try:
-        cur = conn.execute('SELECT id, player_ids, status, created_at, finished_at, result_csv FROM jobs WHERE id=?', (job_id,))
-        r = cur.fetchone()
-        if not r:
-            return None
-        return {'id': r[0], 'player_ids': r[1], 'status': r[2], 'created_at': r[3], 'finished_at': r[4], 'result_csv': r[5]}
-    finally:
-        conn.close()
+    cur = get_conn().execute(f'SELECT {_JOB_COLUMNS} FROM jobs WHERE id=?', (job_id,))
+    r = cur.fetchone()
+    if not r:
+        return None
+    return _job_row(r)
+
+def _status_update(job_id: int, status: str, finished_at: str = None, result_csv: str = None):
+    """(sql, params) for one status update; shared by the single and batched writers.
+
+    `finished_at` and `result_csv` are written whenever given, independently of each other.
+    """
+    now = datetime.utcnow().isoformat()
+    sets, params = ['status=?'], [status]
+    if finished_at:
+        sets.append('finished_at=?')
+        params.append(finished_at)
+    if result_csv:
+        sets.append('result_csv=?')
+        params.append(result_csv)
+    sets.append('updated_at=?')
+    return f"UPDATE jobs SET {', '.join(sets)} WHERE id=?", (*params, now, job_id)
 
 def update_job_status(job_id: int, status: str, finished_at: str = None, result_csv: str = None):
-    conn = get_conn()
-    try:
-        if finished_at and result_csv:
-            conn.execute('UPDATE jobs SET status=?, finished_at=?, result_csv=? WHERE id=?', (status, finished_at, result_csv, job_id))
-        elif finished_at:
-            conn.execute('UPDATE jobs SET status=?, finished_at=? WHERE id=?', (status, finished_at, job_id))
-        else:
-            conn.execute('UPDATE jobs SET status=? WHERE id=?', (status, job_id))
-        conn.commit()
-    finally:
-        conn.close()
+    sql, params = _status_update(job_id, status, finished_at, result_csv)
+    with transaction() as conn:
+        conn.execute(sql, params)
+
+def update_job_statuses(updates: List[dict]):
+    """Apply many status updates in one transaction.
+
+    Each update is a dict with the update_job_status keyword arguments (job_id, status,
+    finished_at, result_csv).
+    """
+    if not updates:
+        return
+    with transaction() as conn:
+        for u in updates:
+            conn.execute(*_status_update(**u))
+
+def set_job_timings(timings: dict):
+    """Store per-stage timings: `timings` maps job_id -> {stage: seconds}."""
+    if not timings:
+        return
+    # updated_at moves the jobs API ETag (jobs_version) so pollers see the timings
+    now = datetime.utcnow().isoformat()
+    with transaction() as conn:
+        conn.executemany('UPDATE jobs SET timings=?, updated_at=? WHERE id=?',
+                         [(json.dumps(t, sort_keys=True), now, job_id) for job_id, t in timings.items()])
+
+def upsert_player_states(states: List[dict]):
+    """Insert or update per-player state rows (player_id, last_applied_at, last_status, result_url, expires_at).
+
+    Missing/None fields keep their stored value.
+    """
+    if not states:
+        return
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO player_state(player_id, last_applied_at, last_status, result_url, expires_at)
+        VALUES (:player_id, :last_applied_at, :last_status, :result_url, :expires_at)
+        ON CONFLICT(player_id) DO UPDATE SET
+            last_applied_at=COALESCE(excluded.last_applied_at, last_applied_at),
+            last_status=COALESCE(excluded.last_status, last_status),
+            result_url=COALESCE(excluded.result_url, result_url),
+            expires_at=COALESCE(excluded.expires_at, expires_at)
+        ''', [{'last_applied_at': None, 'last_status': None, 'result_url': None, 'expires_at': None, **st} for st in states])
+
+def get_player_states(player_ids: List[str], now: str) -> dict:
+    """Unexpired player_state rows for the given players, keyed by player_id."""
+    if not player_ids:
+        return {}
+    marks = ','.join('?' * len(player_ids))
+    cur = get_conn().execute(f'''SELECT player_id, last_applied_at, last_status, result_url, expires_at FROM player_state
+                             WHERE player_id IN ({marks}) AND expires_at > ?''', (*player_ids, now))
+    return {r[0]: {'player_id': r[0], 'last_applied_at': r[1], 'last_status': r[2], 'result_url': r[3], 'expires_at': r[4]}
+            for r in cur.fetchall()}
+
+# --- completion tracking ------------------------------------------------------
+
+# per-player states that end tracking, and how a job's final status follows from them
+FINAL_PLAYER_STATES = ('done', 'failed', 'unconfirmed')
+
+def track_job_players(job_players: dict, submitted_at: str = None, baselines: dict = None):
+    """Start tracking: `job_players` maps job_id -> player ids just submitted for it,
+    `baselines` player id -> rows Task Status listed for it before the submission."""
+    now = submitted_at or datetime.utcnow().isoformat()
+    baselines = baselines or {}
+    with transaction() as conn:
+        for job_id, player_ids in job_players.items():
+            conn.executemany('''INSERT OR REPLACE INTO job_players(job_id, player_id, status, result_url, updated_at, baseline)
+                                VALUES (?, ?, 'pending', NULL, ?, ?)''',
+                             [(job_id, str(p), now, baselines.get(str(p), 0)) for p in player_ids])
+            conn.execute('UPDATE jobs SET submitted_at=?, updated_at=? WHERE id=?', (now, now, job_id))
+
+def pending_job_players() -> List[dict]:
+    """Players still waiting for a final Task Status state, with their job's submit time."""
+    cur = get_conn().execute('''SELECT jp.job_id, jp.player_id, j.submitted_at, jp.baseline FROM job_players jp
+                             JOIN jobs j ON j.id = jp.job_id WHERE jp.status = 'pending'
+                             ''')
+    return [{'job_id': r[0], 'player_id': r[1], 'submitted_at': r[2], 'baseline': r[3] or 0} for r in cur.fetchall()]
+
+def get_job_players(job_id: int) -> List[dict]:
+    cur = get_conn().execute('SELECT player_id, status, result_url, updated_at FROM job_players WHERE job_id=? ORDER BY player_id',
+                             (job_id,))
+    return [{'player_id': r[0], 'status': r[1], 'result_url': r[2], 'updated_at': r[3]} for r in cur.fetchall()]
+
+def _final_job_status(states: List[str]) -> str:
+    if all(s == 'done' for s in states):
+        return 'done'
+    if any(s == 'done' for s in states):
+        return 'partial'
+    return 'unconfirmed' if all(s == 'unconfirmed' for s in states) else 'failed'
+
+def update_job_players(updates: List[dict]) -> List[tuple]:
+    """Record per-player states (dicts with job_id, player_id, status, result_url).
+
+    Jobs whose players have all reached a final state get their final status (done, partial,
+    failed or unconfirmed) and finished_at. Returns [(job_id, final_status)] for the jobs this
+    call moved out of `submitted`.
+    """
+    if not updates:
+        return []
+    now = datetime.utcnow().isoformat()
+    finished = []
+    with transaction() as conn:
+        conn.executemany('''UPDATE job_players SET status=:status, result_url=COALESCE(:result_url, result_url), updated_at=:now
+                            WHERE job_id=:job_id AND player_id=:player_id''',
+                         [{'result_url': None, **u, 'now': now} for u in updates])
+        for job_id in sorted({u['job_id'] for u in updates}):
+            states = [r[0] for r in conn.execute('SELECT status FROM job_players WHERE job_id=?', (job_id,))]
+            if states and all(s in FINAL_PLAYER_STATES for s in states):
+                status = _final_job_status(states)
+                cur = conn.execute("UPDATE jobs SET status=?, finished_at=?, updated_at=? WHERE id=? AND status='submitted'",
+                                   (status, now, now, job_id))
+                # already finished elsewhere (e.g. timed out by the supervisor): not ours to report
+                if cur.rowcount == 1:
+                    finished.append((job_id, status))
+    return finished
+
+# job states after which the worker and the tracker never touch the job again
+FINAL_JOB_STATUSES = ('done', 'partial', 'failed', 'unconfirmed', 'error', 'blocked', 'skipped')
+
+_ARTIFACT_COLUMNS = 'path, job_id, size, stored_size, encoding, etag, created_at'
+
+def _artifact_row(r) -> dict:
+    return {'path': r[0], 'job_id': r[1], 'size': r[2], 'stored_size': r[3], 'encoding': r[4], 'etag': r[5],
+            'created_at': r[6]}
+
+def claim_jobs_to_archive(limit: int = 100) -> List[int]:
+    """Mark up to `limit` final, unarchived jobs archived and return them, oldest first.
+
+    Selecting and marking happen in one write transaction, so when several workers sweep
+    at once every job is handed to exactly one of them.
+    """
+    marks = ','.join('?' * len(FINAL_JOB_STATUSES))
+    now = datetime.utcnow().isoformat()
+    with transaction() as conn:
+        job_ids = [r[0] for r in conn.execute(
+            f'SELECT id FROM jobs WHERE status IN ({marks}) AND archived_at IS NULL ORDER BY id LIMIT ?',
+            (*FINAL_JOB_STATUSES, limit))]
+        conn.executemany('UPDATE jobs SET archived_at=? WHERE id=? AND archived_at IS NULL',
+                         [(now, j) for j in job_ids])
+    return job_ids
+
+def add_artifacts(job_id: int, artifacts: List[dict]):
+    """Record a job's files (dicts with the artifacts columns)."""
+    with transaction() as conn:
+        conn.executemany(f'''INSERT OR REPLACE INTO artifacts({_ARTIFACT_COLUMNS})
+                             VALUES (:path, :job_id, :size, :stored_size, :encoding, :etag, :created_at)''',
+                         [dict(a, job_id=job_id) for a in artifacts])
+
+def get_artifact(path: str) -> Optional[dict]:
+    r = get_conn().execute(f'SELECT {_ARTIFACT_COLUMNS} FROM artifacts WHERE path=?', (path,)).fetchone()
+    return _artifact_row(r) if r else None
+
+def job_artifacts(job_id: int) -> List[dict]:
+    cur = get_conn().execute(f'SELECT {_ARTIFACT_COLUMNS} FROM artifacts WHERE job_id=? ORDER BY path', (job_id,))
+    return [_artifact_row(r) for r in cur.fetchall()]
+
+def artifact_jobs() -> List[dict]:
+    """Per job with artifacts: bytes on disk and when its oldest file was written, oldest first."""
+    cur = get_conn().execute('''SELECT job_id, SUM(stored_size), MIN(created_at) FROM artifacts
+                             GROUP BY job_id ORDER BY MIN(created_at), job_id''')
+    return [{'job_id': r[0], 'stored_size': r[1] or 0, 'created_at': r[2]} for r in cur.fetchall()]
+
+def unlisted_archived_jobs(before: str) -> List[int]:
+    """Jobs claimed for archiving before `before` that have no manifest rows (archiving
+    failed or the sweeper died), so retention can still find their directories."""
+    cur = get_conn().execute('''SELECT id FROM jobs j WHERE archived_at IS NOT NULL AND archived_at < ?
+                             AND NOT EXISTS (SELECT 1 FROM artifacts a WHERE a.job_id = j.id) ORDER BY id''',
+                             (before,))
+    return [r[0] for r in cur.fetchall()]
+
+def delete_artifacts(job_ids: List[int]):
+    if not job_ids:
+        return
+    with transaction() as conn:
+        conn.executemany('DELETE FROM artifacts WHERE job_id=?', [(j,) for j in job_ids])
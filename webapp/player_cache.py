@@ -0,0 +1,104 @@
+"""Per-player "applied today" cache.
+
+Remembers when each player was last submitted and the last Task Status state we saw
+for them (pending/done/failed). Entries expire at the site's daily reset
+(WOS_RESET_HOUR_UTC, default 00:00 UTC), so a player is submitted at most once per day
+unless the last attempt failed or the caller forces it.
+
+Backed by Redis when REDIS_URL is set (one hash per player with EXPIREAT), otherwise by
+the player_state table in app.db.
+"""
+import os
+from datetime import datetime
+
+from scheduler import next_reset
+from webapp import models
+from webapp.redis_queue import shared_client
+
+REDIS_URL = os.environ.get('REDIS_URL')
+REDIS_PREFIX = 'wos_player:'
+
+# states that mean "already handled today"; anything else (e.g. failed) may be retried
+SKIP_STATES = ('pending', 'done')
+
+
+class PlayerCache:
+    def __init__(self, redis_client=None):
+        self.client = redis_client
+
+    # -- storage -------------------------------------------------------------
+
+    def _put(self, states):
+        if not states:
+            return
+        if self.client is None:
+            models.upsert_player_states(states)
+            return
+        pipe = self.client.pipeline()
+        for st in states:
+            key = REDIS_PREFIX + st['player_id']
+            fields = {k: v for k, v in st.items() if v is not None}
+            pipe.hset(key, mapping=fields)
+            expires_at = st.get('expires_at')
+            if expires_at:
+                pipe.expireat(key, int((datetime.fromisoformat(expires_at) - datetime(1970, 1, 1)).total_seconds()))
+        pipe.execute()
+
+    def lookup(self, player_ids):
+        """Unexpired state per player id (players without state are absent)."""
+        player_ids = [str(p) for p in player_ids]
+        if self.client is None:
+            return models.get_player_states(player_ids, datetime.utcnow().isoformat())
+        pipe = self.client.pipeline()
+        for pid in player_ids:
+            pipe.hgetall(REDIS_PREFIX + pid)
+        out = {}
+        for pid, raw in zip(player_ids, pipe.execute()):
+            st = {k.decode(): v.decode() for k, v in raw.items()} if raw else None
+            if st and st.get('last_applied_at'):
+                out[pid] = st
+        return out
+
+    # -- recording -----------------------------------------------------------
+
+    def mark_applied(self, player_ids, now=None):
+        now = now or datetime.utcnow()
+        expires = next_reset(now).isoformat()
+        self._put([{'player_id': str(p), 'last_applied_at': now.isoformat(), 'last_status': 'pending',
+                    'result_url': '', 'expires_at': expires} for p in player_ids])
+
+    def record_status(self, records):
+        """Store the latest Task Status state for players we are tracking."""
+        states = []
+        for r in records:
+            for pid in r.player_ids:
+                states.append({'player_id': pid, 'last_status': r.status or None, 'result_url': r.result_url})
+        if not states:
+            return
+        known = self.lookup([st['player_id'] for st in states])
+        # only update players we applied for; the table lists everyone's tasks
+        self._put([st for st in states if st['player_id'] in known])
+
+    # -- decisions -----------------------------------------------------------
+
+    def split(self, player_ids):
+        """Return (to_apply, skipped): skipped players were already applied today."""
+        states = self.lookup(player_ids)
+        to_apply, skipped = [], []
+        for pid in player_ids:
+            st = states.get(str(pid))
+            if st and st.get('last_status') in SKIP_STATES:
+                skipped.append(pid)
+            else:
+                to_apply.append(pid)
+        return to_apply, skipped
+
+
+_CACHE = None
+
+
+def get_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = PlayerCache(shared_client(REDIS_URL) if REDIS_URL else None)
+    return _CACHE
@@ -0,0 +1,170 @@
+"""Reliable job queue on Redis with leases, ack/nack and a dead-letter list.
+
+Keys (for queue name `wos_jobs`):
+  wos_jobs              pending messages (LPUSH by producers, consumers take from the right)
+  wos_jobs:processing   messages handed to a consumer and not yet acknowledged
+  wos_jobs:leases       ZSET message -> lease deadline (unix time)
+  wos_jobs:dead         messages that failed more than `max_retries` times, or were buried
+
+get() atomically moves a message to the processing list (BLMOVE) and leases it. A consumer
+must ack() or nack() it; if it crashes, reap() returns expired messages to the queue, so
+delivery is at-least-once. Removing the lease entry (ZREM) is the claim for ack, nack and
+reap, so only one of them wins for any message.
+
+Any redis-py compatible client works, including fakeredis.FakeRedis() for tests.
+"""
+import json
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except Exception:
+    redis = None
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def shared_client(url):
+    """Redis client backed by one connection pool per URL and process."""
+    if redis is None:
+        raise RuntimeError('redis package not installed')
+    with _POOLS_LOCK:
+        pool = _POOLS.get(url)
+        if pool is None:
+            pool = _POOLS[url] = redis.ConnectionPool.from_url(url)
+    return redis.Redis(connection_pool=pool)
+
+
+class Message:
+    """A leased message. `raw` is the exact stored string, needed to remove it again."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        env = json.loads(raw)
+        self.id = env['id']
+        self.attempts = env.get('attempts', 0)
+        self.payload = env['payload']
+
+    def envelope(self, attempts):
+        return json.dumps({'id': self.id, 'attempts': attempts, 'payload': self.payload})
+
+
+class RedisQueue:
+    def __init__(self, client, name='wos_jobs', lease_seconds=360, max_retries=3):
+        self.client = client
+        self.name = name
+        self.processing = f'{name}:processing'
+        self.leases = f'{name}:leases'
+        self.dead = f'{name}:dead'
+        self.lease_seconds = lease_seconds
+        self.max_retries = max_retries
+
+    # -- producer ------------------------------------------------------------
+
+    def put(self, payload):
+        raw = json.dumps({'id': uuid.uuid4().hex, 'attempts': 0, 'payload': payload})
+        self.client.lpush(self.name, raw)
+
+    # -- consumer ------------------------------------------------------------
+
+    def _lease(self, raw):
+        if raw is None:
+            return None
+        self.client.zadd(self.leases, {raw: time.time() + self.lease_seconds})
+        return Message(raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+
+    def get(self, timeout=1):
+        """Block up to `timeout` seconds for a message; returns a Message or None."""
+        try:
+            raw = self.client.blmove(self.name, self.processing, timeout, 'RIGHT', 'LEFT')
+        except Exception as e:
+            # Redis < 6.2 has no BLMOVE
+            if 'unknown command' not in str(e).lower():
+                raise
+            raw = self.client.brpoplpush(self.name, self.processing, timeout)
+        return self._lease(raw)
+
+    def get_nowait(self):
+        try:
+            raw = self.client.lmove(self.name, self.processing, 'RIGHT', 'LEFT')
+        except Exception as e:
+            if 'unknown command' not in str(e).lower():
+                raise
+            raw = self.client.rpoplpush(self.name, self.processing)
+        return self._lease(raw)
+
+    def extend(self, msg, seconds=None):
+        """Push the lease deadline out for a long-running message."""
+        deadline = time.time() + (seconds or self.lease_seconds)
+        self.client.zadd(self.leases, {msg.raw: deadline}, xx=True)
+
+    def ack(self, msg):
+        if self.client.zrem(self.leases, msg.raw):
+            self.client.lrem(self.processing, 1, msg.raw)
+            return True
+        # lease already expired and the message was reaped; it will be delivered again
+        return False
+
+    def nack(self, msg):
+        """Give a message back for retry, or dead-letter it after max_retries. Returns True if dead."""
+        if not self.client.zrem(self.leases, msg.raw):
+            return False
+        return bool(self._requeue(msg))
+
+    def _requeue(self, msg):
+        # if it is no longer in processing it was acked in the meantime: nothing to redeliver
+        if not self.client.lrem(self.processing, 1, msg.raw):
+            return None
+        attempts = msg.attempts + 1
+        dead = attempts > self.max_retries
+        self.client.lpush(self.dead if dead else self.name, msg.envelope(attempts))
+        return dead
+
+    def bury(self, job_ids):
+        """Dead-letter the in-flight messages of `job_ids` without a retry, e.g. after the
+        supervisor killed their worker and failed the jobs. Returns how many were moved."""
+        wanted = {str(j) for j in job_ids}
+        moved = 0
+        for raw in self.client.lrange(self.processing, 0, -1):
+            msg = Message(raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+            if str(msg.payload.get('job_id')) not in wanted:
+                continue
+            self.client.zrem(self.leases, raw)
+            # LREM decides against a concurrent ack or reap of the same message
+            if self.client.lrem(self.processing, 1, raw):
+                self.client.lpush(self.dead, msg.envelope(msg.attempts))
+                moved += 1
+        return moved
+
+    # -- maintenance ---------------------------------------------------------
+
+    def reap(self, limit=100):
+        """Return messages with expired leases to the queue.
+
+        Processing entries without any lease (consumer died between BLMOVE and ZADD) get a
+        fresh lease here, so they are reaped on a later pass if nobody acks them.
+        Returns a list of (Message, dead) for every message handled.
+        """
+        now = time.time()
+        handled = []
+        for raw in self.client.zrangebyscore(self.leases, '-inf', now, start=0, num=limit):
+            if not self.client.zrem(self.leases, raw):
+                continue
+            msg = Message(raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+            dead = self._requeue(msg)
+            if dead is not None:
+                handled.append((msg, dead))
+        for raw in self.client.lrange(self.processing, 0, limit - 1):
+            self.client.zadd(self.leases, {raw: now + self.lease_seconds}, nx=True)
+        return handled
+
+    def stats(self):
+        pipe = self.client.pipeline()
+        pipe.llen(self.name)
+        pipe.llen(self.processing)
+        pipe.llen(self.dead)
+        depth, in_flight, dead = pipe.execute()
+        return {'depth': depth, 'in_flight': in_flight, 'dead': dead}
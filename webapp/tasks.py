@@ -2,138 +2,557 @@ import threading
 import time
 import json
 import os
+import multiprocessing
+import signal
+import socket
+from datetime import datetime
 from pathlib import Path
-from webapp.models import update_job_status
-import automation
-
-try:
-    import redis
-except Exception:
-    redis = None
+from webapp import artifacts, models, tracker
+from webapp.models import update_job_status, update_job_statuses
+import backends
+import screenshots
+from status_table import TaskStatusRecord, records_for_players, write_status_csv
+from webapp.player_cache import get_cache
+from webapp.tracker import CompletionTracker, start_tracker
+from status_snapshot import get_service
+import metrics
+from metrics import collect_timings, count_job, stage
+from webapp.file_queue import FileQueue
+from webapp.redis_queue import RedisQueue, shared_client
 
 JOB_QUEUE_ENABLED = True
 REDIS_URL = os.environ.get('REDIS_URL')
 
-WORKER_THREAD = None
+# number of worker processes and the wall-clock limit for a single job (seconds)
+WORKER_COUNT = int(os.environ.get('WOS_WORKERS', '1'))
+JOB_TIMEOUT = float(os.environ.get('WOS_JOB_TIMEOUT', '300'))
+
+# coalescing: merge queued jobs with the same backend into one submission
+BATCH_MAX_PLAYERS = int(os.environ.get('WOS_BATCH_MAX_PLAYERS', '50'))
+BATCH_MAX_JOBS = int(os.environ.get('WOS_BATCH_MAX_JOBS', '20'))
+BATCH_WAIT = float(os.environ.get('WOS_BATCH_WAIT', '0.5'))
+
+# Redis queue: a message not acked within the lease goes back to the queue. Both queues
+# dead-letter a message after QUEUE_MAX_RETRIES redeliveries.
+QUEUE_LEASE = float(os.environ.get('WOS_QUEUE_LEASE', str(JOB_TIMEOUT + 60)))
+QUEUE_MAX_RETRIES = int(os.environ.get('WOS_QUEUE_MAX_RETRIES', '3'))
+REAP_INTERVAL = 10.0
+
+# worker processes run apart from the web app (python -m webapp.worker); each pool publishes
+# its stats as a heartbeat (Redis key or file) so the Jobs page can show them
+HEARTBEAT_TTL = 15.0
+HEARTBEAT_PREFIX = 'wos_workers:'
+
+# follow submitted jobs on Task Status until the site finishes them (webapp/tracker.py)
+TRACKER_ENABLED = os.environ.get('WOS_TRACKER', '1') != '0'
+# also refresh the shared Task Status snapshot on a schedule (seconds, 0 = only on demand)
+STATUS_REFRESH = float(os.environ.get('WOS_STATUS_REFRESH', '0'))
+# archive final jobs' files and apply retention every N seconds (webapp/artifacts.py, 0 = off)
+ARTIFACT_SWEEP = float(os.environ.get('WOS_ARTIFACT_SWEEP', '300'))
+
+WORKER_POOL = None
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-OUT_DIR = BASE_DIR / 'jobs_data'
+# WOS_DATA_DIR moves job artifacts and the file queue elsewhere (e.g. bench.py runs)
+OUT_DIR = Path(os.environ.get('WOS_DATA_DIR') or BASE_DIR / 'jobs_data')
 OUT_DIR.mkdir(exist_ok=True)
+HEARTBEAT_DIR = OUT_DIR / 'workers'
 
 
 def get_redis_client():
+    """Shared Redis client (one connection pool per process), or None without REDIS_URL."""
     if not REDIS_URL:
         return None
-    if redis is None:
-        raise RuntimeError('redis package not installed')
-    return redis.from_url(REDIS_URL)
+    return shared_client(REDIS_URL)
 
 
-def enqueue_job(job_id, player_list):
-    """Enqueue a job. If REDIS_URL is set, push to Redis list; otherwise the in-process queue is used."""
-    client = get_redis_client()
-    payload = {'job_id': job_id, 'player_list': list(player_list)}
-    if client:
-        # push to Redis list 'wos_jobs'
-        client.lpush('wos_jobs', json.dumps(payload))
-    else:
-        # fallback: write a file flag (simple local queue) — put into OUT_DIR/incoming
-        qdir = OUT_DIR / 'incoming'
-        qdir.mkdir(exist_ok=True)
-        path = qdir / f'job_{job_id}.json'
-        path.write_text(json.dumps(payload))
+_QUEUE = None
 
 
-def _pop_redis_job(block=True, timeout=0):
-    client = get_redis_client()
-    if not client:
-        return None
-    # BRPOP blocks and returns (list_name, data)
-    item = client.brpop('wos_jobs', timeout=timeout)
-    if not item:
-        return None
-    _, data = item
-    return json.loads(data)
+def get_queue():
+    """The job queue for this process: RedisQueue when REDIS_URL is set, else FileQueue."""
+    global _QUEUE
+    if _QUEUE is None:
+        client = get_redis_client()
+        if client is not None:
+            _QUEUE = RedisQueue(client, name='wos_jobs', lease_seconds=QUEUE_LEASE, max_retries=QUEUE_MAX_RETRIES)
+        else:
+            _QUEUE = FileQueue(OUT_DIR / 'incoming', max_retries=QUEUE_MAX_RETRIES)
+    return _QUEUE
 
 
-def _pop_file_job():
-    qdir = OUT_DIR / 'incoming'
-    qdir.mkdir(exist_ok=True)
-    files = sorted(qdir.glob('job_*.json'))
-    if not files:
-        return None
-    p = files[0]
-    payload = json.loads(p.read_text())
+def enqueue_job(job_id, player_list, backend=None, force=False, launch_profile=None):
+    """Enqueue a job on the Redis queue when REDIS_URL is set, otherwise on the local file queue.
+
+    `backend` names the submission backend ('selenium' or 'http'); None uses the worker default.
+    `force` resubmits players even if the applied-today cache says they are already done.
+    `launch_profile` picks the Chrome launch profile for selenium jobs (driver_pool.LAUNCH_PROFILES).
+    """
+    payload = {'job_id': job_id, 'player_list': list(player_list), 'enqueued_at': time.time()}
+    if backend:
+        payload['backend'] = backend
+    if force:
+        payload['force'] = True
+    if launch_profile:
+        payload['launch_profile'] = launch_profile
+    get_queue().put(payload)
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _collect_batch(queue, first):
+    """Look ahead in the queue and gather messages that can share one submission with `first`.
+
+    Jobs using the same backend (and force flag and launch profile) are merged until BATCH_MAX_PLAYERS unique
+    players or BATCH_MAX_JOBS jobs, waiting at most BATCH_WAIT seconds for more to arrive.
+    Messages that can't join the batch are returned as leftovers to run next.
+    """
+    batch, leftovers = [first], []
+    backend_name = first.payload.get('backend')
+    force = bool(first.payload.get('force'))
+    players = set(first.payload.get('player_list', []))
+    deadline = time.time() + BATCH_WAIT
+    while len(batch) < BATCH_MAX_JOBS and len(players) < BATCH_MAX_PLAYERS:
+        nxt = queue.get_nowait()
+        if nxt is None:
+            if time.time() >= deadline:
+                break
+            time.sleep(min(0.05, max(0.0, deadline - time.time())))
+            continue
+        merged = players.union(nxt.payload.get('player_list', []))
+        compatible = (nxt.payload.get('backend') == backend_name and bool(nxt.payload.get('force')) == force
+                      and nxt.payload.get('launch_profile') == first.payload.get('launch_profile'))
+        if not compatible or len(merged) > BATCH_MAX_PLAYERS:
+            leftovers.append(nxt)
+            break
+        batch.append(nxt)
+        players = merged
+    return batch, leftovers
+
+
+def _relative(path):
+    """Path relative to OUT_DIR when possible so the web route can serve it."""
     try:
-        p.unlink()
+        return str(Path(path).relative_to(OUT_DIR)) if path else None
     except Exception:
-        pass
-    return payload
+        return None
 
 
-def worker_loop():
-    client = get_redis_client()
-    print('Worker loop started; REDIS_URL=' + str(REDIS_URL))
-    while True:
+def _finish_all(job_ids, status, result):
+    count_job(status, len(job_ids))
+    finished_at = _now()
+    update_job_statuses([{'job_id': job_id, 'status': status, 'finished_at': finished_at, 'result_csv': result}
+                         for job_id in job_ids])
+
+
+def run_jobs(payloads):
+    """Run queued jobs as one submission and leave each job `submitted` for the tracker.
+
+    Player IDs are de-duplicated across jobs. The shared Task Status scrape is split back
+    so every job gets a CSV with only its own players' rows. Stage timings (metrics.py)
+    are stored on every job of the submission.
+    """
+    # a redelivered message may belong to a job that already ended; never submit it again
+    final = _final_jobs([p.get('job_id') for p in payloads])
+    if final:
+        print(f'Skipping jobs that already ended: {sorted(final)}')
+        payloads = [p for p in payloads if p.get('job_id') not in final]
+        if not payloads:
+            return
+    picked = time.time()
+    timings = {}
+    try:
+        with collect_timings() as timings, stage('job_total'):
+            _run_jobs(payloads)
+    finally:
+        per_job = {}
+        for p in payloads:
+            own = dict(timings)
+            if p.get('enqueued_at'):
+                own['queue_wait'] = round(max(0.0, picked - p['enqueued_at']), 3)
+                metrics.REGISTRY.observe('wos_stage_seconds', own['queue_wait'], {'stage': 'queue_wait'})
+            per_job[p.get('job_id')] = own
         try:
-            payload = None
-            if client:
-                payload = _pop_redis_job(block=True, timeout=5)
-            else:
-                payload = _pop_file_job()
+            models.set_job_timings(per_job)
+        except Exception as e:
+            print('Could not store job timings:', e)
+        metrics.flush()
 
-            if not payload:
-                time.sleep(0.5)
-                continue
 
-            job_id = payload.get('job_id')
-            player_list = payload.get('player_list', [])
-            print(f"Worker picked job {job_id} for players: {player_list}")
-            update_job_status(job_id, 'running')
+def _run_jobs(payloads):
+    job_ids = [p.get('job_id') for p in payloads]
+    player_list = []
+    for p in payloads:
+        for pid in p.get('player_list', []):
+            if pid not in player_list:
+                player_list.append(pid)
+    backend_name = payloads[0].get('backend') or backends.DEFAULT_BACKEND
+    print(f"Worker picked jobs {job_ids} for players: {player_list} (backend={backend_name})")
+
+    # another job may have applied some of these players since they were queued
+    cache = get_cache()
+    if not payloads[0].get('force'):
+        player_list, skipped = cache.split(player_list)
+        if skipped:
+            print(f"Skipping players already applied today: {skipped}")
+        if not player_list:
+            _finish_all(job_ids, 'skipped', 'all players already applied today')
+            return
+    update_job_statuses([{'job_id': job_id, 'status': 'running'} for job_id in job_ids])
+    # rows already on Task Status belong to earlier submissions; the tracker waits for new ones
+    submitted_at = datetime.utcnow()
+    baselines = tracker.snapshot_baseline(player_list, submitted_at)
+    # the submission's artifacts (screenshots) live with the first job
+    run_dir = OUT_DIR / f'job_{job_ids[0]}'
+    run_dir.mkdir(exist_ok=True)
+
+    try:
+        # selenium runs headless on the remote worker, borrowing from the shared pool
+        options = {}
+        if backend_name == 'selenium' and payloads[0].get('launch_profile'):
+            options['launch_profile'] = payloads[0]['launch_profile']
+        res = backends.get_backend(backend_name, **options).apply_player_ids(player_list, out_dir=str(run_dir))
+    except Exception as e:
+        _finish_all(job_ids, 'error', str(e))
+        return
+
+    # if automation detected a captcha/overlay, mark jobs as blocked and save screenshot path
+    if res and res.get('captcha'):
+        screenshots.flush()  # the job page links the screenshot right away
+        rel = _relative(res.get('apply_screenshot'))
+        _finish_all(job_ids, 'blocked', rel or res.get('message'))
+        return
+
+    records = [TaskStatusRecord(**row) for row in (res or {}).get('status_rows', [])]
+    if records:
+        # the post-apply scrape is the freshest Task Status there is; share it
+        get_service().publish(records, source=f'job {job_ids[0]}')
+    try:
+        cache.mark_applied(player_list)
+        cache.record_status(records_for_players(records, player_list))
+    except Exception as e:
+        print('Player cache update failed:', e)
+    updates = []
+    submitted = {}
+    for payload in payloads:
+        job_id = payload.get('job_id')
+        if len(payloads) == 1:
+            result_csv = (res or {}).get('status_csv')
+        else:
             job_dir = OUT_DIR / f'job_{job_id}'
             job_dir.mkdir(exist_ok=True)
+            own = records_for_players(records, payload.get('player_list', []))
+            result_csv = write_status_csv(own, job_dir / 'task_status.csv')
+        rel = _relative(result_csv)
+        mine = [pid for pid in payload.get('player_list', []) if pid in player_list]
+        if mine:
+            submitted[job_id] = mine
+            updates.append({'job_id': job_id, 'status': 'submitted',
+                            'result_csv': rel or (str(result_csv) if result_csv else None)})
+        else:
+            # every player of this job was skipped, nothing to wait for
+            updates.append({'job_id': job_id, 'status': 'skipped', 'finished_at': _now(),
+                            'result_csv': 'all players already applied today'})
+    with stage('db_update'):
+        update_job_statuses(updates)
+    for u in updates:
+        count_job(u['status'])
+    # the site finishes the submission minutes later; the completion tracker follows each
+    # player on Task Status until then. The scrape we already have may settle some now.
+    models.track_job_players(submitted, submitted_at.isoformat(), baselines)
+    try:
+        CompletionTracker().record(records)
+    except Exception as e:
+        print('Completion tracking failed:', e)
+
+
+def run_job(payload):
+    """Run a single queued job."""
+    run_jobs([payload])
+
+
+def _mark_slot(current, slot, job_ids):
+    base = slot * BATCH_MAX_JOBS
+    for i in range(BATCH_MAX_JOBS):
+        current[base + i] = int(job_ids[i] or 0) if i < len(job_ids) else 0
+
+
+def _slot_jobs(current, slot):
+    base = slot * BATCH_MAX_JOBS
+    return [j for j in current[base:base + BATCH_MAX_JOBS] if j]
+
+
+def _final_jobs(job_ids):
+    """The subset of `job_ids` that already reached a final status."""
+    final = set()
+    for job_id in job_ids:
+        job = models.get_job(job_id) if job_id else None
+        if job and job['status'] in models.FINAL_JOB_STATUSES:
+            final.add(job_id)
+    return final
+
+
+def _reap(queue):
+    """Requeue jobs whose worker died mid-job; fail the ones that ran out of retries.
+
+    Runs when a worker starts, so claims left by a crashed process are recovered right away.
+    Jobs that already ended (e.g. failed by the supervisor) keep their status.
+    """
+    for msg, dead in queue.reap():
+        job_id = msg.payload.get('job_id')
+        if _final_jobs([job_id]):
+            print(f'Job {job_id} lease expired but the job already ended; leaving it')
+        elif dead:
+            print(f'Job {job_id} dead-lettered after {msg.attempts + 1} attempts')
+            _finish_all([job_id], 'error', f'gave up after {msg.attempts + 1} attempts')
+        else:
+            print(f'Job {job_id} lease expired; requeued')
+            update_job_status(job_id, 'queued')
+
 
-            # run apply automation
+def worker_loop(slot=None, current=None, started=None):
+    """Consume jobs forever. In a pool, `current`/`started` are shared arrays indexed by `slot`."""
+    queue = get_queue()
+    print(f'Worker loop started (slot={slot}, pid={os.getpid()}); REDIS_URL=' + str(REDIS_URL))
+    leftovers = []
+    last_reap = 0.0
+    while True:
+        try:
+            if time.time() - last_reap >= REAP_INTERVAL:
+                last_reap = time.time()
+                _reap(queue)
+
+            msg = leftovers.pop(0) if leftovers else queue.get(timeout=1)
+            if msg is None:
+                continue
+
+            with stage('batch_collect'):
+                batch, extra = _collect_batch(queue, msg)
+            leftovers.extend(extra)
+            if current is not None:
+                started[slot] = time.time()
+                _mark_slot(current, slot, [m.payload.get('job_id') for m in batch])
             try:
-                # run headless by default on remote worker
-                res = automation.apply_player_ids(player_list, out_dir=str(job_dir), headless=True)
-                # if automation detected a captcha/overlay, mark job as blocked and save screenshot path
-                if res and res.get('captcha'):
-                    msg = res.get('message')
-                    ss = res.get('apply_screenshot')
-                    # store a path relative to OUT_DIR when possible so the web route can serve it
-                    rel = None
-                    try:
-                        if ss:
-                            rel = str(Path(ss).relative_to(OUT_DIR))
-                    except Exception:
-                        rel = None
-                    update_job_status(job_id, 'blocked', finished_at=time.strftime('%Y-%m-%dT%H:%M:%SZ'), result_csv=rel or msg)
-                else:
-                    result_csv = None
-                    if res:
-                        result_csv = res.get('status_csv')
-                    # convert to relative path if the CSV lives under OUT_DIR
-                    rel = None
-                    try:
-                        if result_csv:
-                            rel = str(Path(result_csv).relative_to(OUT_DIR))
-                    except Exception:
-                        rel = None
-                    update_job_status(job_id, 'done', finished_at=time.strftime('%Y-%m-%dT%H:%M:%SZ'), result_csv=rel or result_csv)
-            except Exception as e:
-                update_job_status(job_id, 'error', finished_at=time.strftime('%Y-%m-%dT%H:%M:%SZ'), result_csv=str(e))
+                run_jobs([m.payload for m in batch])
+            except Exception:
+                # unexpected failure outside the job's own error handling: let it be retried
+                for m in batch:
+                    queue.nack(m)
+                raise
+            else:
+                for m in batch:
+                    queue.ack(m)
+            finally:
+                if current is not None:
+                    _mark_slot(current, slot, [])
+                    started[slot] = 0.0
 
         except Exception as e:
             print('Worker loop error:', e)
             time.sleep(1.0)
 
 
-def start_worker():
-    global WORKER_THREAD
-    if WORKER_THREAD and WORKER_THREAD.is_alive():
+def _worker_process_main(slot, db_path, current, started):
+    # forked children inherit the parent's signal handlers (e.g. webapp.worker's); restore the
+    # defaults so terminate()/SIGTERM stops them
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # spawned children (Windows/macOS) do not inherit the parent's DB setup
+    models.init_db(db_path)
+    worker_loop(slot, current, started)
+
+
+def _kill_process_tree(pid):
+    """Kill a worker and the Chrome/chromedriver processes it started."""
+    try:
+        import psutil
+        parent = psutil.Process(pid)
+        for child in parent.children(recursive=True):
+            try:
+                child.kill()
+            except Exception:
+                pass
+        parent.kill()
+    except ImportError:
+        # without psutil only the worker itself can be killed; its Chrome children are orphaned
+        try:
+            os.kill(pid, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+        except OSError:
+            pass
+    except Exception:
+        pass
+
+
+class WorkerPool:
+    """N worker processes consuming the job queue, with a supervisor enforcing the per-job timeout.
+
+    A worker that dies, or whose job runs longer than `job_timeout`, is killed (with its
+    browsers), the job is marked 'error', its message is dead-lettered so it is never
+    redelivered, and the slot is restarted.
+    """
+
+    def __init__(self, size=WORKER_COUNT, job_timeout=JOB_TIMEOUT, db_path=None):
+        self.size = max(1, int(size))
+        self.job_timeout = job_timeout
+        self.db_path = db_path or models.DB_PATH
+        # job ids in flight, BATCH_MAX_JOBS entries per slot
+        self.current = multiprocessing.Array('l', self.size * BATCH_MAX_JOBS)
+        self.started = multiprocessing.Array('d', self.size)
+        self.procs = [None] * self.size
+        self._supervisor = None
+        self._stop = threading.Event()
+
+    def start(self):
+        for slot in range(self.size):
+            self._spawn(slot)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for p in self.procs:
+            if p is not None and p.is_alive():
+                _kill_process_tree(p.pid)
+        _clear_heartbeat()
+
+    def _spawn(self, slot):
+        _mark_slot(self.current, slot, [])
+        self.started[slot] = 0.0
+        p = multiprocessing.Process(target=_worker_process_main, name=f'wos-worker-{slot}',
+                                    args=(slot, self.db_path, self.current, self.started), daemon=True)
+        p.start()
+        self.procs[slot] = p
+
+    def _supervise(self):
+        while not self._stop.wait(1.0):
+            try:
+                publish_heartbeat(self.stats())
+            except Exception as e:
+                print('Worker heartbeat failed:', e)
+            now = time.time()
+            for slot, p in enumerate(self.procs):
+                job_ids = _slot_jobs(self.current, slot)
+                started = self.started[slot]
+                timed_out = job_ids and self.job_timeout and started and now - started > self.job_timeout
+                if p.is_alive() and not timed_out:
+                    continue
+                if timed_out:
+                    print(f'Worker slot {slot}: jobs {job_ids} exceeded {self.job_timeout}s, restarting worker')
+                    _kill_process_tree(p.pid)
+                    p.join(5)
+                    reason = f'timeout after {int(self.job_timeout)}s'
+                else:
+                    reason = f'worker exited with code {p.exitcode}'
+                try:
+                    # the jobs are reported failed: their messages must not be redelivered
+                    if job_ids:
+                        get_queue().bury(job_ids)
+                    _finish_all(job_ids, 'error', reason)
+                except Exception as e:
+                    print('Worker supervisor error:', e)
+                self._spawn(slot)
+
+    def stats(self):
+        in_flight = [j for j in self.current[:] if j]
+        return {
+            'workers': sum(1 for p in self.procs if p is not None and p.is_alive()),
+            'size': self.size,
+            'in_flight': len(in_flight),
+            'in_flight_jobs': in_flight,
+            'job_timeout': self.job_timeout,
+        }
+
+
+def _heartbeat_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def publish_heartbeat(stats):
+    """Record this process's worker pool stats for HEARTBEAT_TTL seconds."""
+    body = json.dumps(dict(stats, id=_heartbeat_id(), at=time.time()))
+    client = get_redis_client()
+    if client is not None:
+        client.set(HEARTBEAT_PREFIX + _heartbeat_id(), body, ex=int(HEARTBEAT_TTL))
         return
-    t = threading.Thread(target=worker_loop, daemon=True)
-    t.start()
-    WORKER_THREAD = t
-    return t
+    HEARTBEAT_DIR.mkdir(exist_ok=True)
+    path = HEARTBEAT_DIR / f'{_heartbeat_id()}.json'
+    tmp = path.with_name('.' + path.name + '.tmp')
+    tmp.write_text(body)
+    os.replace(tmp, path)
+
+
+def _clear_heartbeat():
+    try:
+        client = get_redis_client()
+        if client is not None:
+            client.delete(HEARTBEAT_PREFIX + _heartbeat_id())
+        else:
+            (HEARTBEAT_DIR / f'{_heartbeat_id()}.json').unlink()
+    except Exception:
+        pass
+
+
+def _read_heartbeats():
+    """Stats of every live worker pool (possibly on other hosts when Redis is used)."""
+    now = time.time()
+    client = get_redis_client()
+    if client is not None:
+        keys = list(client.scan_iter(match=HEARTBEAT_PREFIX + '*', count=100))
+        bodies = client.mget(keys) if keys else []
+    else:
+        bodies = []
+        for path in HEARTBEAT_DIR.glob('*.json') if HEARTBEAT_DIR.exists() else []:
+            try:
+                bodies.append(path.read_text())
+            except OSError:
+                continue
+    beats = []
+    for body in bodies:
+        try:
+            beat = json.loads(body)
+        except (TypeError, ValueError):
+            continue
+        if now - beat.get('at', 0) <= HEARTBEAT_TTL:
+            beats.append(beat)
+    return beats
+
+
+def start_worker(count=None):
+    """Start the worker pool once per process and return it (see webapp/worker.py)."""
+    global WORKER_POOL
+    if WORKER_POOL is not None:
+        return WORKER_POOL
+    WORKER_POOL = WorkerPool(size=count or WORKER_COUNT).start()
+    if TRACKER_ENABLED:
+        start_tracker()
+    if STATUS_REFRESH > 0:
+        threading.Thread(target=get_service().run, args=(STATUS_REFRESH,), name='status-refresh', daemon=True).start()
+    if ARTIFACT_SWEEP > 0:
+        artifacts.start_sweeper(ARTIFACT_SWEEP)
+    return WORKER_POOL
+
+
+def worker_stats():
+    """Worker and queue stats: this process's pool if it runs one, else all heartbeats."""
+    if WORKER_POOL is not None:
+        stats = WORKER_POOL.stats()
+    else:
+        stats = {'workers': 0, 'size': 0, 'in_flight': 0, 'in_flight_jobs': [], 'job_timeout': JOB_TIMEOUT}
+        try:
+            beats = _read_heartbeats()
+        except Exception as e:
+            print('Could not read worker heartbeats:', e)
+            beats = []
+        for beat in beats:
+            for key in ('workers', 'size', 'in_flight'):
+                stats[key] += beat.get(key, 0)
+            stats['in_flight_jobs'] += beat.get('in_flight_jobs', [])
+        stats['pools'] = len(beats)
+    try:
+        stats['queue'] = get_queue().stats()
+    except Exception as e:
+        stats['queue'] = {'error': str(e)}
+    return stats
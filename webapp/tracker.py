@@ -0,0 +1,199 @@
+"""Follow submitted players on the Task Status page until the site reports a final state.
+
+Right after "Apply Codes" the site lists a new row as `pending` with no result link; it turns
+`done` (or failed) minutes later. Workers therefore leave a job `submitted`, and the
+CompletionTracker (one thread in the worker process, see webapp/worker.py) finishes it:
+
+  - one Task Status fetch per cycle covers every outstanding player of every job
+  - the fetch interval starts at WOS_TRACK_MIN_INTERVAL (5s), grows by 1.5x while nothing
+    changes, up to WOS_TRACK_MAX_INTERVAL (120s), and drops back as soon as new jobs are
+    submitted or a row changes
+  - players still pending after WOS_TRACK_TIMEOUT (3600s) are marked `unconfirmed`
+
+Each player's newest row is used, but only once the page lists a row that was not there
+before the apply: the worker counts the player's rows in the status snapshot just before
+submitting (`baseline`), and a row only counts as this submission's once there are more.
+An earlier run's `done` row from the same day therefore never finishes a new submission.
+Rows dated more than a day before the submission (site vs. UTC date) are not counted.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import metrics
+from status_snapshot import get_service
+from webapp import models
+from webapp.player_cache import get_cache
+
+MIN_INTERVAL = float(os.environ.get('WOS_TRACK_MIN_INTERVAL', '5'))
+MAX_INTERVAL = float(os.environ.get('WOS_TRACK_MAX_INTERVAL', '120'))
+BACKOFF = 1.5
+TRACK_TIMEOUT = float(os.environ.get('WOS_TRACK_TIMEOUT', '3600'))
+# the baseline is read from the shared status snapshot; scrape first if it is older than this.
+# Earlier submissions publish their post-apply scrape, so their rows are in it either way.
+BASELINE_MAX_AGE = float(os.environ.get('WOS_TRACK_BASELINE_MAX_AGE', '300'))
+
+# site state -> tracked state
+FINAL_STATES = {'done': 'done', 'completed': 'done', 'success': 'done',
+                'failed': 'failed', 'error': 'failed', 'rejected': 'failed'}
+
+_DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d', '%d.%m.%Y')
+
+
+def _row_date(text):
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip().split(' ')[0], fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _recent(row, submitted):
+    date = _row_date(row.date)
+    return not (submitted and date and date < submitted - timedelta(days=1))
+
+
+def player_rows(records, player_id, submitted=None):
+    """Rows mentioning `player_id` (newest first), without rows dated well before `submitted`."""
+    return [r for r in records if player_id in r.player_ids and _recent(r, submitted)]
+
+
+def baseline(records, player_ids, submitted=None):
+    """player_id -> number of its rows already listed, taken just before a submission."""
+    return {str(pid): len(player_rows(records, str(pid), submitted)) for pid in player_ids}
+
+
+def snapshot_baseline(player_ids, submitted=None):
+    """baseline() from the shared status snapshot, refreshed if older than BASELINE_MAX_AGE."""
+    try:
+        records = get_service().get(max_age=BASELINE_MAX_AGE).records
+    except Exception as e:
+        print('Could not refresh Task Status before apply:', e)
+        records = get_service().current().records
+    return baseline(records, player_ids, submitted)
+
+
+def newest_rows(records):
+    """player_id -> newest record mentioning it (the page lists newest first)."""
+    out = {}
+    for r in records:
+        for pid in r.player_ids:
+            out.setdefault(pid, r)
+    return out
+
+
+def resolve(pending, records):
+    """Per-player updates for `pending` (from models.pending_job_players) given fresh records."""
+    updates = []
+    for item in pending:
+        submitted = datetime.fromisoformat(item['submitted_at']) if item.get('submitted_at') else None
+        rows = player_rows(records, item['player_id'], submitted)
+        # no new row yet: the newest one belongs to an earlier submission
+        if len(rows) <= (item.get('baseline') or 0):
+            continue
+        row = rows[0]
+        state = FINAL_STATES.get(row.status)
+        if state is None:
+            continue
+        updates.append({'job_id': item['job_id'], 'player_id': item['player_id'], 'status': state,
+                        'result_url': row.result_url})
+    return updates
+
+
+class CompletionTracker:
+    def __init__(self, fetch=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 backoff=BACKOFF, timeout=TRACK_TIMEOUT):
+        # by default read the shared status snapshot: a scrape published by a worker or
+        # another reader within the last min_interval seconds saves our own
+        self.fetch = fetch or (lambda: get_service().get(max_age=self.min_interval).records)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.interval = min_interval
+        self.fetches = 0
+        self._known = set()
+
+    def record(self, records, pending=None):
+        """Apply already-fetched records (e.g. the scrape right after apply). Returns finished jobs."""
+        pending = models.pending_job_players() if pending is None else pending
+        updates = resolve(pending, records)
+        finished = models.update_job_players(updates)
+        if updates:
+            try:
+                get_cache().record_status([r for r in records if set(r.player_ids) & {u['player_id'] for u in updates}])
+            except Exception as e:
+                print('Player cache update failed:', e)
+        for job_id, status in finished:
+            print(f'Job {job_id} finished on the site: {status}')
+        self._count(finished)
+        return finished
+
+    def _count(self, finished):
+        for _, status in finished:
+            metrics.count_job(status)
+        if finished:
+            metrics.flush()
+
+    def _expire(self, pending):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.timeout)
+        stale = [{'job_id': p['job_id'], 'player_id': p['player_id'], 'status': 'unconfirmed'} for p in pending
+                 if p.get('submitted_at') and datetime.fromisoformat(p['submitted_at']) < cutoff]
+        finished = models.update_job_players(stale)
+        for job_id, status in finished:
+            print(f'Job {job_id} not confirmed within {int(self.timeout)}s: {status}')
+        self._count(finished)
+        return len(stale)
+
+    def poll_once(self):
+        """One shared fetch for all outstanding players. Returns the number of players resolved."""
+        pending = models.pending_job_players()
+        if not pending:
+            return 0
+        records = self.fetch()
+        self.fetches += 1
+        updates = resolve(pending, records)
+        self.record(records, pending)
+        self._expire([p for p in pending if (p['job_id'], p['player_id']) not in
+                      {(u['job_id'], u['player_id']) for u in updates}])
+        return len(updates)
+
+    def run(self, stop=None):
+        """Track until `stop` (a threading.Event) is set."""
+        stop = stop or threading.Event()
+        next_fetch = 0.0
+        while not stop.is_set():
+            try:
+                pending = models.pending_job_players()
+                keys = {(p['job_id'], p['player_id']) for p in pending}
+                if keys - self._known:
+                    # new submissions: look soon, then back off again
+                    self.interval = self.min_interval
+                    next_fetch = min(next_fetch, time.monotonic() + self.min_interval)
+                self._known = keys
+                if pending and time.monotonic() >= next_fetch:
+                    resolved = self.poll_once()
+                    self.interval = self.min_interval if resolved else min(self.interval * self.backoff, self.max_interval)
+                    next_fetch = time.monotonic() + self.interval
+            except Exception as e:
+                print('Completion tracker error:', e)
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+                next_fetch = time.monotonic() + self.interval
+            stop.wait(1.0)
+
+    def stats(self):
+        return {'tracking': len(self._known), 'interval': round(self.interval, 1), 'fetches': self.fetches}
+
+
+_TRACKER = None
+
+
+def start_tracker(stop=None):
+    """Start the process-wide tracker thread once and return the tracker."""
+    global _TRACKER
+    if _TRACKER is None:
+        _TRACKER = CompletionTracker()
+        threading.Thread(target=_TRACKER.run, args=(stop,), name='completion-tracker', daemon=True).start()
+    return _TRACKER
@@ -0,0 +1,46 @@
+"""
+Job worker entry point, run separately from the web app:
+
+    python -m webapp.worker              # WOS_WORKERS consumer processes (default 1)
+    python -m webapp.worker --workers 4
+
+Starts one consumer process per slot (see tasks.WorkerPool) plus the supervisor that
+enforces WOS_JOB_TIMEOUT, and publishes heartbeats so the web app's Jobs page can show
+them. Stops cleanly on SIGINT/SIGTERM. Only this process loads Selenium and Chrome.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+
+# Ensure project root is on sys.path so `import webapp.*` works when running this file directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from webapp import models, tasks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the wosrewards job workers')
+    parser.add_argument('--workers', type=int, default=tasks.WORKER_COUNT, help='Consumer processes (default WOS_WORKERS)')
+    parser.add_argument('--db', default=os.environ.get('WOS_DB') or str(tasks.BASE_DIR / 'app.db'),
+                        help='SQLite database shared with the web app (default WOS_DB or app.db)')
+    args = parser.parse_args(argv)
+
+    models.init_db(args.db)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    pool = tasks.start_worker(args.workers)
+    print(f'Started {pool.size} worker(s); queue: {"redis" if tasks.REDIS_URL else tasks.OUT_DIR / "incoming"}')
+    try:
+        while not stop.wait(1.0):
+            pass
+    finally:
+        print('Stopping workers...')
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()